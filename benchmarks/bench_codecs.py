@@ -0,0 +1,48 @@
+import argparse
+import tempfile
+import time
+
+from pathlib import Path
+
+from anime_data_pipeline.lib import serialization
+from anime_data_pipeline.lib.serialization import CODECS
+from anime_data_pipeline.lib.synthetic import make_payload
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_codecs")
+    parser.add_argument("-n", "--entries", type=int, default=10000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    payload = make_payload(args.entries)
+    print(f"{args.entries} entries")
+    print(
+        f"{'codec':<12} {'size':>12} {'write ms':>10} {'read ms':>10} {'User ms':>10}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, codec in CODECS.items():
+            path = Path(tmp, f"raw_anilist{codec.suffix}")
+            writes, reads, lazy = [], [], []
+            for _ in range(args.repeat):
+                size, ms = timed(lambda: serialization.dump(payload, path, codec))
+                writes.append(ms)
+                _, ms = timed(
+                    lambda: serialization.materialize(serialization.load(path, codec))
+                )
+                reads.append(ms)
+                _, ms = timed(lambda: serialization.load(path, codec)["data"]["User"])
+                lazy.append(ms)
+            print(
+                f"{name:<12} {size:>12,} {min(writes):>10.1f} {min(reads):>10.1f} {min(lazy):>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
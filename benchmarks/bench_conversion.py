@@ -0,0 +1,35 @@
+import argparse
+import logging
+import time
+
+from anime_data_pipeline.defs.assets import convert_anilist_json_to_tables
+from anime_data_pipeline.lib.synthetic import make_payload
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_conversion")
+    parser.add_argument("-n", "--entries", type=int, default=100000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    payload = make_payload(args.entries)
+    print(f"{args.entries} entries")
+    results = {}
+    for engine in ["pydantic", "arrow"]:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fact_df, media_df, _ = convert_anilist_json_to_tables(payload, engine)
+            timings.append(time.perf_counter() - started)
+        results[engine] = min(timings)
+        print(
+            f"{engine:<10} {results[engine]:>8.2f}s"
+            f" {args.entries / results[engine]:>12,.0f} entries/s"
+            f" ({len(fact_df)} fact, {len(media_df)} media rows)"
+        )
+    print(f"speedup    {results['pydantic'] / results['arrow']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import dagster as dg
+import duckdb
+
+from pathlib import Path
+from dagster_duckdb import DuckDBResource
+
+from anime_data_pipeline.defs.assets import plots, store_anime_scores_parquet
+from anime_data_pipeline.defs.jobs import duckdb_executor
+from anime_data_pipeline.defs.resources import PlotRendererResource
+
+READ_ASSETS = [plots, store_anime_scores_parquet]
+QUERY_PATH = str(Path(__file__).parent.parent.joinpath("queries").resolve())
+
+
+def seed_database(database: str, rows: int):
+    with duckdb.connect(database) as conn:
+        conn.execute("CREATE SCHEMA dbt")
+        conn.execute(
+            f"""
+            CREATE TABLE dbt.anime_scores AS
+            SELECT
+                i % 50 AS user_id,
+                i AS media_id,
+                (i % 10 + 1)::DOUBLE AS score,
+                2000 + i % 20 AS season_year,
+                'FINISHED' AS status,
+                TIMESTAMP '2025-01-01' AS loaded_at
+            FROM
+                range({rows}) AS t(i)
+            """
+        )
+        for table, column in [("media_genre", "genre"), ("media_tag", "tag")]:
+            conn.execute(
+                f"""
+                CREATE TABLE dbt.{table} AS
+                SELECT
+                    media_id,
+                    '{column}_' || ((media_id + j) % 40) AS {column}
+                FROM
+                    dbt.anime_scores, range(3) AS t(j)
+                """
+            )
+
+
+def bench_job() -> dg.JobDefinition:
+    data_path = os.environ["BENCH_DATA_PATH"]
+    database = str(Path(data_path, "anime_data.duckdb"))
+    executor = (
+        dg.in_process_executor
+        if os.environ["BENCH_EXECUTOR"] == "serial"
+        else duckdb_executor
+    )
+    defs = dg.Definitions(
+        assets=READ_ASSETS,
+        jobs=[dg.define_asset_job("bench_job", executor_def=executor)],
+        resources={
+            "duckdb_read": DuckDBResource(
+                database=database, connection_config={"access_mode": "READ_ONLY"}
+            ),
+            "plot_renderer": PlotRendererResource(),
+        },
+    )
+    return defs.get_job_def("bench_job")
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_executor")
+    parser.add_argument("-n", "--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        seed_database(str(Path(data_path, "anime_data.duckdb")), args.rows)
+        os.environ["BENCH_DATA_PATH"] = data_path
+        config = {"data_path": data_path, "query_path": QUERY_PATH}
+        run_config = {"ops": {a.op.name: {"config": config} for a in READ_ASSETS}}
+
+        print(f"{len(READ_ASSETS)} read-only assets, {args.rows} rows")
+        results = {}
+        for executor in ["serial", "multiprocess"]:
+            os.environ["BENCH_EXECUTOR"] = executor
+            # Start each executor without plot caches or an export so both do full work
+            for digest_path in Path(data_path).glob("*.sha256"):
+                digest_path.unlink()
+            shutil.rmtree(Path(data_path, "anime_scores_parquet"), ignore_errors=True)
+            with dg.DagsterInstance.ephemeral(tempdir=data_path) as instance:
+                started = time.perf_counter()
+                result = dg.execute_job(
+                    dg.reconstructable(bench_job), instance, run_config=run_config
+                )
+                results[executor] = time.perf_counter() - started
+            assert result.success, f"{executor} run failed"
+            print(f"{executor:<13} {results[executor]:>8.2f}s")
+    print(f"speedup       {results['serial'] / results['multiprocess']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+import argparse
+import dataclasses
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import dagster as dg
+import duckdb
+import orjson
+import pandas as pd
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+from dagster_duckdb import DuckDBResource
+
+from anime_data_pipeline.defs.assets import (
+    AnimeScoresParquetConfig,
+    QUALITY_SUITES,
+    anime_scores,
+    check_table,
+    convert_anilist_json_to_model,
+    convert_anilist_json_to_tables,
+    dbt_raw,
+    flatten_anilist_entries,
+    iter_anilist_entries,
+    normalize_df,
+    plot_query_filenames,
+    store_anime_scores_parquet,
+)
+from anime_data_pipeline.defs.partitions import users_partitions
+from anime_data_pipeline.defs.resources import ResourceConfig
+from anime_data_pipeline.lib import schemas
+from anime_data_pipeline.lib.synthetic import PayloadOptions, make_payloads
+
+ROOT = Path(__file__).parent.parent.resolve()
+QUERY_PATH = str(ROOT.joinpath("queries"))
+RESULTS_PATH = Path(__file__).parent.joinpath("results", "bench_pipeline.jsonl")
+
+
+def rss_peak(who: int = resource.RUSAGE_SELF) -> int:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def cpu_time() -> float:
+    # Includes DuckDB's threads and finished subprocesses such as dbt
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def measure(
+    fn: Callable[[], int],
+    repeat: int,
+    memory: bool,
+    setup: Callable[[], Any] = lambda: None,
+) -> dict[str, Any]:
+    # Python allocations are traced in a separate run so timings are not skewed
+    result: dict[str, Any] = {}
+    try:
+        if memory:
+            setup()
+            tracemalloc.start()
+            try:
+                fn()
+                result["python_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        runs = []
+        for _ in range(repeat):
+            setup()
+            gc.collect()
+            started, started_cpu = time.perf_counter(), cpu_time()
+            rows = fn()
+            runs.append((time.perf_counter() - started, cpu_time() - started_cpu))
+    except Exception as err:
+        return result | {"error": repr(err), "rss_peak_bytes": rss_peak()}
+
+    seconds, cpu_seconds = min(runs)
+    return result | {
+        "seconds": seconds,
+        "cpu_seconds": cpu_seconds,
+        "runs": [run[0] for run in runs],
+        "rows": rows,
+        "rows_per_second": rows / seconds if seconds else None,
+        # Process high-water mark, includes DuckDB and Arrow allocations
+        "rss_peak_bytes": rss_peak(),
+        "children_rss_peak_bytes": rss_peak(resource.RUSAGE_CHILDREN),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_profile(data_path: str, database: str) -> str:
+    # profiles.yml points at ./data, the benchmark database lives in a tempdir
+    profile = {
+        "anime_data_pipeline": {
+            "target": "bench",
+            "outputs": {
+                "bench": {"type": "duckdb", "path": database, "threads": os.cpu_count()}
+            },
+        }
+    }
+    with open(Path(data_path, "profiles.yml"), "w") as profile_file:
+        json.dump(profile, profile_file)
+    return data_path
+
+
+def run_stages(
+    payloads: list[dict], data_path: str, repeat: int, memory: bool
+) -> dict[str, dict[str, Any]]:
+    database = str(Path(data_path, "anime_data.duckdb"))
+    duckdb_write = DuckDBResource(database=database)
+    duckdb_read = DuckDBResource(
+        database=database, connection_config={"access_mode": "READ_ONLY"}
+    )
+    config = {"data_path": data_path, "query_path": QUERY_PATH}
+    entries = sum(1 for payload in payloads for _ in iter_anilist_entries(payload))
+    results = {}
+
+    def stage(name: str, fn: Callable[[], int], **kwargs):
+        results[name] = measure(fn, repeat, memory, **kwargs)
+        result = results[name]
+        if "error" in result:
+            print(f"{name:<32} failed: {result['error']}")
+            return
+        print(
+            f"{name:<32} {result['seconds']:>9.3f}s {result['cpu_seconds']:>9.3f}s"
+            f" {result['rows']:>10,} {result['rows_per_second'] or 0:>12,.0f}"
+            f" {result.get('python_peak_bytes', 0) / 2**20:>10.1f}"
+            f" {result['rss_peak_bytes'] / 2**20:>10.1f}"
+        )
+
+    print(
+        f"{'stage':<32} {'wall':>10} {'cpu':>10} {'rows':>10} {'rows/s':>12}"
+        f" {'py MiB':>10} {'rss MiB':>10}"
+    )
+
+    def convert_to_model() -> int:
+        return sum(
+            len(convert_anilist_json_to_model(payload, schemas.FactAnime))
+            for payload in payloads
+        )
+
+    stage("convert_anilist_json_to_model", convert_to_model)
+
+    tables = []
+
+    def convert_to_tables() -> int:
+        tables[:] = [convert_anilist_json_to_tables(payload) for payload in payloads]
+        return sum(len(fact_df) for fact_df, _, _ in tables)
+
+    stage("convert_anilist_json_to_tables", convert_to_tables)
+
+    flattened = [
+        pd.DataFrame.from_records(
+            list(flatten_anilist_entries(iter_anilist_entries(p)))
+        )
+        for p in payloads
+    ]
+    frames = []
+
+    def normalize() -> int:
+        return sum(len(normalize_df(df)) for df in frames)
+
+    stage(
+        "normalize_df",
+        normalize,
+        setup=lambda: frames.__setitem__(slice(None), [df.copy() for df in flattened]),
+    )
+    del flattened, frames
+
+    def write_pandas_tables() -> int:
+        # What the IO managers do with anilist_tables' outputs, all users at once
+        fact_df = pd.concat([t[0] for t in tables], ignore_index=True)
+        media_df = pd.concat([t[1] for t in tables], ignore_index=True)
+        media_df = media_df.drop_duplicates("id", ignore_index=True)
+        user_df = pd.concat([t[2] for t in tables], ignore_index=True)
+        with duckdb_write.get_connection() as conn:
+            conn.execute("CREATE SCHEMA IF NOT EXISTS pandas")
+            for name, df in [
+                ("fact_anime", fact_df),
+                ("dimension_media", media_df),
+                ("dimension_user", user_df),
+            ]:
+                conn.execute(
+                    f"CREATE OR REPLACE TABLE pandas.{name} AS SELECT * FROM df"
+                )
+        return len(fact_df) + len(media_df) + len(user_df)
+
+    stage("duckdb_pandas_write", write_pandas_tables)
+    del tables
+
+    def check_tables() -> int:
+        # Each suite is one aggregated scan of its table
+        with duckdb_read.get_connection() as conn:
+            return sum(
+                check_table(conn.table(f"pandas.{name}"), suite).metadata["rows"].value
+                for name, suite in QUALITY_SUITES.items()
+            )
+
+    stage("table_checks", check_tables)
+
+    stage(
+        "anime_scores",
+        lambda: anime_scores(duckdb=duckdb_write, config=ResourceConfig(**config))
+        .metadata["rows"]
+        .value,
+    )
+
+    # dbt_raw reads <data_path>/<run_id>/<user>/raw_anilist.json, one run per user
+    runs = [(str(uuid.uuid4()), p["data"]["User"]["name"], p) for p in payloads]
+    for run_id, user_name, payload in runs:
+        Path(data_path, run_id, user_name).mkdir(parents=True)
+        Path(data_path, run_id, user_name, "raw_anilist.json").write_bytes(
+            orjson.dumps(payload)
+        )
+    dbt_raw_job = dg.Definitions(
+        assets=[dbt_raw],
+        jobs=[dg.define_asset_job("bench_dbt_raw", selection=[dbt_raw])],
+        resources={"duckdb": duckdb_write},
+    ).get_job_def("bench_dbt_raw")
+
+    def load_raw() -> int:
+        # Run ids are fixed by the payload paths, so every repeat gets a new instance
+        instance = dg.DagsterInstance.ephemeral()
+        instance.add_dynamic_partitions(
+            users_partitions.name, [user_name for _, user_name, _ in runs]
+        )
+        for run_id, user_name, _ in runs:
+            dbt_raw_job.execute_in_process(
+                run_config={"ops": {"dbt_raw": {"config": config}}},
+                run_id=run_id,
+                partition_key=user_name,
+                instance=instance,
+            )
+        return entries
+
+    stage(
+        "dbt_raw",
+        load_raw,
+        setup=lambda: shutil.rmtree(Path(data_path, "raw_archive"), ignore_errors=True),
+    )
+
+    profiles_dir = write_profile(data_path, database)
+
+    def run_dbt() -> int:
+        # A subprocess like DbtCliResource, dbt-duckdb keeps its connection open
+        subprocess.run(
+            [
+                "dbt",
+                "run",
+                "--full-refresh",
+                "--quiet",
+                "--project-dir",
+                str(ROOT),
+                "--profiles-dir",
+                profiles_dir,
+                "--target-path",
+                str(Path(data_path, "target")),
+                "--log-path",
+                str(Path(data_path, "logs")),
+            ],
+            check=True,
+        )
+        with duckdb_read.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM dbt.anime_scores").fetchone()[0]
+
+    stage("dbt_models", run_dbt)
+
+    def plot_queries() -> int:
+        rows = 0
+        with duckdb_read.get_connection() as conn:
+            for query_filename in plot_query_filenames(
+                ResourceConfig(**config)
+            ).values():
+                with open(Path(QUERY_PATH, query_filename), "r") as query_file:
+                    rows += len(conn.execute(query_file.read()).fetchall())
+        return rows
+
+    stage("plot_queries", plot_queries)
+
+    def export_parquet() -> int:
+        result = store_anime_scores_parquet(
+            duckdb_read=duckdb_read,
+            config=AnimeScoresParquetConfig(**config, full_refresh=True),
+        )
+        return result.metadata["rows"].value
+
+    stage("store_anime_scores_parquet", export_parquet)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_pipeline")
+    parser.add_argument("-u", "--users", type=int, default=1)
+    parser.add_argument("-n", "--entries", type=int, default=1000)
+    parser.add_argument("-m", "--media", type=int)
+    parser.add_argument("--tags", type=int, default=10)
+    parser.add_argument("--genres", type=int, default=3)
+    parser.add_argument("--synonyms", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-r", "--repeat", type=int, default=1)
+    parser.add_argument("--memory", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("-o", "--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("-l", "--label")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    options = PayloadOptions(
+        users=args.users,
+        entries=args.entries,
+        media=args.media,
+        tags=args.tags,
+        genres=args.genres,
+        synonyms=args.synonyms,
+        seed=args.seed,
+    )
+    print(
+        f"{options.users} users x {options.entries} entries,"
+        f" {options.media_pool} media, repeat {args.repeat}"
+    )
+
+    payloads = []
+
+    def generate() -> int:
+        payloads[:] = list(make_payloads(options))
+        return options.users * options.entries
+
+    results = {"generate_payloads": measure(generate, 1, False)}
+    print(f"generated in {results['generate_payloads']['seconds']:.2f}s")
+    with tempfile.TemporaryDirectory() as data_path:
+        results |= run_stages(payloads, data_path, args.repeat, args.memory)
+
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "label": args.label,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": dataclasses.asdict(options),
+        "repeat": args.repeat,
+        "stages": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "a") as output_file:
+        output_file.write(json.dumps(record) + "\n")
+    print(f"results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+ROOT = Path(__file__).parent.parent.resolve()
+RESULTS_PATH = Path(__file__).parent.joinpath("results", "bench_startup.jsonl")
+MANIFEST_DIGEST_PATH = ROOT.joinpath("target", "manifest.sha256")
+
+# Modules that should only be imported by the steps that use them
+HEAVY_MODULES = ["pandas", "pyarrow", "plotly", "kaleido", "kafka", "dbt.cli.main"]
+
+# What a code server or run worker does before it can serve a request
+LOAD_DEFINITIONS = f"""
+import json, sys, time
+started = time.perf_counter()
+import anime_data_pipeline.definitions as definitions
+definitions.defs()
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "modules": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_child(
+    code: str, env: dict[str, str], *flags: str
+) -> tuple[float, Optional[dict[str, Any]], str]:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=ROOT,
+        env=os.environ | env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = time.perf_counter() - started
+    lines = completed.stdout.strip().splitlines()
+    return seconds, json.loads(lines[-1]) if lines else None, completed.stderr
+
+
+def measure(
+    code: str,
+    env: dict[str, str],
+    repeat: int,
+    setup: Callable[[], Any] = lambda: None,
+) -> dict[str, Any]:
+    # Every run is a fresh interpreter, so nothing is shared between them
+    runs, loads = [], []
+    try:
+        for _ in range(repeat):
+            setup()
+            seconds, output, _ = run_child(code, env)
+            runs.append(seconds)
+            if output:
+                loads.append(output["seconds"])
+    except subprocess.CalledProcessError as err:
+        return {"error": err.stderr.strip().splitlines()[-1]}
+    return {
+        "seconds": min(runs),
+        "median_seconds": statistics.median(runs),
+        "runs": runs,
+        "load_seconds": min(loads) if loads else None,
+        "modules": output["modules"] if output else None,
+    }
+
+
+def import_times(env: dict[str, str], top: int) -> list[tuple[str, float]]:
+    # -X importtime reports cumulative microseconds per module on stderr
+    _, _, stderr = run_child(LOAD_DEFINITIONS, env, "-X", "importtime")
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total) / 1e6
+    return sorted(cumulative.items(), key=lambda item: -item[1])[:top]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser("bench_startup")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--parse",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Also time dagster dev loads that re-parse the dbt project",
+    )
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("-o", "--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("-l", "--label")
+    args = parser.parse_args()
+
+    dev = {"DAGSTER_IS_DEV_CLI": "1"}
+    # The first dev load parses the project if the manifest is missing or stale
+    run_child(LOAD_DEFINITIONS, dev)
+
+    scenarios = {
+        "python": ("pass", {}, lambda: None),
+        "load_definitions": (LOAD_DEFINITIONS, {}, lambda: None),
+        "load_definitions_dev": (LOAD_DEFINITIONS, dev, lambda: None),
+    }
+    if args.parse:
+        scenarios["load_definitions_dev_parse"] = (
+            LOAD_DEFINITIONS,
+            dev,
+            lambda: MANIFEST_DIGEST_PATH.unlink(missing_ok=True),
+        )
+
+    print(f"repeat {args.repeat}")
+    print(f"{'scenario':<28} {'wall':>10} {'median':>10} {'load':>10}  modules")
+    results = {}
+    for name, (code, env, setup) in scenarios.items():
+        result = results[name] = measure(code, env, args.repeat, setup)
+        if "error" in result:
+            print(f"{name:<28} failed: {result['error']}")
+            continue
+        load = result["load_seconds"]
+        print(
+            f"{name:<28} {result['seconds']:>9.2f}s {result['median_seconds']:>9.2f}s"
+            f" {f'{load:.2f}s' if load is not None else '':>10}"
+            f"  {', '.join(result['modules'] or [])}"
+        )
+
+    imports = import_times({}, args.top)
+    print(f"\n{'slowest imports (cumulative)':<60} {'seconds':>10}")
+    for module, seconds in imports:
+        print(f"{module:<60} {seconds:>10.3f}")
+
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "label": args.label,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "scenarios": results,
+        "imports": imports,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "a") as output_file:
+        output_file.write(json.dumps(record) + "\n")
+    print(f"results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
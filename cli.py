@@ -1,8 +1,20 @@
 import argparse
+import duckdb
 import json
+import orjson
 import time
 
 from kafka import KafkaConsumer
+from pathlib import Path
+
+from anime_data_pipeline.lib import query_builder
+from anime_data_pipeline.lib.streaming import (
+    MicroBatch,
+    SinkStats,
+    header_partition_key,
+    record_partition_keys,
+    replay_entries,
+)
 
 
 class KafkaCLI:
@@ -52,13 +64,137 @@ class KafkaCLI:
         print("closing")
         consumer.close()
 
+    def sink(
+        self,
+        database: str,
+        schema: str,
+        group_id: str,
+        user_topic: str,
+        media_topic: str,
+        batch_records: int,
+        batch_bytes: int,
+        batch_seconds: float,
+        idle_seconds: float,
+        retry_seconds: float,
+    ):
+        # Dagster and dbt import slowly, so only the sink pays for them
+        from anime_data_pipeline.defs.assets import merge_events
+
+        print(self)
+        consumer = KafkaConsumer(
+            user_topic,
+            media_topic,
+            bootstrap_servers=[self.url],
+            value_deserializer=lambda value: value and orjson.loads(value),
+            api_version=self.version,
+            group_id=group_id,
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+            max_poll_records=batch_records,
+        )
+        batch = MicroBatch(batch_records, batch_bytes, batch_seconds)
+        stats = SinkStats()
+        idle_since = time.monotonic()
+        failures, retry_at = 0, 0.0
+
+        def lag() -> int:
+            partitions = consumer.assignment()
+            end_offsets = consumer.end_offsets(list(partitions))
+            return sum(end_offsets[tp] - consumer.position(tp) for tp in partitions)
+
+        def flush() -> bool:
+            nonlocal failures, retry_at
+            messages, size = batch.count, batch.bytes
+            records = batch.drain()
+            # Replay in order so the last event per key wins, tombstones included
+            user_records = records.get(user_topic, [])
+            media_records = records.get(media_topic, [])
+            users = {key: value for key, value, _ in user_records}
+            entries, deleted = replay_entries(
+                (key, value) for key, value, _ in media_records
+            )
+            partition_keys = record_partition_keys(user_records + media_records)
+            # A short-lived connection leaves the lock free for Dagster between batches
+            try:
+                with duckdb.connect(database) as conn:
+                    counts = merge_events(
+                        conn,
+                        schema,
+                        [value for value in users.values() if value is not None],
+                        entries,
+                        deleted,
+                        partition_keys,
+                    )
+            except duckdb.IOException as err:
+                # Dagster holds the lock; the batch is kept and written once it is free
+                batch.requeue(records, messages, size)
+                delay = min(retry_seconds * 2**failures, 60.0)
+                failures, retry_at = failures + 1, time.monotonic() + delay
+                print(f"database busy, retrying in {delay:.1f}s: {err}")
+                return False
+            failures, retry_at = 0, 0.0
+            # Offsets only move once the batch is in DuckDB, so a crash replays it
+            consumer.commit()
+            stats.record_batch(messages, size, sum(counts.values()), lag())
+            print(f"wrote {counts}; {stats.summary()}")
+            return True
+
+        try:
+            while True:
+                wait = max(batch.remaining_seconds(), retry_at - time.monotonic())
+                timeout_ms = int(wait * 1000) or 1
+                polled = consumer.poll(timeout_ms=timeout_ms)
+                for messages in polled.values():
+                    for msg in messages:
+                        size = max(msg.serialized_value_size, 0)
+                        partition_key = header_partition_key(msg.headers)
+                        batch.add(msg.topic, (msg.key, msg.value, partition_key), size)
+                if polled:
+                    idle_since = time.monotonic()
+                if batch.ready() and time.monotonic() >= retry_at:
+                    flush()
+                if idle_seconds and time.monotonic() - idle_since >= idle_seconds:
+                    print(f"idle for {idle_seconds}s, stopping")
+                    break
+        except KeyboardInterrupt:
+            print("interrupted, flushing")
+        finally:
+            # A batch still unwritten is not committed, so the next start replays it
+            while batch.count and not flush() and failures < 5:
+                time.sleep(max(retry_at - time.monotonic(), 0.0))
+            print(f"processed {stats.summary()}")
+            print("closing")
+            consumer.close()
+
+
+class QueryCLI:
+    def __init__(self, assets=None):
+        self.assets = assets or list(query_builder.ASSET_MODELS)
+
+    def build(self, output=None, payload=None):
+        query = query_builder.build_anilist_query(self.assets)
+        if output:
+            Path(output).write_text(query)
+            print(f"wrote {output}")
+        else:
+            print(query)
+
+        if payload:
+            with open(payload, "r") as payload_file:
+                data = json.load(payload_file)
+            report = query_builder.payload_size_report(data, self.assets)
+            print(
+                f"payload {report['before_bytes']} bytes -> {report['after_bytes']} bytes"
+                f" ({report['reduction']:.1%} smaller)"
+            )
+
 
 parser = argparse.ArgumentParser("cli")
 subparsers = parser.add_subparsers(dest="command", help="CLI commands", required=True)
 
 kafka_parser = subparsers.add_parser("kafka", help="Run Kafka commands")
 kafka_parser.add_argument(
-    "sub_command", type=str, help="Kafka sub-commands", choices=["consume"]
+    "sub_command", type=str, help="Kafka sub-commands", choices=["consume", "sink"]
 )
 kafka_parser.add_argument(
     "-u",
@@ -85,6 +221,93 @@ kafka_parser.add_argument(
     default=["raw_user", "raw_media"],
     help="Kafka topics",
 )
+kafka_parser.add_argument(
+    "-d",
+    "--database",
+    metavar="database",
+    type=str,
+    default="./data/anime_data.duckdb",
+    help="DuckDB database the sink writes to",
+)
+kafka_parser.add_argument(
+    "-s",
+    "--schema",
+    metavar="schema",
+    type=str,
+    default="pandas",
+    help="Schema holding fact_anime, dimension_media and dimension_user",
+)
+kafka_parser.add_argument(
+    "-g",
+    "--group-id",
+    metavar="group_id",
+    type=str,
+    default="anime_data_pipeline_sink",
+    help="Consumer group the sink commits offsets for",
+)
+kafka_parser.add_argument(
+    "--batch-records",
+    metavar="records",
+    type=int,
+    default=5000,
+    help="Write a batch once it holds this many messages",
+)
+kafka_parser.add_argument(
+    "--batch-bytes",
+    metavar="bytes",
+    type=int,
+    default=8 * 1024 * 1024,
+    help="Write a batch once its messages add up to this many bytes",
+)
+kafka_parser.add_argument(
+    "--batch-seconds",
+    metavar="seconds",
+    type=float,
+    default=5.0,
+    help="Write a batch once its oldest message is this old",
+)
+kafka_parser.add_argument(
+    "--idle-seconds",
+    metavar="seconds",
+    type=float,
+    default=0.0,
+    help="Stop the sink after this long without messages (default: never)",
+)
+kafka_parser.add_argument(
+    "--retry-seconds",
+    metavar="seconds",
+    type=float,
+    default=1.0,
+    help="First wait before retrying a batch while the database is locked",
+)
+
+query_parser = subparsers.add_parser("query", help="Build AniList queries")
+query_parser.add_argument(
+    "sub_command", type=str, help="Query sub-commands", choices=["build"]
+)
+query_parser.add_argument(
+    "-a",
+    "--assets",
+    metavar="assets",
+    type=str,
+    action="append",
+    choices=list(query_builder.ASSET_MODELS),
+    help="Assets the query has to feed (default: all)",
+)
+query_parser.add_argument(
+    "-o",
+    "--output",
+    metavar="output",
+    type=str,
+    help="File to write the query to (default: stdout)",
+)
+query_parser.add_argument(
+    "-p",
+    "--payload",
+    metavar="payload",
+    type=str,
+    help="Full raw_anilist JSON to report the pruned payload size against",
+)
 
 args = parser.parse_args()
 
@@ -92,3 +315,21 @@ if args.command == "kafka":
     kafka_cli = KafkaCLI(args.url, args.version, args.topics)
     if args.sub_command == "consume":
         kafka_cli.consume()
+    elif args.sub_command == "sink":
+        user_topic, media_topic = args.topics[:2]
+        kafka_cli.sink(
+            args.database,
+            args.schema,
+            args.group_id,
+            user_topic,
+            media_topic,
+            args.batch_records,
+            args.batch_bytes,
+            args.batch_seconds,
+            args.idle_seconds,
+            args.retry_seconds,
+        )
+elif args.command == "query":
+    query_cli = QueryCLI(args.assets)
+    if args.sub_command == "build":
+        query_cli.build(args.output, args.payload)
@@ -0,0 +1,21 @@
+{% macro new_snapshots(partition_column=none) %}
+  {% if is_incremental() %}
+  {% set watermark %}(SELECT COALESCE(MAX(loaded_at), '-infinity'::TIMESTAMP) FROM {{ this }}){% endset %}
+  WHERE
+    loaded_at > {{ watermark }}
+    {% if partition_column %}
+    -- Lets the raw archive scan skip ingest_date partitions before the watermark
+    AND {{ partition_column }} >= {{ watermark }}::DATE
+    {% endif %}
+  {% endif %}
+{% endmacro %}
+
+{% macro latest_per_key(key) %}
+  QUALIFY
+    ROW_NUMBER() OVER (PARTITION BY {{ key }} ORDER BY loaded_at DESC) = 1
+{% endmacro %}
+
+{% macro latest_snapshot(key) %}
+  QUALIFY
+    loaded_at = MAX(loaded_at) OVER (PARTITION BY {{ key }})
+{% endmacro %}
@@ -0,0 +1,15 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='media_id',
+    incremental_strategy='delete+insert'
+  )
+}}
+
+SELECT
+  id AS media_id,
+  UNNEST(synonyms) AS synonym,
+  loaded_at
+FROM
+  {{ ref('dimension_media') }}
+{{ new_snapshots() }}
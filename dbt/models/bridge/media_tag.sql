@@ -0,0 +1,25 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='media_id',
+    incremental_strategy='delete+insert'
+  )
+}}
+
+WITH tags AS (
+  SELECT
+    id AS media_id,
+    UNNEST(tags) AS tag,
+    loaded_at
+  FROM
+    {{ ref('dimension_media') }}
+  {{ new_snapshots() }}
+)
+SELECT
+  media_id,
+  tag ->> '$.name' AS tag,
+  tag ->> '$.category' AS category,
+  (tag -> '$.rank')::INT64 AS rank,
+  loaded_at
+FROM
+  tags
@@ -1,8 +1,18 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='id',
+    incremental_strategy='delete+insert'
+  )
+}}
+
 WITH lists AS (
   SELECT
-    UNNEST((data -> '$.lists[*].entries[*]')::JSON[]) AS entry
+    UNNEST((data -> '$.lists[*].entries[*]')::JSON[]) AS entry,
+    loaded_at
   FROM
     {{ ref('stg_media') }}
+  {{ new_snapshots('ingest_date') }}
 )
 SELECT
   (entry -> '$.media.id')::INT64 AS id,
@@ -22,6 +32,8 @@ SELECT
   (entry ->> '$.media.source') AS source,
   (entry ->> '$.media.bannerImage') AS banner_image,
   (entry ->> '$.media.siteUrl') AS site_url,
-  (entry ->> '$.media.status') AS status
+  (entry ->> '$.media.status') AS status,
+  loaded_at
 FROM
   lists
+{{ latest_per_key('id') }}
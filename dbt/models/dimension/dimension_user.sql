@@ -1,9 +1,20 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='id',
+    incremental_strategy='delete+insert'
+  )
+}}
+
 SELECT
   (data -> '$.id')::INT64 AS id,
   data ->> '$.name' AS name,
   data ->> '$.avatar.large' AS avatar,
   data ->> '$.bannerImage' AS banner_image,
   data ->> '$.siteUrl' AS site_url,
-  data -> '$.statistics' AS statistics
+  data -> '$.statistics' AS statistics,
+  loaded_at
 FROM
   {{ ref('stg_user') }}
+{{ new_snapshots('ingest_date') }}
+{{ latest_per_key('id') }}
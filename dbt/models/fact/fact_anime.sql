@@ -1,8 +1,27 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='user_id',
+    incremental_strategy='delete+insert'
+  )
+}}
+
 WITH lists AS (
   SELECT
-    UNNEST((data -> '$.lists[*].entries[*]')::JSON[]) AS entry
+    UNNEST((data -> '$.lists[*].entries[*]')::JSON[]) AS entry,
+    loaded_at
   FROM
     {{ ref('stg_media') }}
+  {{ new_snapshots('ingest_date') }}
+),
+-- Each snapshot is a user's whole list, so the latest one replaces every row the
+-- user had and entries removed since the last run are dropped
+latest AS (
+  SELECT
+    *
+  FROM
+    lists
+  {{ latest_snapshot("entry ->> '$.userId'") }}
 )
 SELECT
   (entry -> '$.id')::INT64 AS id,
@@ -20,6 +39,8 @@ SELECT
   {{ convert_to_date('startedAt') }} AS started_at,
   {{ convert_to_date('completedAt') }} AS completed_at,
   (entry -> '$.media.stats') AS stats,
-  (entry -> '$.media.rankings') AS rankings
+  (entry -> '$.media.rankings') AS rankings,
+  loaded_at
 FROM
-  lists
+  latest
+{{ latest_per_key('id') }}
@@ -1,3 +1,12 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='user_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='append_new_columns'
+  )
+}}
+
 WITH stats AS (
   SELECT
     media_id,
@@ -9,9 +18,11 @@ WITH stats AS (
     mean_score,
     popularity,
     trending,
-    favourites
+    favourites,
+    loaded_at
   FROM
     {{ ref('fact_anime') }}
+  {{ new_snapshots() }}
 ),
 users AS (
   SELECT
@@ -27,9 +38,6 @@ media AS (
     title ->> '$.native' AS native_title,
     title ->> '$.romaji' AS romaji_title,
     description,
-    UNNEST(synonyms) AS synonym,
-    UNNEST(genres) AS genre,
-    UNNEST(tags) ->> '$.name' AS tag,
     source,
     episodes,
     season,
@@ -39,6 +47,40 @@ media AS (
     status
   FROM
     {{ ref('dimension_media') }}
+),
+-- Bridge rows folded back into one list per media, so entries are not fanned out
+genres AS (
+  SELECT
+    media_id,
+    LIST(genre ORDER BY genre) AS genres
+  FROM
+    {{ ref('media_genre') }}
+  WHERE
+    media_id IN (SELECT media_id FROM stats)
+  GROUP BY
+    media_id
+),
+tags AS (
+  SELECT
+    media_id,
+    LIST(tag ORDER BY rank DESC, tag) AS tags
+  FROM
+    {{ ref('media_tag') }}
+  WHERE
+    media_id IN (SELECT media_id FROM stats)
+  GROUP BY
+    media_id
+),
+synonyms AS (
+  SELECT
+    media_id,
+    LIST(synonym ORDER BY synonym) AS synonyms
+  FROM
+    {{ ref('media_synonym') }}
+  WHERE
+    media_id IN (SELECT media_id FROM stats)
+  GROUP BY
+    media_id
 )
 SELECT
   users.id AS user_id,
@@ -48,9 +90,9 @@ SELECT
   media.native_title AS native_title,
   media.romaji_title AS romaji_title,
   media.description AS description,
-  media.synonym AS synonym,
-  media.genre AS genre,
-  media.tag AS tag,
+  synonyms.synonyms AS synonyms,
+  genres.genres AS genres,
+  tags.tags AS tags,
   media.source AS source,
   media.episodes AS episodes,
   media.season AS season,
@@ -65,8 +107,12 @@ SELECT
   stats.mean_score AS mean_score,
   stats.popularity AS popularity,
   stats.trending AS trending,
-  stats.favourites AS favourites
+  stats.favourites AS favourites,
+  stats.loaded_at AS loaded_at
 FROM
   stats
   JOIN users ON stats.user_id = users.id
   JOIN media ON stats.media_id = media.id
+  LEFT JOIN genres ON stats.media_id = genres.media_id
+  LEFT JOIN tags ON stats.media_id = tags.media_id
+  LEFT JOIN synonyms ON stats.media_id = synonyms.media_id
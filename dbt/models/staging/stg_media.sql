@@ -1,6 +1,9 @@
 WITH source AS (
   SELECT
-    data -> '$.MediaListCollection' AS data
+    data -> '$.MediaListCollection' AS data,
+    loaded_at,
+    user_name,
+    ingest_date
   FROM
     {{ source('anime_data', 'raw_anilist') }}
 )
@@ -1,6 +1,9 @@
 WITH source AS (
   SELECT
-    data -> '$.User' AS data
+    data -> '$.User' AS data,
+    loaded_at,
+    user_name,
+    ingest_date
   FROM
     {{ source('anime_data', 'raw_anilist') }}
 )
@@ -27,9 +27,9 @@ media AS (
     title ->> '$.native' AS native_title,
     title ->> '$.romaji' AS romaji_title,
     description,
-    UNNEST (synonyms) AS synonym,
-    UNNEST (genres) AS genre,
-    UNNEST (tags) ->> '$.name' AS tag,
+    synonyms,
+    genres,
+    list_transform(tags, tag -> tag.name) AS tags,
     source,
     episodes,
     season,
@@ -1,6 +1,6 @@
 SELECT
   score,
-  COUNT(DISTINCT(media_id)) AS count
+  COUNT(*) AS count
 FROM
   dbt.anime_scores
 WHERE
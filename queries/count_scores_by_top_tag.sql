@@ -1,17 +1,18 @@
 WITH stats AS (
   SELECT
-    tag,
-    score,
+    media_tag.tag,
+    anime_scores.score,
     COUNT(*) AS count,
-    ROW_NUMBER() OVER (PARTITION BY score ORDER BY count DESC) AS rank
+    ROW_NUMBER() OVER (PARTITION BY anime_scores.score ORDER BY count DESC) AS rank
   FROM
     dbt.anime_scores
+    JOIN dbt.media_tag ON anime_scores.media_id = media_tag.media_id
   WHERE
-    tag IS NOT NULL AND score > 0.0
+    anime_scores.score > 0.0
   GROUP BY
-    tag, score
+    media_tag.tag, anime_scores.score
   ORDER BY
-    count DESC, score DESC
+    count DESC, anime_scores.score DESC
 )
 SELECT
   *
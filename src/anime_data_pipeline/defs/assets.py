@@ -1,6 +1,7 @@
 import dagster as dg
+import duckdb
 import pandas as pd
-import plotly.express as px
+import pyarrow as pa
 import json
 import re
 import base64
@@ -8,19 +9,51 @@ import base64
 from pydantic import ValidationError, BaseModel
 from dagster_duckdb import DuckDBResource
 from dagster_dbt import DbtCliResource, dbt_assets, get_asset_key_for_model
-from typing import Any
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence
 from pathlib import Path
-
-from .resources import AniListAPIResource, ResourceConfig, KafkaResource
+from dataclasses import asdict
+
+from .resources import (
+    AniListAPIResource,
+    ResourceConfig,
+    KafkaResource,
+    PlotRendererResource,
+    DUCKDB_CHECK_TAGS,
+    DUCKDB_POOL,
+    DUCKDB_TAGS,
+    resource_config,
+)
+from .instrumentation import instrumented
+from .partitions import users_partitions
 from .project import adp_dbt_project
 from ..lib import schemas
+from ..lib.ndjson import NDJSONWriter
+from ..lib.serialization import codec_for_path
+from ..lib.validation import StreamingValidator
+from ..lib.columnar import RowError, convert_entries_columnar
+from ..lib.quality import ForeignKey, Fresh, InRange, NotNull, Suite, Unique
+from ..lib.plots import PlotCache, PlotRenderer, result_digest
+from ..lib.parquet_store import ParquetOptions, ParquetStore, split_partitions
+from ..lib.streaming import ContentIndex
+from ..lib.tables import Table, has_table, merge_dataframe
+from ..lib.tracing import current_span, span
 
 log = dg.get_dagster_logger()
 
 
+def partition_user_name(
+    context: dg.AssetExecutionContext, anilist_api: AniListAPIResource
+) -> str:
+    # Partitioned runs are for one user; unpartitioned ones use the configured user
+    return context.partition_key if context.has_partition_key else anilist_api.user_name
+
+
 @dg.asset(
     group_name="setup",
+    op_tags=DUCKDB_TAGS,
+    pool=DUCKDB_POOL,
 )
+@instrumented
 def ensure_data_exists(
     duckdb: DuckDBResource, config: ResourceConfig
 ) -> dg.MaterializeResult:
@@ -34,35 +67,136 @@ def ensure_data_exists(
         return dg.MaterializeResult(metadata=metadata)
 
 
+class RawAniListConfig(ResourceConfig):
+    skip_unchanged: bool = True
+
+
+DATA_VERSION_TAG = "dagster/data_version"
+
+
+def latest_data_version(context: dg.AssetExecutionContext) -> Optional[str]:
+    partitions = [context.partition_key] if context.has_partition_key else None
+    records = context.instance.fetch_materializations(
+        dg.AssetRecordsFilter(asset_key=context.asset_key, asset_partitions=partitions),
+        limit=1,
+    ).records
+    if not records or records[0].asset_materialization is None:
+        return None
+    return records[0].asset_materialization.tags.get(DATA_VERSION_TAG)
+
+
 @dg.asset(
     group_name="ingest",
     kinds={"python"},
     io_manager_key="local_io_manager",
     deps=[ensure_data_exists],
+    partitions_def=users_partitions,
+    output_required=False,
 )
-def raw_anilist(anilist_api: AniListAPIResource, config: ResourceConfig) -> dg.Output:
-    data = anilist_api.query(config.anilist_query_filename)
+@instrumented
+def raw_anilist(
+    context: dg.AssetExecutionContext,
+    anilist_api: AniListAPIResource,
+    config: RawAniListConfig,
+) -> Iterator[dg.Output]:
+    user_name = partition_user_name(context, anilist_api)
+    response = anilist_api.fetch(config.anilist_query_filename, user_name)
+
+    # Same payload as this partition's last materialization: skip the output so
+    # downstream assets are not rerun. A cache hit alone does not mean that, the
+    # entry may have been stored by another asset or a failed run.
+    unchanged = response.digest == latest_data_version(context)
+    if unchanged and config.skip_unchanged:
+        log.info(f"raw_anilist unchanged ({response.digest}), skipping downstream")
+        return
+
     metadata = {
-        "user_name": anilist_api.user_name,
+        "user_name": user_name,
+        "size": dg.MetadataValue.int(response.size),
+        "source": response.source,
+        "unchanged": unchanged,
+    } | anilist_api.cache_metadata()
+    yield dg.Output(
+        value=response.data,
+        metadata=metadata,
+        data_version=dg.DataVersion(response.digest),
+    )
+
+
+class AniListPagesConfig(ResourceConfig):
+    per_page: int = 50
+    raw_entries_filename: str = "raw_anilist_entries.ndjson"
+
+
+# Paged alternative to raw_anilist for very large lists; only one page is held in
+# memory and each lands on disk before the next is requested
+@dg.asset(
+    group_name="ingest",
+    kinds={"python"},
+    deps=[ensure_data_exists],
+    partitions_def=users_partitions,
+)
+@instrumented
+def raw_anilist_entries(
+    context: dg.AssetExecutionContext,
+    anilist_api: AniListAPIResource,
+    config: AniListPagesConfig,
+) -> dg.MaterializeResult:
+    user_name = partition_user_name(context, anilist_api)
+    entries_path = Path(
+        config.data_path, context.run.run_id, user_name, config.raw_entries_filename
+    )
+
+    pages = 0
+    with NDJSONWriter(entries_path) as writer:
+        for entries in anilist_api.query_pages(
+            config.anilist_page_query_filename, user_name, per_page=config.per_page
+        ):
+            writer.write(entries)
+            pages += 1
+    current_span().record(rows_out=writer.rows, bytes_written=writer.bytes)
+
+    metadata = {
+        "user_name": user_name,
+        "pages": dg.MetadataValue.int(pages),
+        "entries": dg.MetadataValue.int(writer.rows),
+        "size": dg.MetadataValue.int(writer.bytes),
+        "path": dg.MetadataValue.path(str(entries_path)),
     }
-    return dg.Output(value=data, metadata=metadata)
+    return dg.MaterializeResult(metadata=metadata)
+
+
+class RawAniListCheckConfig(ResourceConfig):
+    max_errors: int = 20
 
 
 @dg.asset_check(asset=raw_anilist, blocking=True)
-def raw_anilist_validate_check(raw_anilist: dg.Output) -> dg.AssetCheckResult:
-    try:
-        schemas.Raw.model_validate(raw_anilist)
-        size = len(bytes(json.dumps(raw_anilist).encode()))
-        metadata = {
-            "size": dg.MetadataValue.int(size),
-        }
+@instrumented
+def raw_anilist_validate_check(
+    raw_anilist: Path, config: RawAniListCheckConfig
+) -> dg.AssetCheckResult:
+    # Streams the stored file instead of loading and re-serializing the payload
+    validator = StreamingValidator(max_errors=config.max_errors)
+    report = validator.validate_file(raw_anilist, codec_for_path(raw_anilist))
+    current_span().record(rows_in=report.entries, bytes_read=report.size)
+    metadata = {
+        "size": dg.MetadataValue.int(report.size),
+        "entries": dg.MetadataValue.int(report.entries),
+        "lists": dg.MetadataValue.json(report.lists),
+    }
+    if report.passed:
         return dg.AssetCheckResult(passed=True, metadata=metadata)
-    except ValidationError as err:
-        log.error(err)
-        metadata = {
-            "error": dg.MetadataValue.text("raw_anilist validation failed"),
-        }
-        return dg.AssetCheckResult(passed=False, metadata=metadata)
+
+    for error in report.errors:
+        log.error(f"{error.path}: {error.error}")
+    metadata |= {
+        "error": dg.MetadataValue.text("raw_anilist validation failed"),
+        "error_count": dg.MetadataValue.int(report.error_count),
+        "errors": dg.MetadataValue.json(
+            [{"path": error.path, "error": error.error} for error in report.errors]
+        ),
+    }
+    return dg.AssetCheckResult(passed=False, metadata=metadata)
 
 
 def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
@@ -81,302 +215,760 @@ def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def convert_anilist_json_to_model(data: Any, model: type[BaseModel]) -> pd.DataFrame:
-    try:
-        lists = data["data"]["MediaListCollection"]["lists"]
-
-        models = []
-        for lst in lists:
-            for entry in lst["entries"]:
-                try:
-                    media = entry["media"]
-                    status = media["status"]
-                    watch_status = entry["status"]
-                    data = (
-                        media
-                        | entry
-                        | {
-                            "status": status,
-                            "watchStatus": watch_status,
-                        }
-                    )
-                    fact = model.model_validate(data).model_dump()
-                    models.append(fact)
-                except ValidationError as err:
-                    log.error(err)
-
-        log.debug(models[:5])
-
-        df = pd.DataFrame.from_dict(models)
-        df = normalize_df(df)
-
-        return df
-    except KeyError as err:
-        log.error(err)
-        return pd.DataFrame()
+def iter_anilist_entries(data: Any) -> Iterator[Any]:
+    for lst in data["data"]["MediaListCollection"]["lists"]:
+        yield from lst["entries"]
 
 
-def validate_dataframe(df: pd.DataFrame) -> dg.AssetCheckResult:
-    rows = len(df)
-    preview = df.tail().drop(
-        ["stats", "rankings", "statistics", "genres", "tags", "synonyms"],
-        axis=1,
-        errors="ignore",
-    )
-    metadata = {
-        "rows": dg.MetadataValue.int(rows),
-        "preview": dg.MetadataValue.md(preview.to_markdown()),
-    }
-    if rows == 0:
-        metadata["error"] = "no rows processed"
-    return dg.AssetCheckResult(passed=rows > 0, metadata=metadata)
+def flatten_entry(entry: Any) -> dict[str, Any]:
+    media = entry["media"]
+    return media | entry | {"status": media["status"], "watchStatus": entry["status"]}
 
 
-@dg.asset(
-    group_name="pandas",
-    kinds={"duckdb", "pandas"},
-    io_manager_key="duckdb_io_manager",
-    deps=[raw_anilist],
-)
-def fact_anime(raw_anilist: Any) -> pd.DataFrame:
-    return convert_anilist_json_to_model(raw_anilist, schemas.FactAnime)
+def flatten_anilist_entries(entries: Iterable[Any]) -> Iterator[dict[str, Any]]:
+    for entry in entries:
+        yield flatten_entry(entry)
 
 
-@dg.asset_check(asset=fact_anime, blocking=True)
-def fact_anime_validate_check(fact_anime: pd.DataFrame) -> dg.AssetCheckResult:
-    return validate_dataframe(fact_anime)
+def convert_flattened_to_models(
+    rows: Iterable[dict[str, Any]], models: Sequence[type[BaseModel]]
+) -> list[pd.DataFrame]:
+    records: list[list[dict[str, Any]]] = [[] for _ in models]
+    for row in rows:
+        for model, model_records in zip(models, records):
+            try:
+                # Validators rewrite top-level fields in place, so each model gets a copy
+                model_records.append(model.model_validate(dict(row)).model_dump())
+            except ValidationError as err:
+                log.error(err)
 
+    log.debug([model_records[:5] for model_records in records])
 
-@dg.asset(
-    group_name="pandas",
-    kinds={"duckdb", "pandas"},
-    io_manager_key="duckdb_io_manager",
-    deps=[raw_anilist],
-)
-def dimension_media(raw_anilist: Any) -> pd.DataFrame:
-    return convert_anilist_json_to_model(raw_anilist, schemas.DimensionMedia)
+    return [normalize_df(pd.DataFrame.from_dict(r)) for r in records]
 
 
-@dg.asset_check(asset=dimension_media, blocking=True)
-def dimension_media_validate_check(
-    dimension_media: pd.DataFrame,
-) -> dg.AssetCheckResult:
-    return validate_dataframe(dimension_media)
+def convert_entries_to_model(
+    entries: Iterable[Any], model: type[BaseModel]
+) -> pd.DataFrame:
+    return convert_flattened_to_models(flatten_anilist_entries(entries), [model])[0]
 
 
-@dg.asset(
-    group_name="pandas",
-    kinds={"duckdb", "pandas"},
-    io_manager_key="duckdb_io_manager",
-    deps=[raw_anilist],
-)
-def dimension_user(raw_anilist: Any) -> pd.DataFrame:
+def convert_anilist_json_to_model(data: Any, model: type[BaseModel]) -> pd.DataFrame:
     try:
-        user = raw_anilist["data"]["User"]
-        models = [schemas.DimensionUser.model_validate(user).model_dump()]
+        return convert_entries_to_model(iter_anilist_entries(data), model)
+    except KeyError as err:
+        log.error(err)
+        return pd.DataFrame()
 
-        log.debug(models)
 
-        df = pd.DataFrame.from_dict(models)
-        df = normalize_df(df)
+def convert_entries_to_models(
+    entries: Sequence[Any], models: Sequence[type[BaseModel]], engine: str = "arrow"
+) -> list[pd.DataFrame]:
+    if engine == "pydantic":
+        with span("validate", engine=engine) as validate:
+            dfs = convert_flattened_to_models(flatten_anilist_entries(entries), models)
+            validate.record(rows_in=len(entries), rows_out=sum(len(df) for df in dfs))
+        return dfs
+    if engine != "arrow":
+        raise ValueError(f"unknown engine {engine}")
+
+    errors: list[RowError] = []
+    with span("validate", engine=engine) as validate:
+        dfs = convert_entries_columnar(entries, models, errors)
+        validate.record(rows_in=len(entries), rows_out=sum(len(df) for df in dfs))
+    with span("normalize"):
+        dfs = [normalize_df(df) for df in dfs]
+    for error in errors[:20]:
+        log.error(error)
+    if len(errors) > 20:
+        log.error(f"{len(errors) - 20} more invalid rows")
+    return dfs
+
+
+def convert_anilist_json_to_tables(
+    data: Any, engine: str = "arrow"
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    try:
+        entries = list(iter_anilist_entries(data))
+        current_span().record(rows_in=len(entries))
+        fact_df, media_df = convert_entries_to_models(
+            entries, [schemas.FactAnime, schemas.DimensionMedia], engine
+        )
+    except KeyError as err:
+        log.error(err)
+        fact_df, media_df = pd.DataFrame(), pd.DataFrame()
 
-        return df
+    try:
+        user = dict(data["data"]["User"])
+        (user_df,) = convert_flattened_to_models([user], [schemas.DimensionUser])
     except KeyError as err:
         log.error(err)
-        return pd.DataFrame()
+        user_df = pd.DataFrame()
+
+    return fact_df, media_df, user_df
+
+
+def check_table(table: Table, suite: Suite) -> dg.AssetCheckResult:
+    # Frames and Arrow tables passed in directly are scanned in place
+    if isinstance(table, pd.DataFrame):
+        table = duckdb.from_df(table)
+    elif isinstance(table, pa.Table):
+        table = duckdb.from_arrow(table)
+    report = suite.run(table)
+    current_span().record(rows_in=report.rows)
+
+    metadata = {
+        "rows": dg.MetadataValue.int(report.rows),
+        "rules": dg.MetadataValue.json([asdict(result) for result in report.results]),
+    }
+    if report.rows == 0:
+        metadata["error"] = "no rows processed"
+    elif not report.passed:
+        metadata["error"] = f"failed rules: {', '.join(report.failed)}"
+    return dg.AssetCheckResult(passed=report.passed, metadata=metadata)
+
+
+class AniListTablesConfig(ResourceConfig):
+    engine: str = "arrow"
+
+
+# A rewritten partition replaces only the rows stored under its key, which need
+# not match the AniList name's case. Rows merged from elsewhere are replaced by
+# id; media are shared between users, so they are only upserted.
+PARTITION_COLUMN = "partition_key"
+TABLE_METADATA = {
+    "fact_anime": {"partition_column": PARTITION_COLUMN, "merge_key": "id"},
+    "dimension_media": {"merge_key": "id"},
+    "dimension_user": {"partition_column": PARTITION_COLUMN, "merge_key": "id"},
+}
+
+QUALITY_SUITES = {
+    "fact_anime": Suite(
+        (
+            Unique("id"),
+            NotNull("user_id"),
+            NotNull("media_id"),
+            ForeignKey("media_id", f"{resource_config.duckdb_schema}.dimension_media"),
+            ForeignKey("user_id", f"{resource_config.duckdb_schema}.dimension_user"),
+            InRange("score", 0, 100),
+            InRange("average_score", 0, 10),
+            InRange("mean_score", 0, 10),
+            InRange("progress", 0),
+        )
+    ),
+    "dimension_media": Suite(
+        (
+            Unique("id"),
+            NotNull("title"),
+            InRange("episodes", 0),
+        )
+    ),
+    "dimension_user": Suite(
+        (
+            Unique("id"),
+            Unique("name"),
+            NotNull("name"),
+        )
+    ),
+}
+
+
+@dg.multi_asset(
+    outs={
+        name: dg.AssetOut(
+            group_name="pandas",
+            kinds={"duckdb", "pandas"},
+            io_manager_key="duckdb_io_manager",
+            metadata=metadata,
+        )
+        for name, metadata in TABLE_METADATA.items()
+    },
+    partitions_def=users_partitions,
+    op_tags=DUCKDB_TAGS,
+    pool=DUCKDB_POOL,
+)
+@instrumented
+def anilist_tables(
+    raw_anilist: Any, config: AniListTablesConfig
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    # One decode and one walk over the entries feeds all three tables
+    return convert_anilist_json_to_tables(raw_anilist, config.engine)
+
+
+# Unannotated table inputs load from duckdb_io_manager as lazy relations
+@dg.asset_check(asset="fact_anime", blocking=True, op_tags=DUCKDB_CHECK_TAGS)
+@instrumented
+def fact_anime_validate_check(
+    fact_anime: Any,
+) -> dg.AssetCheckResult:
+    return check_table(fact_anime, QUALITY_SUITES["fact_anime"])
+
+
+@dg.asset_check(asset="dimension_media", blocking=True, op_tags=DUCKDB_CHECK_TAGS)
+@instrumented
+def dimension_media_validate_check(
+    dimension_media: Any,
+) -> dg.AssetCheckResult:
+    return check_table(dimension_media, QUALITY_SUITES["dimension_media"])
 
 
-@dg.asset_check(asset=dimension_user, blocking=True)
-def dimension_user_validate_check(dimension_user: pd.DataFrame) -> dg.AssetCheckResult:
-    return validate_dataframe(dimension_user)
+@dg.asset_check(asset="dimension_user", blocking=True, op_tags=DUCKDB_CHECK_TAGS)
+@instrumented
+def dimension_user_validate_check(
+    dimension_user: Any,
+) -> dg.AssetCheckResult:
+    return check_table(dimension_user, QUALITY_SUITES["dimension_user"])
+
+
+def merge_events(
+    conn: Any,
+    schema: str,
+    users: Sequence[Any],
+    entries: Sequence[Any],
+    deleted_entries: Sequence[tuple[int, int]] = (),
+    partition_keys: Optional[Mapping[int, str]] = None,
+) -> dict[str, int]:
+    # Later events for the same id replace earlier ones within a batch
+    entries = list({entry.get("id"): entry for entry in entries}.values())
+    users = list({user.get("id"): user for user in users}.values())
+    dfs = {}
+    if entries:
+        dfs["fact_anime"], dfs["dimension_media"] = convert_entries_to_models(
+            entries, [schemas.FactAnime, schemas.DimensionMedia]
+        )
+    if users:
+        (dfs["dimension_user"],) = convert_flattened_to_models(
+            [dict(user) for user in users], [schemas.DimensionUser]
+        )
+    if partition_keys:
+        # Tagged like the partitioned writes, so re-running a partition replaces them
+        for table, user_id in (("fact_anime", "user_id"), ("dimension_user", "id")):
+            if table in dfs:
+                dfs[table][PARTITION_COLUMN] = dfs[table][user_id].map(partition_keys)
+
+    counts = {}
+    with span("duckdb.merge") as merge:
+        conn.begin()
+        try:
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema};")
+            for table, df in dfs.items():
+                if not df.empty:
+                    counts[table] = merge_dataframe(conn, f"{schema}.{table}", df)
+            # Tombstones drop one user's entry; the media stays in dimension_media
+            if deleted_entries and has_table(conn, schema, "fact_anime"):
+                user_ids, media_ids = zip(*deleted_entries)
+                (counts["deleted"],) = conn.execute(
+                    f"""
+                    DELETE FROM {schema}.fact_anime
+                    USING (SELECT UNNEST(?) AS user_id, UNNEST(?) AS media_id) deleted
+                    WHERE fact_anime.user_id = deleted.user_id
+                    AND fact_anime.media_id = deleted.media_id
+                    """,
+                    [list(user_ids), list(media_ids)],
+                ).fetchone()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        merge.record(rows_out=sum(counts.values()))
+    return counts
 
 
 @dg.asset(
     group_name="pandas",
     kinds={"duckdb", "pandas"},
-    deps=[fact_anime, dimension_media, dimension_user],
+    deps=[anilist_tables],
     automation_condition=dg.AutomationCondition.eager(),
+    op_tags=DUCKDB_TAGS,
+    pool=DUCKDB_POOL,
 )
-def anime_scores(duckdb: DuckDBResource, config: ResourceConfig) -> pd.DataFrame:
+@instrumented
+def anime_scores(
+    duckdb: DuckDBResource, config: ResourceConfig
+) -> dg.MaterializeResult:
+    # The view is the output; rows stay in DuckDB until something reads them
     query_path = Path(config.query_path, config.anime_scores_query_filename)
     with open(query_path, "r") as query_file:
         query = query_file.read()
 
-        with duckdb.get_connection() as conn:
-            conn.execute(
-                f"""
-                CREATE OR REPLACE VIEW
-                    {config.duckdb_schema}.anime_scores
-                AS
-                    {query}
-                """
-            )
+    view = f"{config.duckdb_schema}.anime_scores"
+    with duckdb.get_connection() as conn:
+        conn.execute(
+            f"""
+            CREATE OR REPLACE VIEW
+                {view}
+            AS
+                {query}
+            """
+        )
+        with span("duckdb.query") as count:
+            (rows,) = conn.sql(f"FROM {view}").count("*").fetchone()
+            count.record(rows_out=rows)
+    current_span().record(rows_out=rows)
 
-            df = conn.execute(
-                f"""
-                SELECT
-                    *
-                FROM
-                    {config.duckdb_schema}.anime_scores;
-                """
-            ).fetchdf()
+    metadata = {
+        "view": view,
+        "rows": dg.MetadataValue.int(rows),
+    }
+    return dg.MaterializeResult(metadata=metadata)
 
-            log.debug(df.tail())
 
-            return df
+ANIME_SCORES_SUITE = Suite(
+    (
+        NotNull("media_id"),
+        NotNull("user_id"),
+        InRange("score", 0, 100),
+        InRange("average_score", 0, 10),
+    )
+)
 
 
-@dg.asset_check(asset=anime_scores, blocking=True)
-def anime_scores_validate_check(anime_scores: pd.DataFrame) -> dg.AssetCheckResult:
-    return validate_dataframe(anime_scores)
+@dg.asset_check(asset=anime_scores, blocking=True, op_tags=DUCKDB_CHECK_TAGS)
+@instrumented
+def anime_scores_validate_check(
+    duckdb_read: DuckDBResource, config: ResourceConfig
+) -> dg.AssetCheckResult:
+    with duckdb_read.get_connection() as conn:
+        return check_table(
+            conn.sql(f"FROM {config.duckdb_schema}.anime_scores"), ANIME_SCORES_SUITE
+        )
 
 
 class DBTConfig(ResourceConfig):
     raw_json_filename: str = "raw_anilist.json"
+    raw_archive_dirname: str = "raw_archive"
     dbt_schema: str = "dbt"
     dbt_raw_table: str = "raw_anilist"
+    full_refresh: bool = False
 
 
 @dg.asset(
     group_name="dbt",
-    kinds={"duckdb"},
+    kinds={"duckdb", "parquet"},
     deps=[raw_anilist],
+    partitions_def=users_partitions,
+    op_tags=DUCKDB_TAGS,
+    pool=DUCKDB_POOL,
 )
+@instrumented
 def dbt_raw(
     context: dg.AssetExecutionContext,
     duckdb: DuckDBResource,
     config: DBTConfig,
-) -> None:
+) -> dg.MaterializeResult:
     run_id = context.run.run_id
-    raw_anilist_json_filepath = Path(config.data_path, run_id, config.raw_json_filename)
+    # Same layout as local_io_manager: <run_id>/<partition>/raw_anilist.json
+    partition = [context.partition_key] if context.has_partition_key else []
+    raw_anilist_json_filepath = Path(
+        config.data_path, run_id, *partition, config.raw_json_filename
+    )
+    archive_path = Path(config.data_path, config.raw_archive_dirname).resolve()
 
+    # A snapshot is one JSON object, larger than DuckDB's 16MiB default past ~6k entries
+    snapshot_size = raw_anilist_json_filepath.stat().st_size
+    object_size = max(snapshot_size + 1, 16 * 1024**2)
+    current_span().record(bytes_read=snapshot_size)
+
+    # Append-only archive with an explicit schema; readers prune on the partitions
     with duckdb.get_connection() as conn:
+        with span("duckdb.archive"):
+            conn.execute(
+                f"""
+                COPY (
+                    SELECT
+                        data,
+                        CURRENT_TIMESTAMP::TIMESTAMP AS loaded_at,
+                        '{run_id}' AS run_id,
+                        data ->> '$.User.name' AS user_name,
+                        CURRENT_DATE AS ingest_date
+                    FROM
+                        read_json(
+                            '{raw_anilist_json_filepath}',
+                            columns={{'data': 'JSON'}},
+                            maximum_object_size={object_size}
+                        )
+                ) TO '{archive_path}' (
+                    FORMAT parquet,
+                    PARTITION_BY (user_name, ingest_date),
+                    APPEND,
+                    FILENAME_PATTERN 'raw_{{uuid}}'
+                )
+                """
+            )
         conn.execute(f"CREATE SCHEMA IF NOT EXISTS {config.dbt_schema};")
+
+        # Before the archive, raw_anilist was a table holding only the latest
+        # snapshot, which this run's snapshot supersedes; the view takes its place
+        if has_table(conn, config.dbt_schema, config.dbt_raw_table):
+            conn.execute(f"DROP TABLE {config.dbt_schema}.{config.dbt_raw_table}")
         conn.execute(
-            f"CREATE OR REPLACE TABLE {config.dbt_schema}.{config.dbt_raw_table} AS SELECT * FROM '{raw_anilist_json_filepath}'"
+            f"""
+            CREATE OR REPLACE VIEW {config.dbt_schema}.{config.dbt_raw_table} AS
+            SELECT
+                *
+            FROM
+                read_parquet(
+                    '{archive_path}/**/*.parquet',
+                    hive_partitioning = true,
+                    hive_types = {{'user_name': 'VARCHAR', 'ingest_date': 'DATE'}}
+                )
+            """
         )
+        partition = conn.execute(
+            f"""
+            SELECT
+                user_name,
+                ingest_date::VARCHAR
+            FROM
+                {config.dbt_schema}.{config.dbt_raw_table}
+            WHERE
+                run_id = '{run_id}'
+            """
+        ).fetchone()
+
+    metadata = {
+        "archive_path": dg.MetadataValue.path(str(archive_path)),
+        "user_name": partition[0] if partition else None,
+        "ingest_date": partition[1] if partition else None,
+    }
+    return dg.MaterializeResult(metadata=metadata)
+
 
+class DBTRawCheckConfig(DBTConfig):
+    max_age_hours: float = 24.0
 
-@dg.asset_check(asset=dbt_raw, blocking=True)
+
+@dg.asset_check(asset=dbt_raw, blocking=True, op_tags=DUCKDB_CHECK_TAGS)
+@instrumented
 def dbt_raw_validate_check(
-    duckdb: DuckDBResource, config: DBTConfig
+    context: dg.AssetCheckExecutionContext,
+    duckdb_read: DuckDBResource,
+    config: DBTRawCheckConfig,
 ) -> dg.AssetCheckResult:
-    with duckdb.get_connection() as conn:
-        results = conn.execute(
-            f"SELECT COUNT(*) FROM {config.dbt_schema}.{config.dbt_raw_table}"
-        ).fetchone()
-        rows = results[0]
-    metadata = {"rows": dg.MetadataValue.int(rows)}
-    if rows == 0:
-        metadata["error"] = "no rows processed"
-    return dg.AssetCheckResult(passed=rows == 1, metadata=metadata)
+    suite = Suite(
+        (
+            Unique("run_id"),
+            NotNull("data"),
+            NotNull("user_name"),
+            Fresh("loaded_at", config.max_age_hours * 3600),
+        )
+    )
+    # Only this run's snapshot; the hive partition dbt_raw reported for it lets the
+    # scan skip the rest of the archive
+    run_id = context.run.run_id
+    filters, params = ["run_id = ?"], [run_id]
+    records = context.instance.get_records_for_run(
+        run_id, of_type=dg.DagsterEventType.ASSET_MATERIALIZATION
+    ).records
+    for record in records:
+        materialization = record.event_log_entry.asset_materialization
+        if materialization is None or materialization.asset_key != dbt_raw.key:
+            continue
+        for column in ["user_name", "ingest_date"]:
+            value = materialization.metadata.get(column)
+            if value is not None and value.value is not None:
+                filters.append(f"{column} = ?")
+                params.append(value.value)
+    with duckdb_read.get_connection() as conn:
+        return check_table(
+            conn.sql(
+                f"FROM {config.dbt_schema}.{config.dbt_raw_table}"
+                f" WHERE {' AND '.join(filters)}",
+                params=params,
+            ),
+            suite,
+        )
 
 
-@dbt_assets(manifest=adp_dbt_project.manifest_path)
-def adp_dbt_dbt_assets(context: dg.AssetExecutionContext, dbt: DbtCliResource):
-    yield from dbt.cli(["build"], context=context).stream()
+@dbt_assets(
+    manifest=adp_dbt_project.manifest_path,
+    op_tags=DUCKDB_TAGS,
+    pool=DUCKDB_POOL,
+)
+@instrumented
+def adp_dbt_dbt_assets(
+    context: dg.AssetExecutionContext, dbt: DbtCliResource, config: DBTConfig
+):
+    args = ["build", "--full-refresh"] if config.full_refresh else ["build"]
+    yield from dbt.cli(args, context=context).stream()
+
+
+# Plot asset -> (dbt models it reads, color column)
+PLOTS: dict[str, tuple[list[str], Optional[str]]] = {
+    "plot_count_scores": (["anime_scores"], None),
+    "plot_count_scores_genre": (["anime_scores", "media_genre"], "genre"),
+    "plot_count_scores_tag": (["anime_scores", "media_tag"], "tag"),
+}
+
+
+def plot_query_filenames(config: ResourceConfig) -> dict[str, str]:
+    return {
+        "plot_count_scores": config.count_scores_query_filename,
+        "plot_count_scores_genre": config.count_scores_genre_query_filename,
+        "plot_count_scores_tag": config.count_scores_tag_query_filename,
+    }
 
 
 def generate_plots(
     duckdb: DuckDBResource,
+    renderer: PlotRenderer,
     config: ResourceConfig,
-    query_filename: str,
-    color: str | None = None,
-) -> dg.MaterializeResult:
-    query_path = Path(config.query_path, query_filename)
-    with open(query_path, "r") as query_file:
-        query = query_file.read()
-
-        with duckdb.get_connection() as conn:
-            df = conn.execute(query).fetchdf()
-            fig = px.bar(df, x="score", y="count", color=color, title="Score Count")
-            chart_path = Path(config.data_path, query_filename).with_suffix(".html")
-            fig.write_html(chart_path, auto_open=True)
-            buffer = fig.to_image(format="png")
-            image_data = base64.b64encode(buffer)
-            md = f"![img](data:image/png;base64,{image_data.decode()})"
-            url = "file://" + str(chart_path.resolve())
-            metadata = {
-                "plot_md": dg.MetadataValue.md(md),
-                "plot_url": dg.MetadataValue.url(url),
+    names: Iterable[str],
+) -> Iterator[dg.MaterializeResult]:
+    query_filenames = plot_query_filenames(config)
+    cache = PlotCache(config.data_path)
+    plots = {}
+    with duckdb.get_connection() as conn:
+        for name in names:
+            query_filename = query_filenames[name]
+            with open(Path(config.query_path, query_filename), "r") as query_file:
+                query = query_file.read()
+            with span("duckdb.query", plot=name) as query_span:
+                df = conn.execute(query).fetchdf()
+                query_span.record(rows_out=len(df))
+            options = {
+                "x": "score",
+                "y": "count",
+                "color": PLOTS[name][1],
+                "title": "Score Count",
             }
-            return dg.MaterializeResult(metadata=metadata)
-
-
-@dg.asset(
-    group_name="plots",
-    kinds={"python"},
-    deps=[get_asset_key_for_model([adp_dbt_dbt_assets], "anime_scores")],
-)
-def plot_count_scores(
-    duckdb: DuckDBResource, config: ResourceConfig
-) -> dg.MaterializeResult:
-    return generate_plots(
-        duckdb=duckdb, config=config, query_filename=config.count_scores_query_filename
-    )
+            stem = Path(query_filename).stem
+            plots[name] = (df, options, stem, result_digest(df, options))
+
+    images = {}
+    figures = {}
+    for name, (df, options, stem, digest) in plots.items():
+        cached = cache.get(stem, digest)
+        if cached is None:
+            # Slow to import, and only needed when a result changed
+            import plotly.express as px
+
+            with span("plotly.figure", plot=name):
+                figures[name] = px.bar(df, **options)
+        else:
+            images[name] = cached
+
+    # Only changed results are re-rendered, all in one pass through the renderer
+    with span("kaleido.render") as render:
+        rendered = renderer.render(list(figures.values()))
+        render.record(rows_out=len(rendered))
+    for (name, fig), buffer in zip(figures.items(), rendered):
+        _, _, stem, digest = plots[name]
+        with span("plot_cache.write", plot=name) as write:
+            html = fig.to_html()
+            cache.put(stem, digest, html, buffer)
+            write.record(bytes_written=len(html.encode()) + len(buffer))
+        images[name] = buffer
+
+    for name, (_, _, stem, digest) in plots.items():
+        html_path, _, _ = cache.paths(stem)
+        image_data = base64.b64encode(images[name])
+        md = f"![img](data:image/png;base64,{image_data.decode()})"
+        url = "file://" + str(html_path.resolve())
+        metadata = {
+            "plot_md": dg.MetadataValue.md(md),
+            "plot_url": dg.MetadataValue.url(url),
+            "result_hash": digest,
+            "cached": name not in figures,
+        }
+        yield dg.MaterializeResult(asset_key=name, metadata=metadata)
 
 
-@dg.asset(
-    group_name="plots",
-    kinds={"python"},
-    deps=[get_asset_key_for_model([adp_dbt_dbt_assets], "anime_scores")],
+@dg.multi_asset(
+    specs=[
+        dg.AssetSpec(
+            name,
+            group_name="plots",
+            kinds={"python"},
+            deps=[get_asset_key_for_model([adp_dbt_dbt_assets], m) for m in models],
+        )
+        for name, (models, _) in PLOTS.items()
+    ],
+    can_subset=True,
+    op_tags=DUCKDB_TAGS,
+    pool=DUCKDB_POOL,
 )
-def plot_count_scores_genre(
-    duckdb: DuckDBResource, config: ResourceConfig
-) -> dg.MaterializeResult:
-    return generate_plots(
-        duckdb=duckdb,
+@instrumented
+def plots(
+    context: dg.AssetExecutionContext,
+    duckdb_read: DuckDBResource,
+    plot_renderer: PlotRendererResource,
+    config: ResourceConfig,
+) -> Iterator[dg.MaterializeResult]:
+    names = [key.to_user_string() for key in context.selected_asset_keys]
+    yield from generate_plots(
+        duckdb=duckdb_read,
+        renderer=plot_renderer.get_renderer(),
         config=config,
-        query_filename=config.count_scores_genre_query_filename,
-        color="genre",
+        names=[name for name in PLOTS if name in names],
     )
 
 
-@dg.asset(
-    group_name="plots",
-    kinds={"python"},
-    deps=[get_asset_key_for_model([adp_dbt_dbt_assets], "anime_scores")],
-)
-def plot_count_scores_tag(
-    duckdb: DuckDBResource, config: ResourceConfig
-) -> dg.MaterializeResult:
-    return generate_plots(
-        duckdb=duckdb,
-        config=config,
-        query_filename=config.count_scores_tag_query_filename,
-        color="tag",
-    )
+class AnimeScoresParquetConfig(ResourceConfig):
+    partition_columns: list[str] = ["user_id", "season_year"]
+    row_group_size: int = 64 * 1024
+    compression: str = "zstd"
+    compression_level: int = 3
+    dictionary_columns: list[str] = ["season", "source", "status", "watch_status"]
+    full_refresh: bool = False
 
 
 @dg.asset(
     group_name="stores",
     kinds={"python"},
     deps=[get_asset_key_for_model([adp_dbt_dbt_assets], "anime_scores")],
+    op_tags=DUCKDB_TAGS,
+    pool=DUCKDB_POOL,
 )
+@instrumented
 def store_anime_scores_parquet(
-    duckdb: DuckDBResource, config: ResourceConfig
+    duckdb_read: DuckDBResource, config: AnimeScoresParquetConfig
 ) -> dg.MaterializeResult:
-    anime_scores_parquet_filepath = Path(
-        config.data_path, config.anime_scores_parquet_filename
+    store = ParquetStore(
+        Path(config.data_path, config.anime_scores_parquet_dirname),
+        config.partition_columns,
+        ParquetOptions(
+            row_group_size=config.row_group_size,
+            compression=config.compression,
+            compression_level=config.compression_level,
+            dictionary_columns=config.dictionary_columns,
+        ),
+    )
+    manifest = store.load_manifest()
+    full_refresh = config.full_refresh or not manifest["files"]
+    watermark = None if full_refresh else manifest["watermark"]
+    columns = ", ".join(config.partition_columns)
+    matches = " AND ".join(
+        f"anime_scores.{c} IS NOT DISTINCT FROM dirty.{c}"
+        for c in config.partition_columns
     )
 
-    with duckdb.get_connection() as conn:
-        conn.sql(
-            f"COPY (FROM dbt.anime_scores) TO '{anime_scores_parquet_filepath}' (FORMAT parquet)"
+    # A changed row dirties its new partition. The mart reloads all of a changed
+    # user's rows, so every partition that user was exported to is dirty as well,
+    # which also drops entries since removed from the list
+    previous = ""
+    if not full_refresh:
+        files = [str(Path(store.root, entry["path"])) for entry in manifest["files"]]
+        previous = f"""
+            UNION
+            SELECT
+                {columns}
+            FROM
+                read_parquet({files}, hive_partitioning = true)
+            WHERE
+                user_id IN (SELECT user_id FROM changed)
+        """
+    dirty = f"""
+        WITH changed AS (
+            SELECT
+                *
+            FROM
+                dbt.anime_scores
+            WHERE
+                loaded_at > COALESCE(?::TIMESTAMP, '-infinity'::TIMESTAMP)
+        ),
+        dirty AS (
+            SELECT DISTINCT
+                {columns}
+            FROM
+                changed
+            {previous}
         )
-        metadata = {"filepath": anime_scores_parquet_filepath}
-        return dg.MaterializeResult(metadata=metadata)
+    """
+
+    with duckdb_read.get_connection() as conn, span("duckdb.query") as query:
+        new_watermark = conn.execute(
+            "SELECT MAX(loaded_at)::VARCHAR FROM dbt.anime_scores"
+        ).fetchone()[0]
+        partitions = conn.execute(f"{dirty} FROM dirty", [watermark]).fetchall()
+        table = conn.execute(
+            f"""
+            {dirty}
+            SELECT
+                anime_scores.*
+            FROM
+                dbt.anime_scores
+                SEMI JOIN dirty ON {matches}
+            ORDER BY
+                {columns}, anime_scores.score, anime_scores.media_id
+            """,
+            [watermark],
+        ).arrow()
+        query.record(rows_out=table.num_rows)
+    current_span().record(rows_out=table.num_rows)
+
+    replaced = set(partitions)
+    if full_refresh:
+        replaced |= {
+            tuple(entry["partition"][c] for c in config.partition_columns)
+            for entry in manifest["files"]
+        }
+    previous_paths = {entry["path"] for entry in manifest["files"]}
+    with span("parquet.write") as write:
+        manifest = store.swap_partitions(
+            split_partitions(table, config.partition_columns), replaced, new_watermark
+        )
+        write.record(
+            rows_in=table.num_rows,
+            bytes_written=sum(
+                entry["bytes"]
+                for entry in manifest["files"]
+                if entry["path"] not in previous_paths
+            ),
+        )
+
+    metadata = {
+        "path": dg.MetadataValue.path(str(store.root)),
+        "manifest_version": dg.MetadataValue.int(manifest["version"]),
+        "watermark": new_watermark,
+        "rows_written": dg.MetadataValue.int(table.num_rows),
+        "partitions_rewritten": dg.MetadataValue.int(len(replaced)),
+        "partitions": dg.MetadataValue.int(
+            len({tuple(entry["partition"].values()) for entry in manifest["files"]})
+        ),
+        "files": dg.MetadataValue.int(len(manifest["files"])),
+        "rows": dg.MetadataValue.int(sum(e["rows"] for e in manifest["files"])),
+        "bytes": dg.MetadataValue.int(sum(e["bytes"] for e in manifest["files"])),
+    }
+    return dg.MaterializeResult(metadata=metadata)
+
+
+class KafkaTopicsConfig(ResourceConfig):
+    full_resync: bool = False
 
 
 @dg.asset(
     group_name="kafka",
     kinds={"python"},
     deps=[raw_anilist],
+    partitions_def=users_partitions,
 )
-def kafka_topics(raw_anilist: Any, kafka: KafkaResource) -> dg.MaterializeResult:
-    kafka.produce(raw_anilist)
+@instrumented
+def kafka_topics(
+    context: dg.AssetExecutionContext,
+    raw_anilist: Any,
+    kafka: KafkaResource,
+    config: KafkaTopicsConfig,
+) -> dg.MaterializeResult:
+    user_name = raw_anilist["data"]["User"]["name"]
+    index = ContentIndex(
+        Path(config.data_path, config.kafka_index_dirname, f"{user_name}.json")
+    )
+    # Sent as a header so the sink stores rows under the key this partition rewrites
+    partition_key = context.partition_key if context.has_partition_key else None
+    stats = kafka.produce(raw_anilist, index, config.full_resync, partition_key)
     metadata = {
         "raw_user_topic": kafka.raw_user_topic,
         "raw_media_topic": kafka.raw_media_topic,
-    }
+        "full_resync": config.full_resync,
+        "changed": dg.MetadataValue.int(index.changed),
+        "tombstones": dg.MetadataValue.int(index.tombstones),
+        "suppressed": dg.MetadataValue.int(index.suppressed),
+    } | stats.to_metadata()
+    if stats.errors:
+        raise dg.Failure(
+            description=f"{stats.errors} of {stats.sent} messages were not delivered",
+            metadata=metadata | {"last_error": stats.last_error},
+        )
+    index.save()
     return dg.MaterializeResult(metadata=metadata)
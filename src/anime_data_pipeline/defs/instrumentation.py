@@ -0,0 +1,101 @@
+import dagster as dg
+import functools
+import inspect
+import pandas as pd
+import pyarrow as pa
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from ..lib.tracing import Span, active_span, span, trace_dir, write_trace
+
+
+def count_rows(value: Any) -> int:
+    if isinstance(value, (pd.DataFrame, pa.Table)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(count_rows(item) for item in value)
+    return 0
+
+
+def step_context() -> Optional[dg.OpExecutionContext]:
+    # Not set when an asset is invoked directly, e.g. in tests
+    try:
+        return dg.OpExecutionContext.get()
+    except dg.DagsterInvariantViolationError:
+        return None
+
+
+def io_run_id(context: dg.InputContext | dg.OutputContext) -> Optional[str]:
+    try:
+        return context.step_context.run_id
+    except dg.DagsterInvariantViolationError:
+        return None
+
+
+def step_metadata(root: Span) -> dict[str, Any]:
+    metadata = root.to_metadata()
+    breakdown = root.breakdown()
+    if breakdown:
+        metadata["spans"] = dg.MetadataValue.json(breakdown)
+    return metadata
+
+
+def with_step_metadata(event: Any, root: Span) -> Any:
+    # The asset's own metadata wins over the instrumentation's
+    if isinstance(event, dg.MaterializeResult):
+        return event._replace(metadata=step_metadata(root) | (event.metadata or {}))
+    if isinstance(event, (dg.Output, dg.AssetCheckResult, dg.AssetMaterialization)):
+        return event.with_metadata(step_metadata(root) | dict(event.metadata))
+    return event
+
+
+@contextmanager
+def step_span(name: str, run_id: Optional[str] = None) -> Iterator[Span]:
+    # Nests under an open span, otherwise becomes a root in the run's trace file
+    is_root = active_span() is None
+    root = None
+    try:
+        with span(name) as root:
+            yield root
+    finally:
+        path = trace_dir()
+        if is_root and path is not None and root is not None:
+            write_trace(Path(path, f"{run_id or 'local'}.json"), root)
+
+
+def instrumented(fn: Callable) -> Callable:
+    # Goes under @dg.asset / @dg.asset_check so dagster sees the wrapped signature
+    def start() -> tuple[Optional[dg.OpExecutionContext], Any]:
+        context = step_context()
+        return context, step_span(fn.__name__, context.run_id if context else None)
+
+    if inspect.isgeneratorfunction(fn):
+
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            # Events yielded mid-step carry the step's metrics so far
+            _, root_span = start()
+            with root_span as root:
+                root.record(rows_in=count_rows(tuple(kwargs.values())))
+                for event in fn(*args, **kwargs):
+                    yield with_step_metadata(event, root)
+
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        context, root_span = start()
+        with root_span as root:
+            root.record(rows_in=count_rows(tuple(kwargs.values())))
+            result = fn(*args, **kwargs)
+            root.record(rows_out=count_rows(result))
+        if isinstance(result, (dg.MaterializeResult, dg.Output, dg.AssetCheckResult)):
+            return with_step_metadata(result, root)
+        if context is not None and result is not None:
+            for output_name in context.selected_output_names:
+                context.add_output_metadata(step_metadata(root), output_name)
+        return result
+
+    return wrapper
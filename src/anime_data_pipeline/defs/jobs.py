@@ -1,5 +1,33 @@
 import dagster as dg
 
-anilist_job = dg.define_asset_job(name="anilist_job")
+from .resources import DUCKDB_TAGS
 
-job_defs = dg.Definitions(jobs=[anilist_job])
+# Steps run in parallel processes, but only one of them has DuckDB open at a time
+duckdb_executor = dg.multiprocess_executor.configured(
+    {
+        "tag_concurrency_limits": [
+            {"key": key, "value": value, "limit": 1}
+            for key, value in DUCKDB_TAGS.items()
+        ],
+    },
+    name="duckdb_executor",
+)
+
+# Everything from raw_anilist to tables, dbt, plots, parquet and Kafka; the paged
+# raw_anilist_entries is materialized on its own
+anilist_selection = (
+    dg.AssetSelection.assets("raw_anilist").upstream()
+    | dg.AssetSelection.assets("raw_anilist").downstream()
+)
+
+anilist_job = dg.define_asset_job(
+    name="anilist_job", selection=anilist_selection, executor_def=duckdb_executor
+)
+
+anilist_serial_job = dg.define_asset_job(
+    name="anilist_serial_job",
+    selection=anilist_selection,
+    executor_def=dg.in_process_executor,
+)
+
+job_defs = dg.Definitions(jobs=[anilist_job, anilist_serial_job])
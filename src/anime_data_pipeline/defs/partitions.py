@@ -0,0 +1,4 @@
+import dagster as dg
+
+# One partition per AniList user name, added at runtime rather than per deployment
+users_partitions = dg.DynamicPartitionsDefinition(name="anilist_users")
@@ -1,6 +1,36 @@
 from pathlib import Path
 
 from dagster_dbt import DbtProject
+from dagster_dbt.dbt_project import DagsterDbtProjectPreparer
+
+from ..lib.cache import digest_files
+
+
+def dbt_project_files(project_dir: Path) -> list[Path]:
+    # What dbt parse reads from this project: dbt_project.yml and dbt/
+    files = [path for path in project_dir.joinpath("dbt").rglob("*") if path.is_file()]
+    return [project_dir.joinpath("dbt_project.yml"), *files]
+
+
+class CachedDbtProjectPreparer(DagsterDbtProjectPreparer):
+    # dagster dev parses the project in every process that loads definitions; the
+    # manifest is reused until the files it was parsed from change
+    def prepare(self, project: DbtProject) -> None:
+        digest_path = project.manifest_path.with_suffix(".sha256")
+        digest = digest_files(
+            project.project_dir, dbt_project_files(project.project_dir)
+        )
+        if (
+            project.manifest_path.exists()
+            and digest_path.exists()
+            and digest_path.read_text() == digest
+        ):
+            return
+        # The digest goes last so an interrupted parse is never treated as a hit
+        digest_path.unlink(missing_ok=True)
+        super().prepare(project)
+        digest_path.write_text(digest)
+
 
 adp_dbt_project = DbtProject(
     project_dir=Path(__file__).joinpath("..", "..", "..", "..").resolve(),
@@ -8,4 +38,4 @@ adp_dbt_project = DbtProject(
     .joinpath("..", "..", "..", "dbt-project")
     .resolve(),
 )
-adp_dbt_project.prepare_if_dev()
+CachedDbtProjectPreparer().prepare_if_dev(adp_dbt_project)
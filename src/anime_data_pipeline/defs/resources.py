@@ -1,65 +1,325 @@
 import dagster as dg
-import requests
 import json
+import pandas as pd
+import pyarrow as pa
+import weakref
 
-from pydantic import Field, BaseModel
-from typing import Any
+from contextlib import ExitStack
+from pydantic import Field, BaseModel, PrivateAttr
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence
 from pathlib import Path
 from dagster_duckdb import DuckDBResource
-from dagster_duckdb_pandas import DuckDBPandasIOManager
 from dagster_dbt import DbtCliResource
-from kafka import KafkaProducer
 
 from .project import adp_dbt_project
+from ..lib.anilist import (
+    AniListClient,
+    AniListResponse,
+    ClientStats,
+    ANILIST_API_URL,
+)
+from ..lib.cache import ResponseCache, digest_bytes
+from ..lib import serialization
+from ..lib.plots import PlotRenderer
+from ..lib.polling import ListProbe, parse_probe
+from ..lib.streaming import (
+    ContentIndex,
+    Event,
+    ProducerStats,
+    encode_key,
+    encode_value,
+    entry_key,
+    parse_api_version,
+    partition_headers,
+)
+from ..lib.serialization import get_codec
+from ..lib.tables import Table, add_column, has_table, write_table
+from ..lib.tracing import current_span, span, traced
+from .instrumentation import io_run_id, step_span
 
 log = dg.get_dagster_logger()
 
+# DuckDB allows a single writer per file and no read-only connections while it is
+# open, so every step opening the database carries this tag and they are serialized
+DUCKDB_TAGS = {"duckdb": "connection"}
+# Per-user runs execute side by side; the pool serializes those steps across runs.
+# Its limit is concurrency.pools.default_limit in .dagster/dagster.yaml
+DUCKDB_POOL = "duckdb"
+# Asset checks take no pool argument; the concurrency key tag puts them in the pool
+DUCKDB_CHECK_TAGS = DUCKDB_TAGS | {"dagster/concurrency_key": DUCKDB_POOL}
+
 
 class AniListAPIResource(dg.ConfigurableResource):
     user_name: str = Field(description="User to grab AniList data for")
     query_path: str = Field(description="Path to queries")
+    api_url: str = Field(default=ANILIST_API_URL, description="AniList GraphQL URL")
+    requests_per_minute: int = Field(
+        default=90, description="Shared request budget across all workers"
+    )
+    max_workers: int = Field(default=8, description="Pooled keep-alive connections")
+    max_retries: int = Field(
+        default=5, description="Retries on 429, 5xx, connection errors and timeouts"
+    )
+    cache_path: Optional[str] = Field(
+        default=None, description="Directory for the response cache, disabled if unset"
+    )
+    cache_ttl_seconds: int = Field(
+        default=3600, description="Seconds before a cached response is revalidated"
+    )
+    cache_max_bytes: int = Field(
+        default=512 * 1024 * 1024, description="Cache size cap, evicted LRU first"
+    )
 
-    def query(self, query_filename: str) -> Any:
-        query_path = Path(self.query_path, query_filename)
-        with open(query_path, "r") as query_file:
-            query = query_file.read()
-            body = {
-                "query": query,
-                "variables": {
-                    "userName": self.user_name,
-                },
-            }
-            res = requests.post("https://graphql.anilist.co", json=body)
-            data = res.json()
-            return data
+    _client: Optional[AniListClient] = PrivateAttr(default=None)
+    _cache: Optional[ResponseCache] = PrivateAttr(default=None)
+    _queries: dict[str, str] = PrivateAttr(default_factory=dict)
+
+    def get_client(self) -> AniListClient:
+        if self._client is None:
+            self._client = AniListClient(
+                url=self.api_url,
+                requests_per_minute=self.requests_per_minute,
+                pool_size=self.max_workers,
+                max_retries=self.max_retries,
+            )
+        return self._client
+
+    def get_cache(self) -> Optional[ResponseCache]:
+        if self.cache_path and self._cache is None:
+            self._cache = ResponseCache(
+                self.cache_path,
+                ttl_seconds=self.cache_ttl_seconds,
+                max_bytes=self.cache_max_bytes,
+            )
+        return self._cache
+
+    def cache_metadata(self) -> dict[str, Any]:
+        cache = self.get_cache()
+        return cache.stats.to_metadata() if cache else {}
+
+    def teardown_after_execution(self, context: dg.InitResourceContext) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    @property
+    def stats(self) -> ClientStats:
+        return self.get_client().stats
+
+    def read_query(self, query_filename: str) -> str:
+        if query_filename not in self._queries:
+            query_path = Path(self.query_path, query_filename)
+            with open(query_path, "r") as query_file:
+                self._queries[query_filename] = query_file.read()
+        return self._queries[query_filename]
+
+    def query(self, query_filename: str, user_name: Optional[str] = None) -> Any:
+        return self.fetch(query_filename, user_name).data
+
+    @traced("anilist.fetch")
+    def fetch(
+        self, query_filename: str, user_name: Optional[str] = None
+    ) -> AniListResponse:
+        query = self.read_query(query_filename)
+        user_name = user_name or self.user_name
+        variables = {"userName": user_name}
+        cache = self.get_cache()
+
+        key = entry = None
+        if cache:
+            key = ResponseCache.make_key(query, variables, user_name)
+            entry = cache.get(key)
+            if entry and entry.fresh:
+                cache.stats.record(hits=1, bytes_saved=len(entry.payload))
+                with span("json.decode", source="cache", size=len(entry.payload)):
+                    data = json.loads(entry.payload)
+                return AniListResponse(
+                    data=data,
+                    digest=entry.digest,
+                    size=len(entry.payload),
+                    source="cache",
+                    unchanged=True,
+                )
+
+        with span("anilist.request") as request:
+            res = self.get_client().post(query, variables)
+            payload = res.content
+            request.record(bytes_read=len(payload))
+        digest = digest_bytes(payload)
+        with span("json.decode", size=len(payload)):
+            data = json.loads(payload)
+        response = AniListResponse(data=data, digest=digest, size=len(payload))
+
+        if cache and res.status_code == 200:
+            if entry and entry.digest == digest:
+                cache.touch(key)
+                cache.stats.record(revalidated=1)
+                response.source = "revalidated"
+                response.unchanged = True
+            else:
+                cache.put(key, payload)
+                cache.stats.record(misses=1)
+        return response
+
+    @traced("anilist.probe")
+    def probe(self, query_filename: str, user_name: Optional[str] = None) -> ListProbe:
+        # Skips the response cache, a probe has to see the list as it is now
+        query = self.read_query(query_filename)
+        variables = {"userName": user_name or self.user_name}
+        return parse_probe(self.get_client().query(query, variables))
+
+    @traced("anilist.query_pages")
+    def query_pages(
+        self,
+        query_filename: str,
+        user_name: Optional[str] = None,
+        per_page: int = 50,
+    ) -> Iterator[list[Any]]:
+        query = self.read_query(query_filename)
+        variables = {"userName": user_name or self.user_name}
+        for entries in self.get_client().query_pages(query, variables, per_page):
+            current_span().record(rows_out=len(entries))
+            yield entries
 
 
 class LocalFileJSONIOManager(dg.ConfigurableIOManager):
     data_path: str = Field(description="Path to data directory")
+    codec: str = Field(
+        default="json",
+        description=(
+            "One of json, orjson, msgpack, json.zst, msgpack.zst. Only the JSON codecs"
+            " write plain .json files that dbt_raw can read"
+        ),
+    )
 
     def get_path(self, context: dg.InputContext | dg.OutputContext) -> Path:
         id_path = context.get_identifier()
         if len(id_path) > 1:
             id_path.pop()
-        id_path[-1] = f"{id_path[-1]}.json"
+        # Each partition gets its own snapshot: <run_id>/<partition>/<asset>
+        if context.has_asset_partitions:
+            id_path.insert(-1, context.asset_partition_key)
+        id_path[-1] = f"{id_path[-1]}{get_codec(self.codec).suffix}"
         path = Path(self.data_path, *id_path)
         return path
 
     def handle_output(self, context: dg.OutputContext, data: Any):
         write_path = self.get_path(context)
         write_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(write_path, "w") as json_file:
-            if isinstance(data, BaseModel):
-                json_file.write(data.model_dump_json())
-            else:
-                json_file.write(json.dumps(data))
+        if isinstance(data, BaseModel):
+            data = data.model_dump(mode="json")
+        with step_span("local_io_manager.write", io_run_id(context)) as write:
+            size = serialization.dump(data, write_path, get_codec(self.codec))
+            write.record(bytes_written=size)
+        context.add_output_metadata(
+            {
+                "codec": self.codec,
+                "stored_size": dg.MetadataValue.int(size),
+                "write_seconds": round(write.wall_seconds, 4),
+            }
+        )
 
     def load_input(self, context: dg.InputContext) -> Any:
         read_path = self.get_path(context)
-        with open(read_path, "r") as json_file:
-            raw = json_file.read()
-            data = json.loads(raw)
-            return data
+        # Inputs annotated as Path get the stored file itself, e.g. to stream it
+        if context.dagster_type.typing_type is Path:
+            return read_path
+        # Framed codecs return a lazy mapping; sections decode on first access
+        with step_span("local_io_manager.read", io_run_id(context)) as read:
+            read.record(bytes_read=read_path.stat().st_size)
+            return serialization.load(read_path, get_codec(self.codec))
+
+
+class DuckDBArrowIOManager(dg.ConfigurableIOManager):
+    # Stores pandas frames, Arrow tables and DuckDB relations as they are, and loads
+    # inputs as whichever of the three they are annotated with, lazily by default.
+    # Output metadata picks the write: partition_expr replaces the partition's rows,
+    # partition_column does the same after storing the partition key in that column,
+    # merge_key upserts, otherwise the table is replaced.
+    database: str = Field(description="Path to the DuckDB database")
+    duckdb_schema: str = Field(description="Schema the tables are stored in")
+
+    def get_table(self, context: dg.InputContext | dg.OutputContext) -> str:
+        return f"{self.duckdb_schema}.{context.asset_key.path[-1]}"
+
+    def partition_filter(
+        self,
+        context: dg.InputContext | dg.OutputContext,
+        metadata: Mapping[str, Any],
+    ) -> Optional[str]:
+        partition_expr = metadata.get("partition_column") or metadata.get(
+            "partition_expr"
+        )
+        if not partition_expr or not context.has_asset_partitions:
+            return None
+        keys = ", ".join(
+            "'" + key.replace("'", "''") + "'" for key in context.asset_partition_keys
+        )
+        return f"{partition_expr} IN ({keys})"
+
+    def handle_output(self, context: dg.OutputContext, obj: Table):
+        metadata = context.definition_metadata
+        where = self.partition_filter(context, metadata)
+        partition_column = metadata.get("partition_column")
+        if partition_column and context.has_asset_partitions:
+            obj = add_column(obj, partition_column, context.asset_partition_key)
+        duckdb = DuckDBResource(database=self.database)
+        with (
+            duckdb.get_connection() as conn,
+            step_span("duckdb_io_manager.write", io_run_id(context)) as write,
+        ):
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {self.duckdb_schema};")
+            conn.begin()
+            try:
+                if partition_column and has_table(
+                    conn, self.duckdb_schema, context.asset_key.path[-1]
+                ):
+                    # Tables written before the column existed, or by merges
+                    conn.execute(
+                        f"ALTER TABLE {self.get_table(context)}"
+                        f" ADD COLUMN IF NOT EXISTS {partition_column} VARCHAR"
+                    )
+                rows = write_table(
+                    conn,
+                    self.get_table(context),
+                    obj,
+                    where=where,
+                    key=metadata.get("merge_key"),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            write.record(rows_in=rows)
+        row_count = (
+            "dagster/partition_row_count"
+            if context.has_asset_partitions
+            else "dagster/row_count"
+        )
+        context.add_output_metadata({row_count: dg.MetadataValue.int(rows)})
+
+    def load_input(self, context: dg.InputContext) -> Table:
+        upstream = context.upstream_output
+        where = self.partition_filter(
+            context, upstream.definition_metadata if upstream else {}
+        )
+        connection = ExitStack()
+        conn = connection.enter_context(
+            DuckDBResource(database=self.database).get_connection()
+        )
+        relation = conn.table(self.get_table(context))
+        if where is not None:
+            relation = relation.filter(where)
+
+        typing_type = context.dagster_type.typing_type
+        if typing_type in (pd.DataFrame, pa.Table):
+            with connection:
+                return (
+                    relation.df() if typing_type is pd.DataFrame else relation.arrow()
+                )
+        # The connection stays open for as long as the step holds the relation
+        weakref.finalize(relation, connection.close)
+        return relation
 
 
 class KafkaResource(dg.ConfigurableResource):
@@ -67,30 +327,107 @@ class KafkaResource(dg.ConfigurableResource):
     raw_media_topic: str = Field(description="Raw media list topic in Kafka")
     kafka_url: str = Field(description="URL to Kafka server")
     kafka_version: str = Field(description="Kafka API version")
+    linger_ms: int = Field(
+        default=50, description="Milliseconds to wait for a batch to fill up"
+    )
+    batch_size: int = Field(
+        default=256 * 1024, description="Max bytes batched per partition"
+    )
+    compression_type: Optional[str] = Field(
+        default="zstd", description="One of gzip, snappy, lz4, zstd, or unset"
+    )
 
-    def produce(self, data: Any):
-        api_version = tuple(int(part) for part in self.kafka_version.split("."))
-        producer = KafkaProducer(
-            bootstrap_servers=[self.kafka_url],
-            value_serializer=lambda v: json.dumps(v).encode("utf-8"),
-            api_version=api_version,
-        )
+    _producer: Optional[Any] = PrivateAttr(default=None)
 
-        log.debug("sending raw user event")
-        count = 0
-        user = data["data"]["User"]
-        producer.send(self.raw_user_topic, user)
-        count += 1
+    def get_producer(self) -> Any:
+        if self._producer is None:
+            # kafka-python is imported by the steps that produce, not at load time
+            from kafka import KafkaProducer
+
+            self._producer = KafkaProducer(
+                bootstrap_servers=[self.kafka_url],
+                api_version=parse_api_version(self.kafka_version),
+                key_serializer=encode_key,
+                value_serializer=encode_value,
+                linger_ms=self.linger_ms,
+                batch_size=self.batch_size,
+                compression_type=self.compression_type,
+            )
+        return self._producer
+
+    def teardown_after_execution(self, context: dg.InitResourceContext) -> None:
+        if self._producer is not None:
+            self._producer.close()
+            self._producer = None
+
+    def send(
+        self,
+        topic: str,
+        key: Any,
+        value: Any,
+        stats: ProducerStats,
+        headers: Sequence[tuple[str, bytes]] = (),
+    ):
+        from kafka.errors import KafkaError
 
-        log.debug("sending raw entry events")
+        stats.record_sent()
+        try:
+            future = self.get_producer().send(
+                topic, key=key, value=value, headers=list(headers)
+            )
+        except KafkaError as err:
+            stats.record_error(err)
+            return
+        future.add_callback(stats.record_delivered)
+        future.add_errback(stats.record_error)
+
+    def events(self, data: Any) -> Iterator[Event]:
+        # Keys pin each user and list entry to one partition across runs
+        user = data["data"]["User"]
+        yield self.raw_user_topic, user.get("id"), user
         for lst in data["data"]["MediaListCollection"]["lists"]:
             for entry in lst["entries"]:
-                producer.send(self.raw_media_topic, entry)
-                count += 1
+                yield self.raw_media_topic, entry_key(entry), entry
+
+    @traced("kafka.produce")
+    def produce(
+        self,
+        data: Any,
+        index: Optional[ContentIndex] = None,
+        full_resync: bool = False,
+        partition_key: Optional[str] = None,
+    ) -> ProducerStats:
+        stats = ProducerStats()
+        stats.start()
+        headers = partition_headers(partition_key)
+
+        events = self.events(data)
+        if index is not None:
+            events = index.changes(events, full_resync)
+
+        log.debug("sending raw user and entry events")
+        for topic, key, value in events:
+            self.send(topic, key, value, stats, headers)
+
+        # Waits for the delivery callbacks; the producer stays open for the next call
+        log.debug(f"flushing {stats.sent} events")
+        self.get_producer().flush()
+        stats.finish()
+        current_span().record(rows_out=stats.delivered, bytes_written=stats.bytes)
+        return stats
+
 
-        log.debug(f"flushing {count} events")
-        producer.flush()
-        producer.close()
+class PlotRendererResource(dg.ConfigurableResource):
+    scale: Optional[float] = Field(
+        default=None, description="Image scale factor, kaleido's default if unset"
+    )
+
+    _renderer: Optional[PlotRenderer] = PrivateAttr(default=None)
+
+    def get_renderer(self) -> PlotRenderer:
+        if self._renderer is None:
+            self._renderer = PlotRenderer(scale=self.scale)
+        return self._renderer
 
 
 class ResourceConfig(dg.Config):
@@ -98,14 +435,17 @@ class ResourceConfig(dg.Config):
     query_path: str = "./queries"
     duckdb_filename: str = "anime_data.duckdb"
     duckdb_schema: str = "pandas"
-    anilist_query_filename: str = "anilist.graphql"
+    anilist_query_filename: str = "anilist_pruned.graphql"
+    anilist_page_query_filename: str = "anilist_page.graphql"
+    anilist_probe_query_filename: str = "anilist_probe.graphql"
     anime_scores_query_filename: str = "anime_scores.sql"
     count_scores_query_filename: str = "count_scores.sql"
     count_scores_genre_query_filename: str = "count_scores_by_top_genre.sql"
     count_scores_tag_query_filename: str = "count_scores_by_top_tag.sql"
-    anime_scores_parquet_filename: str = "anime_scores.parquet"
+    anime_scores_parquet_dirname: str = "anime_scores_parquet"
     raw_user_topic: str = "raw_user"
     raw_media_topic: str = "raw_media"
+    kafka_index_dirname: str = "kafka_index"
     kafka_url: str = "localhost:9092"
     kafka_version: str = "4.0.0"
 
@@ -123,16 +463,23 @@ resource_defs = dg.Definitions(
                 Path(resource_config.data_path, resource_config.duckdb_filename)
             ),
         ),
+        "duckdb_read": DuckDBResource(
+            database=str(
+                Path(resource_config.data_path, resource_config.duckdb_filename)
+            ),
+            connection_config={"access_mode": "READ_ONLY"},
+        ),
         "local_io_manager": LocalFileJSONIOManager(
             data_path=resource_config.data_path,
         ),
-        "duckdb_io_manager": DuckDBPandasIOManager(
+        "duckdb_io_manager": DuckDBArrowIOManager(
             database=str(
                 Path(resource_config.data_path, resource_config.duckdb_filename)
             ),
-            schema=resource_config.duckdb_schema,
+            duckdb_schema=resource_config.duckdb_schema,
         ),
         "dbt": DbtCliResource(project_dir=adp_dbt_project),
+        "plot_renderer": PlotRendererResource(),
         "kafka": KafkaResource(
             raw_user_topic=resource_config.raw_user_topic,
             raw_media_topic=resource_config.raw_media_topic,
@@ -0,0 +1,75 @@
+import dagster as dg
+import json
+import time
+
+from .jobs import anilist_job
+from .partitions import users_partitions
+from .resources import AniListAPIResource, ResourceConfig
+from ..lib.anilist import AniListAPIError
+from ..lib.polling import PollPolicy, dump_states, load_states
+
+POLL_POLICY = PollPolicy()
+
+
+@dg.sensor(job=anilist_job, minimum_interval_seconds=60)
+def anilist_users_sensor(
+    context: dg.SensorEvaluationContext, anilist_api: AniListAPIResource
+) -> dg.SensorResult:
+    # Seeds the partition for USER_NAME; more users are added as partitions in the
+    # UI or API, and each new one gets a full ingest of just that partition
+    user_names = users_partitions.get_partition_keys(
+        dynamic_partitions_store=context.instance
+    )
+    added = [] if anilist_api.user_name in user_names else [anilist_api.user_name]
+    requested = set(json.loads(context.cursor)) if context.cursor else set()
+    pending = [name for name in user_names + added if name not in requested]
+    return dg.SensorResult(
+        run_requests=[
+            dg.RunRequest(partition_key=name, run_key=name) for name in pending
+        ],
+        dynamic_partitions_requests=(
+            [users_partitions.build_add_request(added)] if added else []
+        ),
+        cursor=json.dumps(sorted(requested | set(pending))),
+    )
+
+
+@dg.sensor(
+    job=anilist_job,
+    minimum_interval_seconds=int(POLL_POLICY.min_interval_seconds),
+)
+def anilist_changes_sensor(
+    context: dg.SensorEvaluationContext, anilist_api: AniListAPIResource
+) -> dg.SensorResult:
+    # A probe is one small request for the list's latest updatedAt and entry count.
+    # Any change re-ingests the user's list, which every downstream asset reads.
+    config = ResourceConfig()
+    states = load_states(context.cursor)
+    user_names = users_partitions.get_partition_keys(
+        dynamic_partitions_store=context.instance
+    )
+    now = time.time()
+    run_requests = []
+    for user_name in POLL_POLICY.due_users(states, user_names, now):
+        state = states.get(user_name)
+        try:
+            probe = anilist_api.probe(config.anilist_probe_query_filename, user_name)
+        except AniListAPIError as err:
+            context.log.warning(f"probe for {user_name} failed: {err}")
+            probe = None
+        states[user_name], change = POLL_POLICY.update(state, probe, now)
+        if change is None:
+            continue
+        run_requests.append(
+            dg.RunRequest(partition_key=user_name, tags={"anilist/change": change})
+        )
+
+    return dg.SensorResult(
+        run_requests=run_requests,
+        cursor=dump_states(
+            {name: state for name, state in states.items() if name in user_names}
+        ),
+    )
+
+
+sensor_defs = dg.Definitions(sensors=[anilist_users_sensor, anilist_changes_sensor])
@@ -0,0 +1,238 @@
+import threading
+import time
+import requests
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+from requests.adapters import HTTPAdapter
+
+ANILIST_API_URL = "https://graphql.anilist.co"
+
+
+class AniListAPIError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated_at = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def pause(self, seconds: float):
+        # Shared back-off: every worker waits until the server's window resets
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.updated_at = max(self.updated_at, self.paused_until)
+            self.tokens = 1.0
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    self.refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+
+@dataclass
+class AniListResponse:
+    data: Any
+    digest: str
+    size: int
+    source: str = "network"
+    unchanged: bool = False
+
+
+@dataclass
+class ClientStats:
+    requests: int = 0
+    retries: int = 0
+    throttled_responses: int = 0
+    throttled_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def requests_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.requests / elapsed if elapsed > 0 else 0.0
+
+    def record(self, requests: int = 0, retries: int = 0, throttled: float = 0.0):
+        with self.lock:
+            now = time.monotonic()
+            if self.started_at is None:
+                self.started_at = now
+            self.finished_at = now
+            self.requests += requests
+            self.retries += retries
+            self.throttled_seconds += throttled
+
+    def record_throttled_response(self):
+        with self.lock:
+            self.throttled_responses += 1
+
+    def to_metadata(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled_responses": self.throttled_responses,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "requests_per_second": round(self.requests_per_second, 3),
+        }
+
+
+def parse_retry_after(
+    headers: Any, now: Callable[[], float] = time.time
+) -> Optional[float]:
+    retry_after = headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    reset = headers.get("X-RateLimit-Reset")
+    if reset is not None:
+        try:
+            return max(0.0, float(reset) - now())
+        except ValueError:
+            pass
+    return None
+
+
+class AniListClient:
+    def __init__(
+        self,
+        url: str = ANILIST_API_URL,
+        requests_per_minute: float = 90,
+        burst: int = 1,
+        pool_size: int = 10,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+        timeout: float = 30.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.url = url
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.sleep = sleep
+        self.limiter = TokenBucket(
+            rate=requests_per_minute / 60.0, capacity=burst, sleep=sleep
+        )
+        self.stats = ClientStats()
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def post(
+        self, query: str, variables: dict[str, Any], **kwargs
+    ) -> requests.Response:
+        body = {"query": query, "variables": variables}
+        for attempt in range(self.max_retries + 1):
+            waited = self.limiter.acquire()
+            self.stats.record(requests=1, retries=1 if attempt else 0, throttled=waited)
+            try:
+                res = self.session.post(
+                    self.url, json=body, timeout=self.timeout, **kwargs
+                )
+                self.stats.record()
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if attempt == self.max_retries:
+                    raise AniListAPIError(f"request failed: {err}") from err
+                self.backoff(attempt)
+                continue
+
+            if res.status_code == 429:
+                self.stats.record_throttled_response()
+                delay = parse_retry_after(res.headers)
+                if delay is None:
+                    delay = self.backoff_seconds * 2**attempt
+                res.close()
+                if attempt == self.max_retries:
+                    raise AniListAPIError("rate limited, retries exhausted")
+                self.limiter.pause(delay)
+                continue
+
+            if res.status_code >= 500:
+                res.close()
+                if attempt == self.max_retries:
+                    raise AniListAPIError(f"server error {res.status_code}")
+                self.backoff(attempt)
+                continue
+
+            return res
+
+        raise AniListAPIError("retries exhausted")
+
+    def backoff(self, attempt: int):
+        delay = self.backoff_seconds * 2**attempt
+        self.stats.record(throttled=delay)
+        self.sleep(delay)
+
+    def query(self, query: str, variables: dict[str, Any]) -> Any:
+        res = self.post(query, variables)
+        try:
+            return res.json()
+        except ValueError as err:
+            raise AniListAPIError(f"invalid response: {err}") from err
+
+    def query_pages(
+        self, query: str, variables: dict[str, Any], per_page: int = 50
+    ) -> Iterator[list[Any]]:
+        page = 1
+        while True:
+            data = self.query(query, variables | {"page": page, "perPage": per_page})
+            if not isinstance(data, dict) or not data.get("data"):
+                errors = data.get("errors") if isinstance(data, dict) else data
+                raise AniListAPIError(f"page {page} failed: {errors}")
+
+            result = data["data"]["Page"]
+            yield result["mediaList"]
+
+            if not result["pageInfo"]["hasNextPage"]:
+                break
+            page += 1
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+
+def digest_bytes(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+def digest_files(root: Path, paths: list[Path]) -> str:
+    # Names are hashed with contents so renames and moves change the digest too
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.relative_to(root).as_posix().encode() + b"\0")
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    payload: bytes
+    digest: str
+    stored_at: float
+    fresh: bool
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    evictions: int = 0
+    bytes_saved: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, **counts: int):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def to_metadata(self) -> dict[str, Any]:
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_revalidated": self.revalidated,
+            "cache_evictions": self.evictions,
+            "cache_bytes_saved": self.bytes_saved,
+        }
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Path | str,
+        ttl_seconds: float = 3600,
+        max_bytes: int = 512 * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(query: str, variables: dict[str, Any], user_name: str) -> str:
+        query_hash = digest_bytes(query.encode())
+        variables_json = json.dumps(variables, sort_keys=True)
+        return digest_bytes(f"{query_hash}:{variables_json}:{user_name}".encode())
+
+    def payload_path(self, key: str) -> Path:
+        return Path(self.path, f"{key}.json")
+
+    def meta_path(self, key: str) -> Path:
+        return Path(self.path, f"{key}.meta")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self.lock:
+            try:
+                meta = json.loads(self.meta_path(key).read_text())
+                payload = self.payload_path(key).read_bytes()
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            # Payload mtime doubles as the last access time for LRU eviction
+            os.utime(self.payload_path(key))
+
+        stored_at = meta["stored_at"]
+        fresh = self.clock() - stored_at < self.ttl_seconds
+        return CacheEntry(payload, meta["digest"], stored_at, fresh)
+
+    def put(self, key: str, payload: bytes) -> str:
+        digest = digest_bytes(payload)
+        meta = {"stored_at": self.clock(), "digest": digest, "size": len(payload)}
+        with self.lock:
+            tmp_path = self.payload_path(key).with_suffix(".tmp")
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, self.payload_path(key))
+            self.meta_path(key).write_text(json.dumps(meta))
+            self.evict()
+        return digest
+
+    def touch(self, key: str):
+        with self.lock:
+            meta_path = self.meta_path(key)
+            meta = json.loads(meta_path.read_text())
+            meta["stored_at"] = self.clock()
+            meta_path.write_text(json.dumps(meta))
+
+    def evict(self):
+        files = sorted(
+            (stat.st_mtime, stat.st_size, path)
+            for path in self.path.glob("*.json")
+            for stat in [path.stat()]
+        )
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix(".meta").unlink(missing_ok=True)
+            total -= size
+            self.stats.record(evictions=1)
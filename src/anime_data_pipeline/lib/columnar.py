@@ -0,0 +1,355 @@
+import operator
+import typing
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from dataclasses import dataclass, field
+from itertools import compress
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Any, Optional, Sequence
+
+from . import schemas
+
+MISSING = object()
+
+NONE_TYPE = type(None)
+DATE_PARTS = ["year", "month", "day"]
+DATE_TYPE = pa.struct([(part, pa.int64()) for part in DATE_PARTS])
+ARROW_TYPES = {int: pa.int64(), str: pa.string()}
+
+Source = tuple[str, str]
+
+
+def merged_sources(key: str) -> list[Source]:
+    # Same precedence as `media | entry`: entry fields win over media fields
+    return [("entry", key), ("media", key)]
+
+
+# (owner, key) pairs each field is read from, in order of precedence
+FIELD_SOURCES: dict[tuple[str, str], list[Source]] = {
+    ("*", "status"): [("media", "status")],
+    ("*", "watchStatus"): [("entry", "status")],
+    ("DimensionMedia", "id"): merged_sources("mediaId") + merged_sources("id"),
+}
+
+
+@dataclass
+class RowError:
+    model: str
+    row: int
+    field: str
+    error: str
+
+
+@dataclass
+class ColumnSpec:
+    name: str
+    kind: str
+    annotation: Any
+    optional: bool
+    sources: list[Source]
+    leaves: list[tuple[str, set[type]]] = field(default_factory=list)
+
+
+def unwrap(annotation: Any) -> tuple[Any, bool]:
+    args = typing.get_args(annotation)
+    if typing.get_origin(annotation) is typing.Union and type(None) in args:
+        inner = [arg for arg in args if arg is not type(None)]
+        return inner[0], True
+    return annotation, annotation is Any
+
+
+def allowed_types(base: Any, optional: bool) -> Optional[set[type]]:
+    if base not in ARROW_TYPES:
+        return None
+    return {base, NONE_TYPE} if optional else {base}
+
+
+def leaf_types(model: type[BaseModel]) -> list[tuple[str, set[type]]]:
+    leaves = []
+    for name, info in model.model_fields.items():
+        base, optional = unwrap(info.annotation)
+        leaves.append((name, allowed_types(base, optional)))
+    return leaves
+
+
+def column_spec(model: type[BaseModel], name: str, annotation: Any) -> ColumnSpec:
+    sources = (
+        FIELD_SOURCES.get((model.__name__, name))
+        or FIELD_SOURCES.get(("*", name))
+        or merged_sources(name)
+    )
+    base, optional = unwrap(annotation)
+    spec = ColumnSpec(name, "any", annotation, optional, sources)
+    if name in schemas.DATE_FIELDS:
+        spec.kind = "date"
+    elif name in schemas.IMAGE_FIELDS:
+        spec.kind = "image"
+    elif base in ARROW_TYPES:
+        spec.kind = "scalar"
+    elif isinstance(base, type) and issubclass(base, BaseModel):
+        spec.kind, spec.leaves = "model", leaf_types(base)
+    elif typing.get_origin(base) is list:
+        (item,) = typing.get_args(base)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            spec.kind, spec.leaves = "model_list", leaf_types(item)
+        elif item in ARROW_TYPES:
+            spec.kind, spec.leaves = "list", [("", {item})]
+    return spec
+
+
+def model_specs(model: type[BaseModel]) -> list[ColumnSpec]:
+    return [
+        column_spec(model, name, info.annotation)
+        for name, info in model.model_fields.items()
+    ]
+
+
+def column_values(owners: dict[str, list[dict]], sources: list[Source]) -> list[Any]:
+    if sources == merged_sources(sources[0][1]):
+        key = sources[0][1]
+        return [
+            entry[key] if key in entry else media.get(key, MISSING)
+            for entry, media in zip(owners["entry"], owners["media"])
+        ]
+
+    (owner, key), *rest = sources
+    values = [row.get(key, MISSING) for row in owners[owner]]
+    for owner, key in rest:
+        values = [
+            row.get(key, MISSING) if value is MISSING else value
+            for value, row in zip(values, owners[owner])
+        ]
+    return values
+
+
+def leaf_values(items: list[dict], key: str) -> list[Any]:
+    try:
+        return list(map(operator.itemgetter(key), items))
+    except KeyError:
+        return [item.get(key, MISSING) for item in items]
+
+
+def type_mask(values: list[Any], allowed: Optional[set[type]]) -> Optional[np.ndarray]:
+    # One C-level pass over the types; per-row masks only when something is off
+    if allowed is None or set(map(type, values)) <= allowed:
+        return None
+    return np.fromiter(
+        (type(value) not in allowed for value in values), bool, len(values)
+    )
+
+
+def nested_mask(spec: ColumnSpec, values: list[Any]) -> np.ndarray:
+    count = len(values)
+    container = dict if spec.kind == "model" else list
+    bad = np.fromiter((type(value) is not container for value in values), bool, count)
+    if spec.kind == "model":
+        items = [{} if is_bad else value for value, is_bad in zip(values, bad)]
+        owners = np.arange(count)
+    else:
+        lists = [[] if is_bad else value for value, is_bad in zip(values, bad)]
+        lengths = np.fromiter(map(len, lists), np.int64, count)
+        owners = np.repeat(np.arange(count), lengths)
+        items = [item for items in lists for item in items]
+    if not items:
+        return bad
+
+    (key, allowed), *_ = spec.leaves
+    if not key:
+        masks = [type_mask(items, allowed)]
+    else:
+        masks = [type_mask(items, {dict})]
+        if masks[0] is not None:
+            items = [item if type(item) is dict else {} for item in items]
+        # Same key count plus every leaf present means no extra keys to drop
+        if set(map(len, items)) != {len(spec.leaves)}:
+            masks.append(
+                np.fromiter((len(item) != len(spec.leaves) for item in items), bool)
+            )
+        for key, allowed in spec.leaves:
+            leaf = leaf_values(items, key)
+            if allowed is None:
+                masks.append(np.fromiter((value is MISSING for value in leaf), bool))
+            else:
+                masks.append(type_mask(leaf, allowed))
+
+    for mask in masks:
+        if mask is not None:
+            bad[owners[mask]] = True
+    return bad
+
+
+def validate_slow(
+    spec: ColumnSpec,
+    values: list[Any],
+    rows: np.ndarray,
+    valid: np.ndarray,
+    errors: list,
+    model_name: str,
+) -> list[Any]:
+    # Values may be shared with other models, so fix up a copy
+    values = list(values)
+    adapter = TypeAdapter(spec.annotation)
+    for i in rows.tolist():
+        value = values[i]
+        values[i] = None
+        if value is MISSING:
+            valid[i] = False
+            errors.append(RowError(model_name, i, spec.name, "missing"))
+            continue
+        try:
+            values[i] = adapter.dump_python(adapter.validate_python(value))
+        except ValidationError as err:
+            valid[i] = False
+            errors.append(RowError(model_name, i, spec.name, err.errors()[0]["msg"]))
+    return values
+
+
+def date_parts(values: list[Any]) -> list[np.ndarray]:
+    values = [None if value is MISSING else value for value in values]
+    try:
+        dates = pa.array(values, DATE_TYPE)
+        return [
+            pc.fill_null(pc.struct_field(dates, part), 0).to_numpy()
+            for part in DATE_PARTS
+        ]
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        parts = np.zeros((3, len(values)), dtype=np.int64)
+        for i, value in enumerate(values):
+            if value:
+                for j, part in enumerate(DATE_PARTS):
+                    parts[j, i] = value.get(part) or 0
+        return list(parts)
+
+
+def assemble_dates(values: list[Any]) -> tuple[pa.Array, np.ndarray]:
+    # Batched FuzzyDate -> "YYYY-MM-DD"; incomplete dates become null like Flattened
+    years, months, days = date_parts(values)
+    complete = (years > 0) & (months > 0) & (days > 0)
+
+    months_since_epoch = (np.where(complete, years, 1970) - 1970) * 12 + (
+        np.where(complete, months, 1) - 1
+    )
+    first_of_month = months_since_epoch.astype("datetime64[M]")
+    dates = first_of_month.astype("datetime64[D]") + (
+        np.where(complete, days, 1) - 1
+    ).astype("timedelta64[D]")
+    # datetime() rejects impossible dates (month 13, Feb 30) instead of rolling over
+    valid = ~complete | (
+        (months <= 12) & (dates.astype("datetime64[M]") == first_of_month)
+    )
+    strings = pa.array(np.datetime_as_string(dates, unit="D"), pa.string())
+    return pc.if_else(pa.array(complete), strings, pa.scalar(None, pa.string())), valid
+
+
+def flatten_image(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "extraLarge" in value:
+            return value["extraLarge"]
+        if "large" in value:
+            return value["large"]
+    return value
+
+
+def build_column(
+    spec: ColumnSpec,
+    values: list[Any],
+    valid: np.ndarray,
+    errors: list,
+    model_name: str,
+    dates: dict[str, tuple[pa.Array, np.ndarray]],
+) -> Any:
+    if spec.kind == "date":
+        # Every Flattened model converts all dates, so assemble each one once
+        if spec.name not in dates:
+            dates[spec.name] = assemble_dates(values)
+        column, ok = dates[spec.name]
+        for i in np.flatnonzero(~ok).tolist():
+            valid[i] = False
+            errors.append(RowError(model_name, i, spec.name, "invalid date"))
+        return column
+
+    if spec.kind in ("image", "scalar"):
+        if spec.kind == "image":
+            values = [flatten_image(value) for value in values]
+            base, optional = str, spec.optional
+        else:
+            base, optional = unwrap(spec.annotation)
+        bad = type_mask(values, allowed_types(base, optional))
+        if bad is not None:
+            values = validate_slow(
+                spec, values, np.flatnonzero(bad), valid, errors, model_name
+            )
+        return pa.array(values, ARROW_TYPES[base])
+
+    # Nested columns stay Python objects, matching pydantic's model_dump output
+    if spec.kind in ("model", "model_list", "list"):
+        bad = nested_mask(spec, values)
+    else:
+        bad = np.fromiter((value is MISSING for value in values), bool, len(values))
+    if bad.any():
+        values = validate_slow(
+            spec, values, np.flatnonzero(bad), valid, errors, model_name
+        )
+    return values
+
+
+def model_specs_with_dates(model: type[BaseModel]) -> list[ColumnSpec]:
+    specs = model_specs(model)
+    # Flattened converts every date on the row, even ones the model drops
+    if issubclass(model, schemas.Flattened):
+        for name in schemas.DATE_FIELDS:
+            if name not in model.model_fields:
+                specs.append(ColumnSpec(name, "date", Any, True, merged_sources(name)))
+    return specs
+
+
+def build_dataframe(columns: dict[str, Any], valid: np.ndarray) -> pd.DataFrame:
+    if not valid.any():
+        return pd.DataFrame()
+
+    keep = pa.array(valid)
+    scalar = {
+        name: column.filter(keep) if not valid.all() else column
+        for name, column in columns.items()
+        if isinstance(column, pa.Array)
+    }
+    df = (
+        pa.table(scalar).to_pandas()
+        if scalar
+        else pd.DataFrame(index=range(int(valid.sum())))
+    )
+    for name, column in columns.items():
+        if not isinstance(column, pa.Array):
+            df[name] = column if valid.all() else list(compress(column, valid))
+    return df[list(columns)]
+
+
+def convert_entries_columnar(
+    entries: Sequence[dict],
+    models: Sequence[type[BaseModel]],
+    errors: Optional[list[RowError]] = None,
+) -> list[pd.DataFrame]:
+    errors = errors if errors is not None else []
+    # Read straight from entry and media instead of building a merged row per entry
+    owners = {"entry": entries, "media": [entry["media"] for entry in entries]}
+    # Models overlap (dates, episodes, status), so each source is read once
+    values_cache: dict[tuple[Source, ...], list[Any]] = {}
+    dates: dict[str, tuple[pa.Array, np.ndarray]] = {}
+
+    dfs = []
+    for model in models:
+        valid = np.ones(len(entries), dtype=bool)
+        columns = {}
+        for spec in model_specs_with_dates(model):
+            key = tuple(spec.sources)
+            if key not in values_cache:
+                values_cache[key] = column_values(owners, spec.sources)
+            values = values_cache[key]
+            column = build_column(spec, values, valid, errors, model.__name__, dates)
+            if spec.name in model.model_fields:
+                columns[spec.name] = column
+        dfs.append(build_dataframe(columns, valid))
+    return dfs
@@ -0,0 +1,35 @@
+import json
+
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+
+class NDJSONWriter:
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.rows = 0
+        self.bytes = 0
+
+    def __enter__(self) -> "NDJSONWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "wb")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def write(self, rows: Iterable[Any]):
+        lines = [json.dumps(row).encode() + b"\n" for row in rows]
+        chunk = b"".join(lines)
+        self.file.write(chunk)
+        # Flush each batch so readers can start on it before the next one lands
+        self.file.flush()
+        self.rows += len(lines)
+        self.bytes += len(chunk)
+
+
+def read_ndjson(path: Path | str) -> Iterator[Any]:
+    with open(path, "rb") as ndjson_file:
+        for line in ndjson_file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,192 @@
+import itertools
+import json
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+MANIFEST_FILENAME = "_manifest.json"
+
+Partition = tuple[Any, ...]
+
+
+@dataclass
+class ParquetOptions:
+    row_group_size: int = 64 * 1024
+    compression: str = "zstd"
+    compression_level: Optional[int] = 3
+    dictionary_columns: list[str] = field(default_factory=list)
+
+
+def partition_path(columns: list[str], partition: Partition) -> str:
+    # Same layout DuckDB writes for PARTITION_BY, including NULL partitions
+    return "/".join(
+        f"{column}={'NULL' if value is None else value}"
+        for column, value in zip(columns, partition)
+    )
+
+
+def split_partitions(
+    table: pa.Table, columns: list[str]
+) -> Iterator[tuple[Partition, pa.Table]]:
+    # Rows must already be sorted by the partition columns
+    keys = zip(*(table[column].to_pylist() for column in columns))
+    offset = 0
+    for partition, rows in itertools.groupby(keys):
+        length = sum(1 for _ in rows)
+        yield partition, table.slice(offset, length)
+        offset += length
+
+
+def stats_value(value: Any) -> Any:
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return str(value)
+
+
+def file_stats(metadata: pq.FileMetaData, columns: Iterable[str]) -> dict[str, dict]:
+    # Min/max over all row groups, for the columns readers filter on
+    stats: dict[str, dict] = {}
+    names = metadata.schema.names
+    for column in columns:
+        if column not in names:
+            continue
+        index = names.index(column)
+        lows, highs, nulls = [], [], 0
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(index).statistics
+            if statistics is None:
+                break
+            nulls += statistics.null_count or 0
+            if statistics.has_min_max:
+                lows.append(statistics.min)
+                highs.append(statistics.max)
+        else:
+            stats[column] = {
+                "min": stats_value(min(lows)) if lows else None,
+                "max": stats_value(max(highs)) if highs else None,
+                "null_count": nulls,
+            }
+    return stats
+
+
+def stats_columns(schema: pa.Schema, dictionary_columns: list[str]) -> list[str]:
+    # Long free-text columns make poor filters and bloat the manifest
+    return [
+        field.name
+        for field in schema
+        if not pa.types.is_string(field.type) or field.name in dictionary_columns
+    ]
+
+
+class ParquetStore:
+    def __init__(
+        self,
+        root: Path | str,
+        partition_columns: list[str],
+        options: ParquetOptions,
+    ):
+        self.root = Path(root)
+        self.partition_columns = partition_columns
+        self.options = options
+
+    @property
+    def manifest_path(self) -> Path:
+        return Path(self.root, MANIFEST_FILENAME)
+
+    def load_manifest(self) -> dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"version": 0, "watermark": None, "files": []}
+        with open(self.manifest_path, "r") as manifest_file:
+            return json.load(manifest_file)
+
+    def write_manifest(self, manifest: dict[str, Any]):
+        # Readers that go through the manifest see either the old or the new files
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def write_partition(self, partition: Partition, table: pa.Table) -> dict[str, Any]:
+        directory = partition_path(self.partition_columns, partition)
+        path = Path(self.root, directory, f"part-{uuid.uuid4().hex}.parquet")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Partition values live in the directory names, not in the files
+        table = table.drop_columns(
+            [c for c in self.partition_columns if c in table.column_names]
+        )
+        dictionary = [
+            c for c in self.options.dictionary_columns if c in table.schema.names
+        ]
+        tmp_path = path.with_suffix(".tmp")
+        pq.write_table(
+            table,
+            tmp_path,
+            row_group_size=self.options.row_group_size,
+            compression=self.options.compression,
+            compression_level=self.options.compression_level,
+            use_dictionary=dictionary,
+        )
+        os.replace(tmp_path, path)
+
+        metadata = pq.read_metadata(path)
+        columns = stats_columns(table.schema, dictionary)
+        return {
+            "path": str(path.relative_to(self.root)),
+            "partition": dict(zip(self.partition_columns, partition)),
+            "rows": metadata.num_rows,
+            "row_groups": metadata.num_row_groups,
+            "bytes": path.stat().st_size,
+            "stats": file_stats(metadata, columns),
+        }
+
+    def swap_partitions(
+        self,
+        tables: Iterable[tuple[Partition, pa.Table]],
+        replaced: set[Partition],
+        watermark: Any,
+    ) -> dict[str, Any]:
+        # New files first, then one manifest swap, then the superseded files go
+        manifest = self.load_manifest()
+        written = [
+            self.write_partition(partition, table)
+            for partition, table in tables
+            if table.num_rows
+        ]
+        replaced = replaced | {
+            tuple(entry["partition"][c] for c in self.partition_columns)
+            for entry in written
+        }
+
+        kept, removed = [], []
+        for entry in manifest["files"]:
+            partition = tuple(entry["partition"][c] for c in self.partition_columns)
+            (removed if partition in replaced else kept).append(entry)
+
+        if not written and not removed and watermark == manifest["watermark"]:
+            return manifest
+
+        manifest = {
+            "version": manifest["version"] + 1,
+            "watermark": watermark,
+            "partition_columns": self.partition_columns,
+            "files": sorted(kept + written, key=lambda entry: entry["path"]),
+        }
+        self.write_manifest(manifest)
+
+        for entry in removed:
+            path = Path(self.root, entry["path"])
+            path.unlink(missing_ok=True)
+            for parent in path.parents:
+                if parent == self.root or any(parent.iterdir()):
+                    break
+                parent.rmdir()
+        return manifest
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import pandas as pd
+import pyarrow as pa
+
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+
+def result_digest(df: pd.DataFrame, options: dict[str, Any]) -> str:
+    # Arrow IPC bytes are stable for equal results, unlike pickles or reprs
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode())
+    digest.update(sink.getvalue())
+    return digest.hexdigest()
+
+
+class PlotCache:
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+
+    def paths(self, name: str) -> tuple[Path, Path, Path]:
+        stem = Path(self.path, name)
+        return (
+            stem.with_suffix(".html"),
+            stem.with_suffix(".png"),
+            stem.with_suffix(".sha256"),
+        )
+
+    def get(self, name: str, digest: str) -> Optional[bytes]:
+        html_path, png_path, digest_path = self.paths(name)
+        if not all(path.exists() for path in (html_path, png_path, digest_path)):
+            return None
+        if digest_path.read_text() != digest:
+            return None
+        return png_path.read_bytes()
+
+    def put(self, name: str, digest: str, html: str, png: bytes):
+        # The digest goes last so an interrupted write is never treated as a hit
+        html_path, png_path, digest_path = self.paths(name)
+        digest_path.unlink(missing_ok=True)
+        html_path.write_text(html)
+        png_path.write_bytes(png)
+        digest_path.write_text(digest)
+
+
+class PlotRenderer:
+    def __init__(self, scale: Optional[float] = None):
+        self.scale = scale
+
+    def render(self, figures: Sequence[Any]) -> list[bytes]:
+        # plotly keeps one kaleido subprocess per process, started on the first
+        # image and stopped by kaleido itself when the process exits. Imported here
+        # so loading definitions doesn't pay for plotly.
+        import plotly.io as pio
+
+        return [
+            pio.to_image(figure, format="png", scale=self.scale) for figure in figures
+        ]
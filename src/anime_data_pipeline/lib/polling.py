@@ -0,0 +1,93 @@
+import json
+
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from .anilist import AniListAPIError
+
+# What a probe found compared to the previous one
+UPDATED = "updated"
+REMOVED = "removed"
+
+
+@dataclass(frozen=True)
+class ListProbe:
+    entries: int
+    updated_at: int
+
+
+def parse_probe(data: Any) -> ListProbe:
+    if not data or not data.get("data") or not data["data"].get("User"):
+        raise AniListAPIError(f"probe failed: {(data or {}).get('errors')}")
+    user = data["data"]["User"]
+    latest = data["data"].get("Page", {}).get("mediaList") or [{}]
+    return ListProbe(
+        entries=user["statistics"]["anime"]["count"],
+        updated_at=max(latest[0].get("updatedAt") or 0, user.get("updatedAt") or 0),
+    )
+
+
+@dataclass
+class PollState:
+    entries: int = 0
+    updated_at: int = 0
+    interval_seconds: float = 0.0
+    next_poll_at: float = 0.0
+    changed_at: Optional[float] = None
+
+
+@dataclass
+class PollPolicy:
+    min_interval_seconds: float = 60.0
+    max_interval_seconds: float = 6 * 3600.0
+    backoff: float = 2.0
+    max_probes_per_tick: int = 25
+
+    def due(self, state: Optional[PollState], now: float) -> bool:
+        return state is None or state.next_poll_at <= now
+
+    def due_users(
+        self, states: dict[str, PollState], user_names: list[str], now: float
+    ) -> list[str]:
+        # Longest overdue first, new users before all; the rest wait for a later tick
+        due = [name for name in user_names if self.due(states.get(name), now)]
+        due.sort(key=lambda name: states[name].next_poll_at if name in states else 0.0)
+        return due[: self.max_probes_per_tick]
+
+    def update(
+        self, state: Optional[PollState], probe: Optional[ListProbe], now: float
+    ) -> tuple[PollState, Optional[str]]:
+        # Active users are polled at the minimum interval, idle ones back off to the
+        # maximum. A failed probe (None) counts as idle so errors don't add load.
+        change = None
+        if state is None:
+            state = PollState(interval_seconds=self.min_interval_seconds)
+            if probe is not None:
+                state.entries, state.updated_at = probe.entries, probe.updated_at
+        elif probe is not None and probe.entries < state.entries:
+            change = REMOVED
+        elif probe is not None and (
+            probe.updated_at > state.updated_at or probe.entries != state.entries
+        ):
+            change = UPDATED
+        else:
+            state.interval_seconds = min(
+                state.interval_seconds * self.backoff, self.max_interval_seconds
+            )
+
+        if change is not None:
+            state.entries, state.updated_at = probe.entries, probe.updated_at
+            state.interval_seconds = self.min_interval_seconds
+            state.changed_at = now
+        state.next_poll_at = now + state.interval_seconds
+        return state, change
+
+
+def dump_states(states: dict[str, PollState]) -> str:
+    return json.dumps({name: asdict(state) for name, state in sorted(states.items())})
+
+
+def load_states(cursor: Optional[str]) -> dict[str, PollState]:
+    return {
+        name: PollState(**state) for name, state in json.loads(cursor or "{}").items()
+    }
@@ -0,0 +1,178 @@
+import duckdb
+
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+@dataclass
+class RuleResult:
+    rule: str
+    passed: bool
+    failures: int = 0
+    detail: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class QualityReport:
+    rows: int
+    results: list[RuleResult] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return all(result.passed for result in self.results)
+
+    @property
+    def failed(self) -> list[str]:
+        return [result.rule for result in self.results if not result.passed]
+
+
+@dataclass(frozen=True)
+class Unique:
+    column: str
+
+    @property
+    def name(self) -> str:
+        return f"unique({self.column})"
+
+    def exprs(self) -> list[str]:
+        return [f"COUNT({self.column}) - COUNT(DISTINCT {self.column})"]
+
+    def evaluate(self, values: list[Any], rows: int) -> RuleResult:
+        (duplicates,) = values
+        return RuleResult(self.name, duplicates == 0, duplicates)
+
+
+@dataclass(frozen=True)
+class NotNull:
+    column: str
+    max_rate: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"not_null({self.column})"
+
+    def exprs(self) -> list[str]:
+        return [f"COUNT(*) FILTER (WHERE {self.column} IS NULL)"]
+
+    def evaluate(self, values: list[Any], rows: int) -> RuleResult:
+        (nulls,) = values
+        rate = nulls / rows if rows else 0.0
+        return RuleResult(
+            self.name, rate <= self.max_rate, nulls, {"null_rate": round(rate, 4)}
+        )
+
+
+@dataclass(frozen=True)
+class InRange:
+    column: str
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return f"in_range({self.column})"
+
+    def exprs(self) -> list[str]:
+        outside = [
+            condition
+            for bound, condition in [
+                (self.min, f"{self.column} < {self.min}"),
+                (self.max, f"{self.column} > {self.max}"),
+            ]
+            if bound is not None
+        ]
+        return [
+            f"COUNT(*) FILTER (WHERE {' OR '.join(outside) or 'false'})",
+            f"MIN({self.column})",
+            f"MAX({self.column})",
+        ]
+
+    def evaluate(self, values: list[Any], rows: int) -> RuleResult:
+        outside, low, high = values
+        return RuleResult(self.name, outside == 0, outside, {"min": low, "max": high})
+
+
+@dataclass(frozen=True)
+class ForeignKey:
+    column: str
+    table: str
+    ref_column: str = "id"
+
+    @property
+    def name(self) -> str:
+        return f"foreign_key({self.column})"
+
+    def exprs(self) -> list[str]:
+        # The referenced keys are hashed once, then probed during the same scan
+        refs = (
+            f"SELECT {self.ref_column} FROM {self.table}"
+            f" WHERE {self.ref_column} IS NOT NULL"
+        )
+        return [
+            f"COUNT(*) FILTER (WHERE {self.column} IS NOT NULL"
+            f" AND {self.column} NOT IN ({refs}))"
+        ]
+
+    def evaluate(self, values: list[Any], rows: int) -> RuleResult:
+        (orphans,) = values
+        return RuleResult(self.name, orphans == 0, orphans, {"references": self.table})
+
+
+@dataclass(frozen=True)
+class Fresh:
+    column: str
+    max_age_seconds: float
+
+    @property
+    def name(self) -> str:
+        return f"fresh({self.column})"
+
+    def exprs(self) -> list[str]:
+        # Timestamps are written as CURRENT_TIMESTAMP::TIMESTAMP, so the age is
+        # taken against the same session time zone
+        return [f"epoch(CURRENT_TIMESTAMP::TIMESTAMP - MAX({self.column}))"]
+
+    def evaluate(self, values: list[Any], rows: int) -> RuleResult:
+        (age,) = values
+        passed = age is not None and age <= self.max_age_seconds
+        return RuleResult(self.name, passed, 0 if passed else 1, {"age_seconds": age})
+
+
+Rule = Unique | NotNull | InRange | ForeignKey | Fresh
+
+
+@dataclass(frozen=True)
+class Suite:
+    rules: tuple[Rule, ...] = ()
+    min_rows: int = 1
+
+    def aggregates(self, rules: Optional[list[Rule]] = None) -> str:
+        rules = self.rules if rules is None else rules
+        exprs = ["COUNT(*)"] + [expr for rule in rules for expr in rule.exprs()]
+        return ", ".join(exprs)
+
+    def sql(self, table: str) -> str:
+        return f"SELECT {self.aggregates()} FROM {table}"
+
+    def run(self, relation: duckdb.DuckDBPyRelation) -> QualityReport:
+        # Every rule is an aggregate over the same relation, so it is scanned once
+        # however many rules there are. Rules on missing columns fail unscanned.
+        columns = set(relation.columns)
+        present = [rule for rule in self.rules if rule.column in columns]
+        # aggregate() adds no view, so this also runs on read-only connections
+        rows, *values = relation.aggregate(self.aggregates(present)).fetchone()
+
+        report = QualityReport(rows)
+        report.results.append(
+            RuleResult("min_rows", rows >= self.min_rows, detail={"rows": rows})
+        )
+        for rule in self.rules:
+            if rule.column not in columns:
+                report.results.append(
+                    RuleResult(rule.name, False, detail={"error": "missing column"})
+                )
+                continue
+            count = len(rule.exprs())
+            report.results.append(rule.evaluate(values[:count], rows))
+            values = values[count:]
+        return report
@@ -0,0 +1,235 @@
+import json
+import re
+import typing
+
+from pydantic import BaseModel
+from typing import Any, Iterable, Optional
+
+from . import schemas
+
+Selection = dict[str, Optional["Selection"]]
+
+# Fields read by downstream assets that are not pydantic fields (dbt models, delta ingest, checks)
+REQUIRED_ENTRY = "id userId mediaId status updatedAt media { id status }"
+REQUIRED_LIST = "name status"
+REQUIRED_USER = "id name"
+
+ENTRY_FIELDS = {
+    "id",
+    "userId",
+    "mediaId",
+    "progress",
+    "score",
+    "status",
+    "startedAt",
+    "completedAt",
+    "updatedAt",
+}
+FIELD_ALIASES = {"watchStatus": "status"}
+IMAGE_FIELDS = {"coverImage": "extraLarge", "avatar": "large"}
+
+# Any-typed model fields are stored whole, so spell out what to request
+OPAQUE_SELECTIONS = {
+    "stats": """
+        scoreDistribution { score amount }
+        statusDistribution { status amount }
+    """,
+    "rankings": "id rank type format year season allTime context",
+    "statistics": """
+        anime {
+            count meanScore standardDeviation minutesWatched episodesWatched
+            formats { count meanScore minutesWatched format }
+            statuses { count meanScore minutesWatched status }
+            scores { count meanScore minutesWatched score }
+            lengths { count meanScore minutesWatched length }
+            releaseYears { count meanScore minutesWatched releaseYear }
+            startYears { count meanScore minutesWatched startYear }
+            genres { count meanScore minutesWatched genre }
+            tags { count meanScore minutesWatched tag { name } }
+            countries { count meanScore minutesWatched country }
+            studios { count meanScore minutesWatched studio { name } }
+        }
+    """,
+}
+
+ASSET_MODELS: dict[str, type[BaseModel]] = {
+    "fact_anime": schemas.FactAnime,
+    "dimension_media": schemas.DimensionMedia,
+    "dimension_user": schemas.DimensionUser,
+}
+USER_ASSETS = {"dimension_user"}
+
+
+def parse_selection(text: str) -> Selection:
+    tokens = re.findall(r"[{}]|[A-Za-z_][A-Za-z0-9_]*", text)
+    stack: list[Selection] = [{}]
+    last: Optional[str] = None
+    for token in tokens:
+        if token == "{":
+            child: Selection = {}
+            stack[-1][last] = child
+            stack.append(child)
+        elif token == "}":
+            stack.pop()
+        else:
+            stack[-1].setdefault(token, None)
+            last = token
+    return stack[0]
+
+
+def merge_selection(left: Selection, right: Selection) -> Selection:
+    merged = dict(left)
+    for name, child in right.items():
+        if merged.get(name) is not None and child is not None:
+            merged[name] = merge_selection(merged[name], child)
+        else:
+            merged[name] = merged.get(name) or child
+    return merged
+
+
+def unwrap_model(annotation: Any) -> Optional[type[BaseModel]]:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in typing.get_args(annotation):
+        model = unwrap_model(arg)
+        if model:
+            return model
+    return None
+
+
+def field_selection(name: str, annotation: Any) -> Optional[Selection]:
+    if name in schemas.DATE_FIELDS:
+        return parse_selection("year month day")
+    if name in IMAGE_FIELDS:
+        return parse_selection(IMAGE_FIELDS[name])
+    if name in OPAQUE_SELECTIONS:
+        return parse_selection(OPAQUE_SELECTIONS[name])
+    model = unwrap_model(annotation)
+    if model:
+        return model_selection(model)
+    return None
+
+
+def model_selection(model: type[BaseModel]) -> Selection:
+    return {
+        name: field_selection(name, field.annotation)
+        for name, field in model.model_fields.items()
+    }
+
+
+def entry_selection(models: Iterable[type[BaseModel]]) -> Selection:
+    # Entry models validate `media | entry`, so split fields back out by owner
+    entry = parse_selection(REQUIRED_ENTRY)
+    media = entry.pop("media")
+    for model in models:
+        for name, child in model_selection(model).items():
+            name = FIELD_ALIASES.get(name, name)
+            owner = entry if name in ENTRY_FIELDS else media
+            owner.update(merge_selection(owner, {name: child}))
+    entry["media"] = media
+    return entry
+
+
+def user_selection(models: Iterable[type[BaseModel]]) -> Selection:
+    user = parse_selection(REQUIRED_USER)
+    for model in models:
+        user = merge_selection(user, model_selection(model))
+    return user
+
+
+def asset_selections(assets: Iterable[str]) -> tuple[Selection, Selection]:
+    assets = list(assets)
+    unknown = set(assets) - set(ASSET_MODELS)
+    if unknown:
+        raise ValueError(f"unknown assets: {sorted(unknown)}")
+    entry_models = [ASSET_MODELS[a] for a in assets if a not in USER_ASSETS]
+    user_models = [ASSET_MODELS[a] for a in assets if a in USER_ASSETS]
+    return entry_selection(entry_models), user_selection(user_models)
+
+
+def render_selection(selection: Selection, depth: int) -> list[str]:
+    indent = "  " * depth
+    lines = []
+    for name, child in selection.items():
+        if child is None:
+            lines.append(f"{indent}{name}")
+        else:
+            lines.append(f"{indent}{name} {{")
+            lines.extend(render_selection(child, depth + 1))
+            lines.append(f"{indent}}}")
+    return lines
+
+
+def build_anilist_query(assets: Iterable[str] = ASSET_MODELS) -> str:
+    selection = payload_selection(assets)["data"]
+    lists = selection["MediaListCollection"]["lists"]
+    user = selection["User"]
+    lines = [
+        "query AnimeListQuery($userName: String) {",
+        "  MediaListCollection(userName: $userName, type: ANIME) {",
+        "    lists {",
+        *render_selection(lists, 3),
+        "    }",
+        "  }",
+        "",
+        "  User(name: $userName) {",
+        *render_selection(user, 2),
+        "  }",
+        "}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def build_anilist_page_query(
+    assets: Iterable[str] = ASSET_MODELS, name: str = "AnimeListPageQuery"
+) -> str:
+    entry, _ = asset_selections(assets)
+    arguments = "userName: $userName, type: ANIME"
+    lines = [
+        f"query {name}($userName: String, $page: Int, $perPage: Int) {{",
+        "  Page(page: $page, perPage: $perPage) {",
+        "    pageInfo {",
+        "      currentPage",
+        "      hasNextPage",
+        "    }",
+        f"    mediaList({arguments}) {{",
+        *render_selection(entry, 3),
+        "    }",
+        "  }",
+        "}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def payload_selection(assets: Iterable[str] = ASSET_MODELS) -> Selection:
+    entry, user = asset_selections(assets)
+    lists = merge_selection(parse_selection(REQUIRED_LIST), {"entries": entry})
+    return {
+        "data": {"MediaListCollection": {"lists": lists}, "User": user},
+    }
+
+
+def prune_payload(data: Any, selection: Optional[Selection]) -> Any:
+    if selection is None or data is None:
+        return data
+    if isinstance(data, list):
+        return [prune_payload(item, selection) for item in data]
+    if isinstance(data, dict):
+        return {
+            name: prune_payload(data[name], child)
+            for name, child in selection.items()
+            if name in data
+        }
+    return data
+
+
+def payload_size_report(
+    data: Any, assets: Iterable[str] = ASSET_MODELS
+) -> dict[str, Any]:
+    before = len(json.dumps(data).encode())
+    after = len(json.dumps(prune_payload(data, payload_selection(assets))).encode())
+    return {
+        "before_bytes": before,
+        "after_bytes": after,
+        "reduction": round(1 - after / before, 4) if before else 0.0,
+    }
@@ -3,6 +3,10 @@ from datetime import datetime
 from typing import List, Any, Optional
 
 
+DATE_FIELDS = ["startedAt", "completedAt", "startDate", "endDate"]
+IMAGE_FIELDS = ["coverImage", "avatar"]
+
+
 class Entries(BaseModel):
     entries: List[Any]
     name: str
@@ -40,12 +44,10 @@ class Flattened(BaseModel):
     @classmethod
     def flatten(cls, data: Optional[Any]) -> Optional[Any]:
         if data:
-            cls.convert_date("startedAt", data)
-            cls.convert_date("completedAt", data)
-            cls.convert_date("startDate", data)
-            cls.convert_date("endDate", data)
-            cls.flatten_image("coverImage", data)
-            cls.flatten_image("avatar", data)
+            for field in DATE_FIELDS:
+                cls.convert_date(field, data)
+            for field in IMAGE_FIELDS:
+                cls.flatten_image(field, data)
         return data
 
     @classmethod
@@ -0,0 +1,221 @@
+import json
+import mmap
+import os
+import struct
+import msgpack
+import orjson
+import zstandard
+
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+FRAMED_MAGIC = b"ADPF1\n"
+HEADER_LENGTH = struct.Struct("<I")
+
+
+class Codec:
+    def __init__(
+        self,
+        name: str,
+        suffix: str,
+        encode: Callable[[Any], bytes],
+        decode: Callable[[Any], Any],
+        framed: bool,
+    ):
+        self.name = name
+        self.suffix = suffix
+        self.encode = encode
+        self.decode = decode
+        self.framed = framed
+
+
+def zstd_encode(
+    encode: Callable[[Any], bytes], level: int = 3
+) -> Callable[[Any], bytes]:
+    compressor = zstandard.ZstdCompressor(level=level)
+    return lambda value: compressor.compress(encode(value))
+
+
+def zstd_decode(decode: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    decompressor = zstandard.ZstdDecompressor()
+    return lambda buffer: decode(decompressor.decompress(buffer))
+
+
+def json_encode(value: Any) -> bytes:
+    return json.dumps(value).encode()
+
+
+def json_decode(buffer: Any) -> Any:
+    return json.loads(bytes(buffer))
+
+
+def msgpack_encode(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def msgpack_decode(buffer: Any) -> Any:
+    return msgpack.unpackb(buffer, raw=False)
+
+
+# Plain JSON codecs keep the file readable by DuckDB (dbt_raw); framed codecs
+# split the document into independently decodable sections for lazy loads.
+CODECS = {
+    codec.name: codec
+    for codec in [
+        Codec("json", ".json", json_encode, json_decode, False),
+        Codec("orjson", ".json", orjson.dumps, orjson.loads, False),
+        Codec("msgpack", ".msgpack", msgpack_encode, msgpack_decode, True),
+        Codec(
+            "json.zst",
+            ".json.zst",
+            zstd_encode(orjson.dumps),
+            zstd_decode(orjson.loads),
+            True,
+        ),
+        Codec(
+            "msgpack.zst",
+            ".msgpack.zst",
+            zstd_encode(msgpack_encode),
+            zstd_decode(msgpack_decode),
+            True,
+        ),
+    ]
+}
+
+
+def get_codec(name: str) -> Codec:
+    if name not in CODECS:
+        raise ValueError(f"unknown codec {name}, expected one of {sorted(CODECS)}")
+    return CODECS[name]
+
+
+def codec_for_path(path: Path | str) -> Codec:
+    # Longest suffix wins so .json.zst is not mistaken for .json
+    name = Path(path).name
+    for codec in sorted(CODECS.values(), key=lambda codec: -len(codec.suffix)):
+        if name.endswith(codec.suffix):
+            return codec
+    raise ValueError(f"no codec for {path}")
+
+
+def build_frames(
+    value: Any, codec: Codec, depth: int, frames: list[bytes], offset: int
+) -> tuple[dict, int]:
+    if depth > 0 and isinstance(value, dict):
+        keys = {}
+        for key, child in value.items():
+            keys[key], offset = build_frames(child, codec, depth - 1, frames, offset)
+        return {"keys": keys}, offset
+
+    frame = codec.encode(value)
+    frames.append(frame)
+    return {"frame": [offset, len(frame)]}, offset + len(frame)
+
+
+def dump(value: Any, path: Path | str, codec: Codec, split_depth: int = 2) -> int:
+    if not codec.framed:
+        payload = codec.encode(value)
+        with open(path, "wb") as out_file:
+            out_file.write(payload)
+        return len(payload)
+
+    frames: list[bytes] = []
+    root, _ = build_frames(value, codec, split_depth, frames, 0)
+    header = json.dumps({"codec": codec.name, "root": root}).encode()
+    with open(path, "wb") as out_file:
+        out_file.write(FRAMED_MAGIC)
+        out_file.write(HEADER_LENGTH.pack(len(header)))
+        out_file.write(header)
+        for frame in frames:
+            out_file.write(frame)
+    return len(FRAMED_MAGIC) + HEADER_LENGTH.size + len(header) + sum(map(len, frames))
+
+
+class LazyMapping(Mapping):
+    def __init__(
+        self,
+        node: dict,
+        buffer: memoryview,
+        codec: Codec,
+        mapped: Optional[mmap.mmap] = None,
+    ):
+        self._keys = node["keys"]
+        self._buffer = buffer
+        self._codec = codec
+        self._values: dict[str, Any] = {}
+        # Only the root mapping owns the file mapping its children read from
+        self._mapped = mapped
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._values:
+            self._values[key] = load_node(self._keys[key], self._buffer, self._codec)
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"LazyMapping({list(self._keys)})"
+
+    def close(self):
+        # Sections not decoded yet can no longer be read
+        if self._mapped is not None:
+            self._buffer.release()
+            self._mapped.close()
+            self._mapped = None
+
+
+def load_node(node: dict, buffer: memoryview, codec: Codec) -> Any:
+    if "keys" in node:
+        return LazyMapping(node, buffer, codec)
+    offset, length = node["frame"]
+    return codec.decode(buffer[offset : offset + length])
+
+
+def load(path: Path | str, codec: Codec) -> Any:
+    with open(path, "rb") as in_file:
+        # mmap's own error for an empty file does not say which file it was
+        if os.fstat(in_file.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty")
+        mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if not codec.framed:
+        view = memoryview(mapped)
+        try:
+            return codec.decode(view)
+        finally:
+            view.release()
+            mapped.close()
+
+    try:
+        if mapped[: len(FRAMED_MAGIC)] != FRAMED_MAGIC:
+            raise ValueError(f"{path} is not a framed {codec.name} file")
+        start = len(FRAMED_MAGIC)
+        (header_length,) = HEADER_LENGTH.unpack_from(mapped, start)
+        start += HEADER_LENGTH.size
+        header = json.loads(mapped[start : start + header_length])
+    except Exception:
+        mapped.close()
+        raise
+    frames = memoryview(mapped)[start + header_length :]
+    root = header["root"]
+    if "keys" in root:
+        return LazyMapping(root, frames, codec, mapped)
+    try:
+        return load_node(root, frames, codec)
+    finally:
+        frames.release()
+        mapped.close()
+
+
+def materialize(value: Any) -> Any:
+    # Decodes every section, then unmaps the file behind a loaded mapping
+    if isinstance(value, LazyMapping):
+        data = {key: materialize(child) for key, child in value.items()}
+        value.close()
+        return data
+    return value
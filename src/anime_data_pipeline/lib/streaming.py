@@ -0,0 +1,286 @@
+import hashlib
+import os
+import threading
+import time
+import orjson
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+# (topic, key, value); a None value is a tombstone
+Event = tuple[str, Any, Any]
+
+# The Dagster partition an event was produced for, so a sink can store its rows
+# under the same key the partitioned IO manager rewrites
+PARTITION_KEY_HEADER = "partition_key"
+
+
+def parse_api_version(version: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in version.split("."))
+
+
+def encode_key(key: Any) -> bytes:
+    return str(key).encode()
+
+
+def entry_key(entry: Any) -> str:
+    # Media are shared between users, so an entry is keyed by both
+    return f"{entry.get('userId')}:{entry.get('mediaId')}"
+
+
+def parse_entry_key(key: Any) -> Optional[tuple[int, int]]:
+    if isinstance(key, bytes):
+        key = key.decode()
+    user_id, _, media_id = str(key).partition(":")
+    if not (user_id.isdigit() and media_id.isdigit()):
+        return None
+    return int(user_id), int(media_id)
+
+
+def event_user_id(key: Any) -> Optional[int]:
+    # User events are keyed by the user id, entries and tombstones by userId:mediaId
+    if isinstance(key, bytes):
+        key = key.decode()
+    user_id = str(key).partition(":")[0]
+    return int(user_id) if user_id.isdigit() else None
+
+
+def partition_headers(partition_key: Optional[str]) -> list[tuple[str, bytes]]:
+    if partition_key is None:
+        return []
+    return [(PARTITION_KEY_HEADER, partition_key.encode())]
+
+
+def header_partition_key(
+    headers: Optional[Iterable[tuple[str, bytes]]],
+) -> Optional[str]:
+    for name, value in headers or ():
+        if name == PARTITION_KEY_HEADER:
+            return value.decode()
+    return None
+
+
+def record_partition_keys(
+    records: Iterable[tuple[Any, Any, Optional[str]]],
+) -> dict[int, str]:
+    # user_id -> the partition of that user's latest event carrying one
+    keys = {}
+    for key, _, partition_key in records:
+        user_id = event_user_id(key)
+        if user_id is not None and partition_key is not None:
+            keys[user_id] = partition_key
+    return keys
+
+
+def replay_entries(
+    records: Iterable[tuple[Any, Any]],
+) -> tuple[list[Any], list[tuple[int, int]]]:
+    # Replayed in order so the last event per user and media wins, tombstones
+    # included; returns the entries to merge and the (user_id, media_id) to delete
+    latest: dict[tuple[int, int], Any] = {}
+    for key, value in records:
+        parsed = parse_entry_key(key if value is None else entry_key(value))
+        if parsed is not None:
+            latest[parsed] = value
+    entries = [value for value in latest.values() if value is not None]
+    deleted = [key for key, value in latest.items() if value is None]
+    return entries, deleted
+
+
+def encode_value(value: Any) -> Optional[bytes]:
+    # kafka-python runs the serializer on None too, which would hide tombstones
+    return None if value is None else orjson.dumps(value)
+
+
+def content_hash(value: Any) -> str:
+    encoded = orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+class ContentIndex:
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.hashes: dict[str, dict[str, str]] = {}
+        if self.path.exists():
+            self.hashes = orjson.loads(self.path.read_bytes())
+        self.pending: Optional[dict[str, dict[str, str]]] = None
+        self.changed = 0
+        self.suppressed = 0
+        self.tombstones = 0
+
+    def changes(
+        self, events: Iterable[Event], full_resync: bool = False
+    ) -> list[Event]:
+        pending: dict[str, dict[str, str]] = defaultdict(dict)
+        changed = []
+        for topic, key, value in events:
+            digest = content_hash(value)
+            pending[topic][str(key)] = digest
+            if full_resync or self.hashes.get(topic, {}).get(str(key)) != digest:
+                changed.append((topic, key, value))
+            else:
+                self.suppressed += 1
+        self.changed = len(changed)
+
+        # Keys that dropped out of the payload are deleted downstream
+        for topic, hashes in self.hashes.items():
+            for key in hashes.keys() - pending[topic].keys():
+                changed.append((topic, key, None))
+                self.tombstones += 1
+        self.pending = dict(pending)
+        return changed
+
+    def save(self):
+        # Only called once every event was delivered, so a failed run resends
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(self.pending))
+        os.replace(tmp_path, self.path)
+        self.hashes, self.pending = self.pending, None
+
+
+@dataclass
+class ProducerStats:
+    sent: int = 0
+    delivered: int = 0
+    errors: int = 0
+    bytes: int = 0
+    last_error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def messages_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.delivered / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def start(self):
+        self.started_at = time.monotonic()
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+
+    def record_sent(self):
+        with self.lock:
+            self.sent += 1
+
+    # Delivery callbacks run on the producer's network thread
+    def record_delivered(self, metadata: Any):
+        size = max(metadata.serialized_key_size, 0)
+        size += max(metadata.serialized_value_size, 0)
+        with self.lock:
+            self.delivered += 1
+            self.bytes += size
+
+    def record_error(self, error: BaseException):
+        with self.lock:
+            self.errors += 1
+            self.last_error = repr(error)
+
+    def to_metadata(self) -> dict[str, Any]:
+        return {
+            "messages": self.delivered,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "messages_per_second": round(self.messages_per_second, 3),
+            "bytes_per_second": round(self.bytes_per_second, 3),
+        }
+
+
+class MicroBatch:
+    def __init__(
+        self,
+        max_records: int,
+        max_bytes: int,
+        max_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.clock = clock
+        self.records: dict[str, list[Any]] = defaultdict(list)
+        self.count = 0
+        self.bytes = 0
+        self.opened_at: Optional[float] = None
+
+    def add(self, topic: str, value: Any, size: int):
+        if self.opened_at is None:
+            self.opened_at = self.clock()
+        self.records[topic].append(value)
+        self.count += 1
+        self.bytes += size
+
+    def remaining_seconds(self) -> float:
+        if self.opened_at is None:
+            return self.max_seconds
+        return max(self.max_seconds - (self.clock() - self.opened_at), 0.0)
+
+    def ready(self) -> bool:
+        if not self.count:
+            return False
+        return (
+            self.count >= self.max_records
+            or self.bytes >= self.max_bytes
+            or self.remaining_seconds() == 0.0
+        )
+
+    def requeue(self, records: dict[str, list[Any]], count: int, size: int):
+        # A drained batch that failed to write goes back ahead of newer records
+        for topic, values in records.items():
+            self.records[topic][:0] = values
+        self.count += count
+        self.bytes += size
+        if self.opened_at is None:
+            self.opened_at = self.clock()
+
+    def drain(self) -> dict[str, list[Any]]:
+        records = dict(self.records)
+        self.records = defaultdict(list)
+        self.count = self.bytes = 0
+        self.opened_at = None
+        return records
+
+
+@dataclass
+class SinkStats:
+    messages: int = 0
+    bytes: int = 0
+    batches: int = 0
+    rows: int = 0
+    lag: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def record_batch(self, messages: int, size: int, rows: int, lag: int):
+        self.messages += messages
+        self.bytes += size
+        self.batches += 1
+        self.rows += rows
+        self.lag = lag
+
+    def summary(self) -> str:
+        elapsed = self.elapsed_seconds or 1e-9
+        return (
+            f"{self.batches} batches, {self.messages} messages, {self.rows} rows,"
+            f" {self.messages / elapsed:,.0f} msg/s, {self.bytes / elapsed:,.0f} B/s,"
+            f" lag {self.lag}"
+        )
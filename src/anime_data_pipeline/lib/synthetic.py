@@ -0,0 +1,230 @@
+import random
+
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+# (list name, entry status) in the order AniList returns a user's lists
+LISTS = [
+    ("Watching", "CURRENT"),
+    ("Completed", "COMPLETED"),
+    ("Rewatching", "REPEATING"),
+    ("Paused", "PAUSED"),
+    ("Dropped", "DROPPED"),
+    ("Planning", "PLANNING"),
+]
+LIST_WEIGHTS = [10, 55, 2, 5, 8, 20]
+
+GENRES = [
+    "Action",
+    "Adventure",
+    "Comedy",
+    "Drama",
+    "Ecchi",
+    "Fantasy",
+    "Horror",
+    "Mahou Shoujo",
+    "Mecha",
+    "Music",
+    "Mystery",
+    "Psychological",
+    "Romance",
+    "Sci-Fi",
+    "Slice of Life",
+    "Sports",
+    "Supernatural",
+    "Thriller",
+]
+TAG_CATEGORIES = ["Cast-Main Cast", "Demographic", "Setting-Scene", "Theme-Drama"]
+FORMATS = ["TV", "TV_SHORT", "MOVIE", "OVA", "ONA", "SPECIAL"]
+SEASONS = ["WINTER", "SPRING", "SUMMER", "FALL"]
+SOURCES = ["ORIGINAL", "MANGA", "LIGHT_NOVEL", "VISUAL_NOVEL", "VIDEO_GAME", "NOVEL"]
+MEDIA_STATUSES = ["FINISHED", "RELEASING", "NOT_YET_RELEASED", "HIATUS"]
+WORDS = (
+    "the a of and to in is it that was he she they his her with for on as at by "
+    "from story world school team battle friend life city dream power secret "
+    "journey family heart war magic girl boy war demon king hero future past"
+).split()
+
+
+@dataclass
+class PayloadOptions:
+    users: int = 1
+    # Entries per user; users draw from a shared pool of media
+    entries: int = 1000
+    media: Optional[int] = None
+    tags: int = 10
+    tag_vocabulary: int = 400
+    genres: int = 3
+    synonyms: int = 1
+    description_words: int = 90
+    seed: int = 0
+
+    @property
+    def media_pool(self) -> int:
+        return max(self.media or self.entries, self.entries)
+
+
+def between(rng: random.Random, low: int, high: int) -> int:
+    # randint is several Python calls deep and dominates generating 1M entries
+    return low + int(rng.random() * (high - low + 1))
+
+
+def make_date(rng: random.Random, year: int) -> dict[str, Optional[int]]:
+    if not year or rng.random() < 0.1:
+        return {"year": None, "month": None, "day": None}
+    return {"year": year, "month": between(rng, 1, 12), "day": between(rng, 1, 28)}
+
+
+def make_descriptions(rng: random.Random, words: int) -> list[str]:
+    return [" ".join(rng.choices(WORDS, k=words)) for _ in range(1024)]
+
+
+def make_stats(rng: random.Random) -> list[dict[str, Any]]:
+    # Opaque blobs to the pipeline, so media share a pool of them
+    return [
+        {
+            "scoreDistribution": [
+                {"score": s, "amount": between(rng, 0, 5000)}
+                for s in range(10, 101, 10)
+            ],
+            "statusDistribution": [
+                {"status": status, "amount": between(rng, 0, 50000)}
+                for _, status in LISTS
+            ],
+        }
+        for _ in range(256)
+    ]
+
+
+def make_tags(rng: random.Random, options: PayloadOptions) -> list[dict[str, Any]]:
+    return [
+        {
+            "category": TAG_CATEGORIES[i % len(TAG_CATEGORIES)],
+            "description": " ".join(rng.choices(WORDS, k=20)) + ".",
+            "name": f"Tag {i}",
+            "rank": None,
+        }
+        for i in range(options.tag_vocabulary)
+    ]
+
+
+def make_media(
+    rng: random.Random,
+    media_id: int,
+    options: PayloadOptions,
+    tag_pool: list[dict[str, Any]],
+    descriptions: list[str],
+    stats: list[dict[str, Any]],
+) -> dict[str, Any]:
+    status = rng.choices(MEDIA_STATUSES, weights=[80, 10, 8, 2])[0]
+    released = status != "NOT_YET_RELEASED"
+    year = between(rng, 1980, 2025)
+    title = f"{' '.join(rng.choices(WORDS, k=3)).title()} {media_id}"
+    tags = rng.sample(tag_pool, min(options.tags, len(tag_pool)))
+    return {
+        "id": media_id,
+        "status": status,
+        "averageScore": between(rng, 35, 92) if released else None,
+        "meanScore": between(rng, 35, 92) if released else None,
+        "popularity": int(rng.paretovariate(1.2) * 1000),
+        "trending": between(rng, 0, 50),
+        "favourites": int(rng.paretovariate(1.2) * 50),
+        "episodes": rng.choice([1, 12, 13, 24, 26, 52]) if released else None,
+        "genres": rng.sample(GENRES, min(options.genres, len(GENRES))),
+        "description": f"{rng.choice(descriptions)} ({media_id})",
+        "coverImage": {
+            "extraLarge": f"https://s4.anilist.co/file/anilistcdn/media/anime/cover/large/{media_id}.jpg"
+        },
+        "type": "ANIME",
+        "format": rng.choice(FORMATS),
+        "season": rng.choice(SEASONS),
+        "seasonYear": year,
+        "startDate": make_date(rng, year),
+        "endDate": make_date(rng, year) if status == "FINISHED" else make_date(rng, 0),
+        "synonyms": [f"{title} ({i + 1})" for i in range(options.synonyms)],
+        "title": {
+            "english": title if rng.random() < 0.7 else None,
+            "native": f"タイトル {media_id}",
+            "romaji": title.lower(),
+        },
+        "source": rng.choice(SOURCES),
+        "bannerImage": f"https://s4.anilist.co/file/anilistcdn/media/anime/banner/{media_id}.jpg",
+        "siteUrl": f"https://anilist.co/anime/{media_id}",
+        # Tag objects are shared between media, ranks vary per media on AniList
+        "tags": [dict(tag, rank=between(rng, 20, 100)) for tag in tags],
+        "stats": rng.choice(stats),
+        "rankings": [],
+    }
+
+
+def make_entry(
+    rng: random.Random, entry_id: int, user_id: int, status: str, media: dict
+) -> dict[str, Any]:
+    planned = status == "PLANNING"
+    episodes = media["episodes"] or 12
+    year = media["seasonYear"]
+    return {
+        "id": entry_id,
+        "userId": user_id,
+        "mediaId": media["id"],
+        "progress": 0 if planned else between(rng, 0, episodes),
+        "score": 0 if planned or rng.random() < 0.15 else between(rng, 1, 10),
+        "status": status,
+        "updatedAt": 1500000000 + between(rng, 0, 250000000),
+        "startedAt": make_date(rng, year) if not planned else make_date(rng, 0),
+        "completedAt": (
+            make_date(rng, year) if status == "COMPLETED" else make_date(rng, 0)
+        ),
+        "media": media,
+    }
+
+
+def make_user(user_id: int) -> dict[str, Any]:
+    return {
+        "id": user_id,
+        "name": f"user_{user_id}",
+        "avatar": {
+            "large": f"https://s4.anilist.co/file/anilistcdn/user/avatar/large/{user_id}.png"
+        },
+        "bannerImage": f"https://s4.anilist.co/file/anilistcdn/user/banner/{user_id}.jpg",
+        "siteUrl": f"https://anilist.co/user/user_{user_id}",
+        "statistics": {},
+    }
+
+
+def make_payloads(options: PayloadOptions) -> Iterator[dict[str, Any]]:
+    # Deterministic for a given options, one AniList response per user
+    rng = random.Random(options.seed)
+    tag_pool = make_tags(rng, options)
+    descriptions = make_descriptions(rng, options.description_words)
+    stats = make_stats(rng)
+    media: dict[int, dict[str, Any]] = {}
+    entry_id = 0
+    for user_id in range(1, options.users + 1):
+        lists: dict[str, list[dict[str, Any]]] = {status: [] for _, status in LISTS}
+        for media_id in rng.sample(range(1, options.media_pool + 1), options.entries):
+            if media_id not in media:
+                media[media_id] = make_media(
+                    rng, media_id, options, tag_pool, descriptions, stats
+                )
+            status = rng.choices(LISTS, weights=LIST_WEIGHTS)[0][1]
+            entry_id += 1
+            lists[status].append(
+                make_entry(rng, entry_id, user_id, status, media[media_id])
+            )
+        yield {
+            "data": {
+                "MediaListCollection": {
+                    "lists": [
+                        {"name": name, "status": status, "entries": lists[status]}
+                        for name, status in LISTS
+                        if lists[status]
+                    ]
+                },
+                "User": make_user(user_id),
+            }
+        }
+
+
+def make_payload(entries: int, **kwargs: Any) -> dict[str, Any]:
+    return next(make_payloads(PayloadOptions(users=1, entries=entries, **kwargs)))
@@ -0,0 +1,67 @@
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from typing import Any, Optional
+
+# What DuckDB can scan in place: pandas frames and Arrow tables are registered
+# without a copy, relations run on the connection that created them
+Table = pd.DataFrame | pa.Table | duckdb.DuckDBPyRelation
+
+
+def num_rows(table: pd.DataFrame | pa.Table) -> int:
+    return len(table) if isinstance(table, pd.DataFrame) else table.num_rows
+
+
+def add_column(obj: Table, name: str, value: Any) -> pd.DataFrame | pa.Table:
+    # The same value on every row, e.g. the partition the rows were written for
+    if isinstance(obj, duckdb.DuckDBPyRelation):
+        obj = obj.arrow()
+    if isinstance(obj, pd.DataFrame):
+        return obj.assign(**{name: value})
+    return obj.append_column(name, pa.array([value] * obj.num_rows))
+
+
+def write_table(
+    conn: Any,
+    table: str,
+    obj: Table,
+    where: Optional[str] = None,
+    key: Optional[str] = None,
+) -> int:
+    # Replaces the table, or the rows matching where and the rows sharing a key
+    if isinstance(obj, duckdb.DuckDBPyRelation):
+        # Scanned twice below, so fetch it once as Arrow rather than re-running it
+        obj = obj.arrow()
+    conn.register("write_obj", obj)
+    try:
+        if where is None and key is None:
+            conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM write_obj")
+        else:
+            # A new table has nothing to delete, and where may refer to tables that
+            # are written after this one
+            if has_table(conn, *table.split(".")):
+                if key is not None:
+                    keyed = f"{key} IN (SELECT {key} FROM write_obj)"
+                    where = keyed if where is None else f"({where}) OR {keyed}"
+                conn.execute(f"DELETE FROM {table} WHERE {where}")
+            else:
+                conn.execute(f"CREATE TABLE {table} AS SELECT * FROM write_obj LIMIT 0")
+            conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM write_obj")
+    finally:
+        conn.unregister("write_obj")
+    return num_rows(obj)
+
+
+def merge_dataframe(conn: Any, table: str, df: pd.DataFrame, key: str = "id") -> int:
+    df = df.drop_duplicates(subset=[key], keep="first")
+    return write_table(conn, table, df, key=key)
+
+
+def has_table(conn: Any, schema: str, table: str) -> bool:
+    return bool(
+        conn.execute(
+            "SELECT 1 FROM duckdb_tables() WHERE schema_name = ? AND table_name = ?",
+            [schema, table],
+        ).fetchone()
+    )
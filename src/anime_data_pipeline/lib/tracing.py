@@ -0,0 +1,257 @@
+import contextvars
+import functools
+import inspect
+import json
+import mmap
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; trace appends there are not locked between processes
+    fcntl = None
+
+TRACE_DIR_ENV = "ANIME_DATA_PIPELINE_TRACE_DIR"
+
+
+def current_rss() -> int:
+    # Resident memory now rather than the process peak (ru_maxrss), which only
+    # moves when a step outgrows every earlier one. 0 where /proc is missing.
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * mmap.PAGESIZE
+    except OSError:
+        return 0
+
+
+@dataclass
+class Span:
+    name: str
+    attributes: dict[str, Any] = field(default_factory=dict)
+    rows_in: int = 0
+    rows_out: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    children: list["Span"] = field(default_factory=list)
+    started_at: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rss_delta_bytes: int = 0
+    thread_id: int = 0
+    finished: bool = False
+    _started: float = 0.0
+    _started_cpu: float = 0.0
+    _started_rss: int = 0
+
+    def start(self):
+        self.started_at = time.time()
+        self.thread_id = threading.get_native_id()
+        self._started = time.perf_counter()
+        # Process CPU time, so DuckDB and Arrow worker threads are included
+        self._started_cpu = time.process_time()
+        self._started_rss = current_rss()
+
+    def update(self):
+        self.wall_seconds = time.perf_counter() - self._started
+        self.cpu_seconds = time.process_time() - self._started_cpu
+        # Memory the span left resident; negative when it freed more than it kept
+        self.rss_delta_bytes = current_rss() - self._started_rss
+
+    def finish(self):
+        self.update()
+        self.finished = True
+
+    def record(
+        self,
+        rows_in: int = 0,
+        rows_out: int = 0,
+        bytes_read: int = 0,
+        bytes_written: int = 0,
+    ):
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+
+    def walk(self, path: tuple[str, ...] = ()) -> Iterator[tuple[str, "Span"]]:
+        for child in self.children:
+            child_path = path + (child.name,)
+            yield "/".join(child_path), child
+            yield from child.walk(child_path)
+
+    def breakdown(self) -> dict[str, dict[str, Any]]:
+        # Repeated spans (pages, plots) are summed under their path
+        totals: dict[str, dict[str, Any]] = {}
+        for path, span in self.walk():
+            total = totals.setdefault(
+                path,
+                {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows_out": 0},
+            )
+            total["calls"] += 1
+            total["wall_seconds"] += span.wall_seconds
+            total["cpu_seconds"] += span.cpu_seconds
+            total["rows_out"] += span.rows_out
+            if span.bytes_read or span.bytes_written:
+                total["bytes"] = (
+                    total.get("bytes", 0) + span.bytes_read + span.bytes_written
+                )
+        for total in totals.values():
+            total["wall_seconds"] = round(total["wall_seconds"], 4)
+            total["cpu_seconds"] = round(total["cpu_seconds"], 4)
+        return totals
+
+    def total_bytes(self) -> tuple[int, int]:
+        # Bytes add up across nested spans, rows are counted per stage
+        read, written = self.bytes_read, self.bytes_written
+        for _, span in self.walk():
+            read += span.bytes_read
+            written += span.bytes_written
+        return read, written
+
+    def to_metadata(self) -> dict[str, Any]:
+        if not self.finished:
+            self.update()
+        bytes_read, bytes_written = self.total_bytes()
+        return {
+            "wall_seconds": round(self.wall_seconds, 4),
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_per_second": (
+                round(self.rows_out / self.wall_seconds, 3) if self.wall_seconds else 0
+            ),
+            "bytes_read": bytes_read,
+            "bytes_written": bytes_written,
+        }
+
+    def trace_events(self) -> Iterator[dict[str, Any]]:
+        # Chrome trace event format, opens in Perfetto or chrome://tracing
+        yield {
+            "name": self.name,
+            "ph": "X",
+            "ts": round(self.started_at * 1e6),
+            "dur": round(self.wall_seconds * 1e6),
+            "pid": os.getpid(),
+            "tid": self.thread_id,
+            "args": {
+                "cpu_seconds": round(self.cpu_seconds, 6),
+                "rss_delta_bytes": self.rss_delta_bytes,
+                "rows_in": self.rows_in,
+                "rows_out": self.rows_out,
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+            }
+            | self.attributes,
+        }
+        for child in self.children:
+            yield from child.trace_events()
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "span", default=None
+)
+
+
+def active_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_span() -> Span:
+    # Outside of any span records go to a throwaway span
+    span = _current.get()
+    return span if span is not None else Span("detached")
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    parent = _current.get()
+    child = Span(name, attributes)
+    token = _current.set(child)
+    child.start()
+    try:
+        yield child
+    except Exception as err:
+        child.attributes["error"] = type(err).__name__
+        raise
+    finally:
+        child.finish()
+        _current.reset(token)
+        if parent is not None:
+            parent.children.append(child)
+
+
+def traced_generator(name: str, generator: Iterator[Any]) -> Iterator[Any]:
+    # The span is only current while the generator runs, not while the consumer does
+    parent = _current.get()
+    outer = Span(name)
+    outer.start()
+    try:
+        while True:
+            token = _current.set(outer)
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield item
+    except Exception as err:
+        outer.attributes["error"] = type(err).__name__
+        raise
+    finally:
+        getattr(generator, "close", lambda: None)()
+        outer.finish()
+        if parent is not None:
+            parent.children.append(outer)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    def decorator(fn: Callable) -> Callable:
+        if inspect.isgeneratorfunction(fn):
+
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                yield from traced_generator(name, fn(*args, **kwargs))
+
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_dir() -> Optional[Path]:
+    path = os.environ.get(TRACE_DIR_ENV)
+    return Path(path) if path else None
+
+
+def write_trace(path: Path | str, root: Span):
+    # Steps of one run append to the same file, possibly from several processes.
+    # The JSON array format allows the closing bracket to be left out.
+    events = "".join(
+        json.dumps(event, default=str) + ",\n" for event in root.trace_events()
+    )
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as trace_file:
+        if fcntl is not None:
+            fcntl.flock(trace_file, fcntl.LOCK_EX)
+        try:
+            if trace_file.seek(0, os.SEEK_END) == 0:
+                trace_file.write("[\n")
+            trace_file.write(events)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(trace_file, fcntl.LOCK_UN)
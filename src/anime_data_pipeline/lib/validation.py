@@ -0,0 +1,198 @@
+import ijson
+import os
+import typing
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from pydantic import BaseModel
+from typing import Any, Iterator, Optional
+
+from . import schemas, serialization
+from .serialization import Codec
+
+Event = tuple[str, str, Any]
+
+EVENT_KINDS = {
+    "start_map": "object",
+    "start_array": "array",
+    "string": "string",
+    "number": "number",
+    "boolean": "boolean",
+    "null": "null",
+}
+TYPE_KINDS = {str: "string", int: "number", float: "number", bool: "boolean"}
+
+LISTS_PREFIX = "data.MediaListCollection.lists.item"
+ENTRY_PREFIX = f"{LISTS_PREFIX}.entries.item"
+
+
+@dataclass
+class Expected:
+    kind: Optional[str]
+    optional: bool = False
+    required: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StructuralError:
+    path: str
+    error: str
+
+
+@dataclass
+class ValidationReport:
+    size: int
+    lists: dict[str, int] = field(default_factory=dict)
+    errors: list[StructuralError] = field(default_factory=list)
+    error_count: int = 0
+
+    @property
+    def passed(self) -> bool:
+        return self.error_count == 0
+
+    @property
+    def entries(self) -> int:
+        return sum(self.lists.values())
+
+
+@dataclass
+class Frame:
+    path: str
+    prefix: str
+    kind: str
+    keys: set[str] = field(default_factory=set)
+    key: Optional[str] = None
+    index: int = 0
+    name: Optional[str] = None
+    count: int = 0
+
+
+def model_structure(
+    annotation: Any, prefix: str = "", structure: Optional[dict] = None
+) -> dict[str, Expected]:
+    # Expected JSON kind per ijson prefix, derived from the pydantic models
+    structure = structure if structure is not None else {}
+    args = typing.get_args(annotation)
+    optional = typing.get_origin(annotation) is typing.Union and type(None) in args
+    if optional:
+        (annotation,) = [arg for arg in args if arg is not type(None)]
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        fields = annotation.model_fields
+        structure[prefix] = Expected("object", optional, list(fields))
+        for name, info in fields.items():
+            child = f"{prefix}.{name}" if prefix else name
+            model_structure(info.annotation, child, structure)
+    elif typing.get_origin(annotation) in (list, typing.List):
+        structure[prefix] = Expected("array", optional)
+        (item,) = typing.get_args(annotation)
+        model_structure(item, f"{prefix}.item", structure)
+    else:
+        structure[prefix] = Expected(TYPE_KINDS.get(annotation), optional)
+    return structure
+
+
+RAW_STRUCTURE = model_structure(schemas.Raw)
+
+
+def object_events(value: Any, prefix: str = "") -> Iterator[Event]:
+    # Same events ijson.parse emits, for documents that are already decoded
+    if isinstance(value, dict) or isinstance(value, serialization.LazyMapping):
+        yield prefix, "start_map", None
+        for key in value:
+            yield prefix, "map_key", key
+            child = f"{prefix}.{key}" if prefix else key
+            yield from object_events(value[key], child)
+        yield prefix, "end_map", None
+    elif isinstance(value, list):
+        yield prefix, "start_array", None
+        for item in value:
+            yield from object_events(item, f"{prefix}.item" if prefix else "item")
+        yield prefix, "end_array", None
+    elif value is None:
+        yield prefix, "null", None
+    elif isinstance(value, bool):
+        yield prefix, "boolean", value
+    elif isinstance(value, (int, float)):
+        yield prefix, "number", value
+    else:
+        yield prefix, "string", value
+
+
+def file_events(path: Path | str, codec: Codec) -> Iterator[Event]:
+    if not codec.framed:
+        with open(path, "rb") as json_file:
+            yield from ijson.parse(json_file, use_float=True)
+        return
+    # Framed codecs decode one section at a time through the lazy mapping
+    yield from object_events(serialization.load(path, codec))
+
+
+class StreamingValidator:
+    def __init__(
+        self,
+        structure: dict[str, Expected] = RAW_STRUCTURE,
+        max_errors: int = 20,
+    ):
+        self.structure = structure
+        self.max_errors = max_errors
+
+    def error(self, report: ValidationReport, path: str, message: str):
+        report.error_count += 1
+        if len(report.errors) < self.max_errors:
+            report.errors.append(StructuralError(path, message))
+
+    def value_path(self, stack: list[Frame]) -> str:
+        if not stack:
+            return "$"
+        parent = stack[-1]
+        if parent.kind == "object":
+            return f"{parent.path}.{parent.key}"
+        parent.index += 1
+        return f"{parent.path}[{parent.index - 1}]"
+
+    def validate_events(self, events: Iterator[Event], size: int) -> ValidationReport:
+        report = ValidationReport(size=size)
+        stack: list[Frame] = []
+        try:
+            for prefix, event, value in events:
+                if event == "map_key":
+                    stack[-1].key = value
+                    stack[-1].keys.add(value)
+                    continue
+                if event in ("end_map", "end_array"):
+                    self.close(report, stack.pop())
+                    continue
+
+                path = self.value_path(stack)
+                kind = EVENT_KINDS.get(event, "number")
+                expected = self.structure.get(prefix)
+                if expected and expected.kind and kind != expected.kind:
+                    if not (kind == "null" and expected.optional):
+                        self.error(
+                            report, path, f"expected {expected.kind}, got {kind}"
+                        )
+                if prefix == ENTRY_PREFIX:
+                    stack[-2].count += 1
+                elif prefix == f"{LISTS_PREFIX}.name" and kind == "string":
+                    stack[-1].name = value
+                if kind in ("object", "array"):
+                    stack.append(Frame(path, prefix, kind))
+        except (ijson.JSONError, ValueError) as err:
+            # ValueError is a framed file that cannot be loaded, e.g. an empty one
+            self.error(report, stack[-1].path if stack else "$", str(err))
+        return report
+
+    def close(self, report: ValidationReport, frame: Frame):
+        expected = self.structure.get(frame.prefix)
+        if frame.kind == "object" and expected and expected.kind == "object":
+            for key in expected.required:
+                if key not in frame.keys:
+                    self.error(report, f"{frame.path}.{key}", "missing")
+        if frame.prefix == LISTS_PREFIX:
+            report.lists[frame.name or frame.path] = frame.count
+
+    def validate_file(self, path: Path | str, codec: Codec) -> ValidationReport:
+        # Size comes from the file on disk instead of re-serializing the payload
+        size = os.stat(path).st_size
+        return self.validate_events(file_events(path, codec), size)
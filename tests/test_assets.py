@@ -1,7 +1,16 @@
 from anime_data_pipeline.defs.assets import *
+from anime_data_pipeline.lib.anilist import AniListResponse
+from anime_data_pipeline.lib import serialization
+from anime_data_pipeline.lib.ndjson import read_ndjson
+from anime_data_pipeline.lib.tables import write_table
 
+import copy
+import duckdb
 import json
 import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import shutil
 from pandas.testing import assert_frame_equal
 
 from unittest import mock
@@ -147,62 +156,229 @@ def to_expected(data) -> pd.DataFrame:
     return df
 
 
+def mock_fetch(mocked_anilist_api, data, unchanged=False) -> None:
+    payload = json.dumps(data).encode()
+    mocked_anilist_api.fetch.return_value = AniListResponse(
+        data=data, digest="test_digest", size=len(payload), unchanged=unchanged
+    )
+    mocked_anilist_api.cache_metadata.return_value = {}
+
+
+def validate_stored(data, path, codec="json", **config) -> dg.AssetCheckResult:
+    serialization.dump(data, path, serialization.get_codec(codec))
+    return raw_anilist_validate_check(path, RawAniListCheckConfig(**config))
+
+
 @mock.patch("anime_data_pipeline.defs.resources.AniListAPIResource")
-def test_raw_anilist_valid(mocked_anilist_api) -> None:
-    mocked_anilist_api.query.return_value = TEST_RAW_ANILIST_VALID
+def test_raw_anilist_valid(mocked_anilist_api, tmp_path) -> None:
+    mock_fetch(mocked_anilist_api, TEST_RAW_ANILIST_VALID)
 
-    actual = raw_anilist(anilist_api=mocked_anilist_api)
-    validated = raw_anilist_validate_check(actual.value)
-    expected = mocked_anilist_api.query.return_value
+    actual = next(
+        raw_anilist(context=dg.build_asset_context(), anilist_api=mocked_anilist_api)
+    )
+    validated = validate_stored(actual.value, tmp_path / "raw_anilist.json")
+    expected = TEST_RAW_ANILIST_VALID
 
     assert actual.value == expected
+    assert actual.data_version == dg.DataVersion("test_digest")
     assert validated.passed == True
     assert validated.metadata["size"].value == len(json.dumps(TEST_RAW_ANILIST_VALID))
-    mocked_anilist_api.query.assert_called_once_with("anilist.graphql")
+    assert validated.metadata["lists"].value == {"test_list": 1}
+    mocked_anilist_api.fetch.assert_called_once_with(
+        "anilist_pruned.graphql", mocked_anilist_api.user_name
+    )
 
 
 @mock.patch("anime_data_pipeline.defs.resources.AniListAPIResource")
-def test_raw_anilist_invalid(mocked_anilist_api) -> None:
-    mocked_anilist_api.query.return_value = TEST_RAW_ANILIST_INVALID
+def test_raw_anilist_invalid(mocked_anilist_api, tmp_path) -> None:
+    mock_fetch(mocked_anilist_api, TEST_RAW_ANILIST_INVALID)
 
-    actual = raw_anilist(anilist_api=mocked_anilist_api)
-    validated = raw_anilist_validate_check(actual.value)
-    expected = mocked_anilist_api.query.return_value
+    actual = next(
+        raw_anilist(context=dg.build_asset_context(), anilist_api=mocked_anilist_api)
+    )
+    validated = validate_stored(actual.value, tmp_path / "raw_anilist.json")
+    expected = TEST_RAW_ANILIST_INVALID
 
     assert actual.value == expected
     assert validated.passed == False
     assert validated.metadata["error"].value == "raw_anilist validation failed"
-    mocked_anilist_api.query.assert_called_once_with("anilist.graphql")
+    mocked_anilist_api.fetch.assert_called_once_with(
+        "anilist_pruned.graphql", mocked_anilist_api.user_name
+    )
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack.zst"])
+def test_raw_anilist_validate_check_reports_paths(codec, tmp_path) -> None:
+    data = copy.deepcopy(TEST_RAW_ANILIST_VALID)
+    lists = data["data"]["MediaListCollection"]["lists"]
+    lists.append({"name": "second", "status": 1, "entries": [{}, {}]})
+    lists.append({"name": "third", "entries": {}})
+    path = tmp_path / f"raw_anilist{serialization.get_codec(codec).suffix}"
+
+    validated = validate_stored(data, path, codec, max_errors=2)
+
+    assert validated.passed == False
+    assert validated.metadata["size"].value == path.stat().st_size
+    assert validated.metadata["lists"].value == {
+        "test_list": 1,
+        "second": 2,
+        "third": 0,
+    }
+    assert validated.metadata["error_count"].value == 3
+    assert validated.metadata["errors"].value == [
+        {
+            "path": "$.data.MediaListCollection.lists[1].status",
+            "error": "expected string, got number",
+        },
+        {
+            "path": "$.data.MediaListCollection.lists[2].entries",
+            "error": "expected array, got object",
+        },
+    ]
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack.zst"])
+def test_raw_anilist_validate_check_fails_on_empty_file(codec, tmp_path) -> None:
+    path = tmp_path / f"raw_anilist{serialization.get_codec(codec).suffix}"
+    path.touch()
+
+    validated = raw_anilist_validate_check(path, RawAniListCheckConfig())
+
+    assert validated.passed == False
+    assert validated.metadata["size"].value == 0
+    assert validated.metadata["errors"].value[0]["path"] == "$"
+
+
+@mock.patch("anime_data_pipeline.defs.resources.AniListAPIResource")
+def test_raw_anilist_unchanged_skips_output(mocked_anilist_api) -> None:
+    # A cache hit alone is not enough, the digest must match the stored version
+    mock_fetch(mocked_anilist_api, TEST_RAW_ANILIST_VALID, unchanged=True)
+    instance = dg.DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions("anilist_users", ["test_user", "other_user"])
+    instance.report_runless_asset_event(
+        dg.AssetMaterialization(
+            "raw_anilist",
+            partition="test_user",
+            tags={DATA_VERSION_TAG: "test_digest"},
+        )
+    )
+
+    def run(partition_key, **kwargs) -> list:
+        context = dg.build_asset_context(partition_key=partition_key, instance=instance)
+        return list(
+            raw_anilist(context=context, anilist_api=mocked_anilist_api, **kwargs)
+        )
+
+    skipped = run("test_user")
+    other = run("other_user")
+    forced = run("test_user", config=RawAniListConfig(skip_unchanged=False))
+
+    assert skipped == []
+    assert len(other) == 1
+    assert other[0].metadata["unchanged"].value == False
+    assert len(forced) == 1
+    assert forced[0].metadata["unchanged"].value == True
+
+
+def test_raw_anilist_entries_writes_each_page_before_the_next(tmp_path) -> None:
+    pages = [[{"id": 1}, {"id": 2}], [{"id": 3}], [{"id": 4}]]
+    on_disk = []
+
+    def query_pages(query_filename, user_name, per_page):
+        for page in pages:
+            # What is on disk when the client asks for the next page
+            (entries_path,) = tmp_path.glob("*/test_user/raw_anilist_entries.ndjson")
+            on_disk.append([row["id"] for row in read_ndjson(entries_path)])
+            yield page
+
+    anilist_api = mock.MagicMock()
+    anilist_api.query_pages.side_effect = query_pages
+    instance = dg.DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions("anilist_users", ["test_user"])
+    config = {"data_path": str(tmp_path), "per_page": 2}
+
+    result = dg.materialize(
+        [raw_anilist_entries],
+        partition_key="test_user",
+        instance=instance,
+        resources={"anilist_api": anilist_api},
+        run_config={"ops": {"raw_anilist_entries": {"config": config}}},
+    )
+
+    entries_path = tmp_path / result.run_id / "test_user" / "raw_anilist_entries.ndjson"
+    (materialization,) = result.asset_materializations_for_node("raw_anilist_entries")
+    assert on_disk == [[], [1, 2], [1, 2, 3]]
+    assert [row["id"] for row in read_ndjson(entries_path)] == [1, 2, 3, 4]
+    assert materialization.metadata["pages"].value == 3
+    assert materialization.metadata["size"].value == entries_path.stat().st_size
+    anilist_api.query_pages.assert_called_once_with(
+        "anilist_page.graphql", "test_user", per_page=2
+    )
+
+
+def stored_tables() -> duckdb.DuckDBPyConnection:
+    # What duckdb_io_manager writes; checks run against the stored tables
+    conn = duckdb.connect()
+    conn.execute(f"CREATE SCHEMA {resource_config.duckdb_schema}")
+    for name, df in zip(TABLE_NAMES, anilist_tables(TEST_RAW_ANILIST_VALID)):
+        write_table(conn, f"{resource_config.duckdb_schema}.{name}", df)
+    return conn
+
+
+TABLE_NAMES = ["fact_anime", "dimension_media", "dimension_user"]
+TABLE_CHECKS = [
+    fact_anime_validate_check,
+    dimension_media_validate_check,
+    dimension_user_validate_check,
+]
+
+
+def break_rules(conn: duckdb.DuckDBPyConnection, name: str, update: str) -> str:
+    # The stored row twice, the copy edited to break the table's rules
+    table = f"{resource_config.duckdb_schema}.{name}"
+    conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM {table}")
+    conn.execute(f"UPDATE {table} SET {update} WHERE rowid = 1")
+    return table
 
 
 @mock.patch("dagster_duckdb_pandas.DuckDBPandasIOManager")
 def test_fact_anime_valid(mocked_duckdb_io_manager) -> None:
-    actual = fact_anime(TEST_RAW_ANILIST_VALID)
-    validated = fact_anime_validate_check(actual)
+    actual = anilist_tables(TEST_RAW_ANILIST_VALID)[0]
+    conn = stored_tables()
+    validated = fact_anime_validate_check(
+        conn.table(f"{resource_config.duckdb_schema}.fact_anime")
+    )
     expected = to_expected(TEST_FACT_ANIME_VALID)
 
     assert_frame_equal(actual, expected)
-    # assert actual.equals(expected)
     assert validated.passed == True
     assert validated.metadata["rows"].value == 1
 
 
 @mock.patch("dagster_duckdb_pandas.DuckDBPandasIOManager")
 def test_fact_anime_invalid(mocked_duckdb_io_manager) -> None:
-    actual = fact_anime(TEST_RAW_ANILIST_INVALID)
-    validated = fact_anime_validate_check(actual)
+    actual = anilist_tables(TEST_RAW_ANILIST_INVALID)[0]
+    conn = stored_tables()
+    table = break_rules(conn, "fact_anime", "user_id = NULL")
+    validated = fact_anime_validate_check(conn.table(table))
     expected = to_expected(TEST_FACT_ANIME_INVALID)
 
     assert_frame_equal(actual, expected)
     assert validated.passed == False
-    assert validated.metadata["rows"].value == 0
-    assert validated.metadata["error"].value == "no rows processed"
+    assert validated.metadata["rows"].value == 2
+    assert (
+        validated.metadata["error"].value
+        == "failed rules: unique(id), not_null(user_id)"
+    )
 
 
 @mock.patch("dagster_duckdb_pandas.DuckDBPandasIOManager")
 def test_dimension_media_valid(mocked_duckdb_io_manager) -> None:
-    actual = dimension_media(TEST_RAW_ANILIST_VALID)
-    validated = dimension_media_validate_check(actual)
+    actual = anilist_tables(TEST_RAW_ANILIST_VALID)[1]
+    conn = stored_tables()
+    validated = dimension_media_validate_check(
+        conn.table(f"{resource_config.duckdb_schema}.dimension_media")
+    )
     expected = to_expected(TEST_DIMENSION_MEDIA_VALID)
 
     assert_frame_equal(actual, expected)
@@ -212,20 +388,28 @@ def test_dimension_media_valid(mocked_duckdb_io_manager) -> None:
 
 @mock.patch("dagster_duckdb_pandas.DuckDBPandasIOManager")
 def test_dimension_media_invalid(mocked_duckdb_io_manager) -> None:
-    actual = dimension_media(TEST_RAW_ANILIST_INVALID)
-    validated = dimension_media_validate_check(actual)
+    actual = anilist_tables(TEST_RAW_ANILIST_INVALID)[1]
+    conn = stored_tables()
+    table = break_rules(conn, "dimension_media", "title = NULL, episodes = -1")
+    validated = dimension_media_validate_check(conn.table(table))
     expected = to_expected(TEST_DIMENSION_MEDIA_INVALID)
 
     assert_frame_equal(actual, expected)
     assert validated.passed == False
-    assert validated.metadata["rows"].value == 0
-    assert validated.metadata["error"].value == "no rows processed"
+    assert validated.metadata["rows"].value == 2
+    assert (
+        validated.metadata["error"].value
+        == "failed rules: unique(id), not_null(title), in_range(episodes)"
+    )
 
 
 @mock.patch("dagster_duckdb_pandas.DuckDBPandasIOManager")
 def test_dimension_user_valid(mocked_duckdb_io_manager) -> None:
-    actual = dimension_user(TEST_RAW_ANILIST_VALID)
-    validated = dimension_user_validate_check(actual)
+    actual = anilist_tables(TEST_RAW_ANILIST_VALID)[2]
+    conn = stored_tables()
+    validated = dimension_user_validate_check(
+        conn.table(f"{resource_config.duckdb_schema}.dimension_user")
+    )
     expected = to_expected(TEST_DIMENSION_USER_VALID)
 
     assert_frame_equal(actual, expected)
@@ -235,11 +419,403 @@ def test_dimension_user_valid(mocked_duckdb_io_manager) -> None:
 
 @mock.patch("dagster_duckdb_pandas.DuckDBPandasIOManager")
 def test_dimension_user_invalid(mocked_duckdb_io_manager) -> None:
-    actual = dimension_user(TEST_RAW_ANILIST_INVALID)
-    validated = dimension_user_validate_check(actual)
+    actual = anilist_tables(TEST_RAW_ANILIST_INVALID)[2]
+    conn = stored_tables()
+    table = break_rules(conn, "dimension_user", "name = NULL")
+    validated = dimension_user_validate_check(conn.table(table))
     expected = to_expected(TEST_DIMENSION_USER_INVALID)
 
     assert_frame_equal(actual, expected)
     assert validated.passed == False
-    assert validated.metadata["rows"].value == 0
-    assert validated.metadata["error"].value == "no rows processed"
+    assert validated.metadata["rows"].value == 2
+    assert (
+        validated.metadata["error"].value == "failed rules: unique(id), not_null(name)"
+    )
+
+
+def test_table_checks_fail_on_empty_tables() -> None:
+    conn = stored_tables()
+    for name, check in zip(TABLE_NAMES, TABLE_CHECKS):
+        table = f"{resource_config.duckdb_schema}.{name}"
+        conn.execute(f"DELETE FROM {table}")
+        validated = check(conn.table(table))
+
+        assert validated.passed == False
+        assert validated.metadata["rows"].value == 0
+        assert validated.metadata["error"].value == "no rows processed"
+
+
+def test_anime_scores_keeps_list_columns_without_fanning_out(tmp_path) -> None:
+    data = copy.deepcopy(TEST_RAW_ANILIST_VALID)
+    media = data["data"]["MediaListCollection"]["lists"][0]["entries"][0]["media"]
+    media["genres"] = ["genre_a", "genre_b"]
+    media["synonyms"] = ["synonym_a", "synonym_b"]
+    media["tags"] = media["tags"] * 2
+    duckdb_resource = DuckDBResource(database=str(tmp_path / "test.duckdb"))
+    with duckdb_resource.get_connection() as conn:
+        conn.execute(f"CREATE SCHEMA {resource_config.duckdb_schema}")
+        for name, df in zip(TABLE_NAMES, anilist_tables(data)):
+            write_table(conn, f"{resource_config.duckdb_schema}.{name}", df)
+
+    result = anime_scores(
+        duckdb=duckdb_resource, config=ResourceConfig(query_path="./queries")
+    )
+
+    with duckdb_resource.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT genres, synonyms, tags FROM pandas.anime_scores"
+        ).fetchall()
+    assert result.metadata["rows"].value == 1
+    assert rows == [
+        (
+            ["genre_a", "genre_b"],
+            ["synonym_a", "synonym_b"],
+            ["test_tag_name", "test_tag_name"],
+        )
+    ]
+
+
+def test_fact_anime_check_reports_failed_rules() -> None:
+    conn = stored_tables()
+    fact_anime = f"{resource_config.duckdb_schema}.fact_anime"
+    conn.execute(f"INSERT INTO {fact_anime} BY NAME SELECT * FROM {fact_anime}")
+    conn.execute(f"UPDATE {fact_anime} SET media_id = 99, score = 101 WHERE rowid = 1")
+    validated = fact_anime_validate_check(conn.table(fact_anime))
+    rules = {rule["rule"]: rule for rule in validated.metadata["rules"].value}
+
+    assert validated.passed == False
+    assert validated.metadata["rows"].value == 2
+    assert validated.metadata["error"].value == (
+        "failed rules: unique(id), foreign_key(media_id), in_range(score)"
+    )
+    assert rules["foreign_key(media_id)"]["failures"] == 1
+    assert rules["in_range(score)"]["detail"] == {"min": 7.0, "max": 101.0}
+
+
+def make_delta_entry(
+    entry_id: int, media_id: int, score: int, updated_at: int, user_id: int = 42
+) -> dict:
+    entry = copy.deepcopy(TEST_LISTS[0]["entries"][0])
+    entry["id"] = entry_id
+    entry["userId"] = user_id
+    entry["mediaId"] = media_id
+    entry["media"]["id"] = media_id
+    entry["score"] = score
+    entry["updatedAt"] = updated_at
+    return entry
+
+
+def test_merge_events_upserts_latest_events(tmp_path) -> None:
+    user = TEST_RAW_ANILIST_VALID["data"]["User"]
+    with duckdb.connect(str(tmp_path / "test.duckdb")) as conn:
+        first = merge_events(
+            conn,
+            "pandas",
+            [user],
+            [
+                make_delta_entry(1, 2, 7, 100),
+                make_delta_entry(3, 4, 5, 100),
+                make_delta_entry(5, 4, 6, 100, user_id=43),
+            ],
+        )
+        second = merge_events(
+            conn,
+            "pandas",
+            [],
+            [make_delta_entry(1, 2, 8, 110), make_delta_entry(1, 2, 9, 120)],
+        )
+        scores = conn.execute(
+            "SELECT id, score FROM pandas.fact_anime ORDER BY id"
+        ).fetchall()
+        users = conn.execute("SELECT name FROM pandas.dimension_user").fetchall()
+        # Both users have media 4; only user 42 removed it
+        third = merge_events(conn, "pandas", [], [], deleted_entries=[(42, 4)])
+        remaining = conn.execute(
+            "SELECT id, user_id FROM pandas.fact_anime ORDER BY id"
+        ).fetchall()
+
+    assert first == {"fact_anime": 3, "dimension_media": 2, "dimension_user": 1}
+    assert second == {"fact_anime": 1, "dimension_media": 1}
+    assert third == {"deleted": 1}
+    assert scores == [(1, 9.0), (3, 5.0), (5, 6.0)]
+    assert remaining == [(1, 42), (5, 43)]
+    assert users == [("test_user",)]
+
+
+def test_merge_events_tags_rows_with_their_partition(tmp_path) -> None:
+    user = TEST_RAW_ANILIST_VALID["data"]["User"]
+    with duckdb.connect(str(tmp_path / "test.duckdb")) as conn:
+        merge_events(
+            conn,
+            "pandas",
+            [user],
+            [
+                make_delta_entry(1, 2, 7, 100),
+                make_delta_entry(3, 4, 5, 100, user_id=43),
+            ],
+            partition_keys={42: "Test_User"},
+        )
+        facts = conn.execute(
+            "SELECT id, partition_key FROM pandas.fact_anime ORDER BY id"
+        ).fetchall()
+        users = conn.execute(
+            "SELECT id, partition_key FROM pandas.dimension_user"
+        ).fetchall()
+
+    assert facts == [(1, "Test_User"), (3, None)]
+    assert users == [(42, "Test_User")]
+
+
+def test_duckdb_steps_are_serialized_on_one_pool() -> None:
+    writers = [
+        ensure_data_exists,
+        anilist_tables,
+        anime_scores,
+        dbt_raw,
+        adp_dbt_dbt_assets,
+    ]
+    readers = [plots, store_anime_scores_parquet]
+    checks = TABLE_CHECKS + [anime_scores_validate_check, dbt_raw_validate_check]
+
+    for asset in writers + readers:
+        assert asset.op.tags["duckdb"] == "connection"
+        assert asset.op.pool == "duckdb"
+    # Checks take no pool argument, the concurrency key tag stands in for it
+    for check in checks:
+        assert check.op.tags["duckdb"] == "connection"
+        assert check.op.tags["dagster/concurrency_key"] == "duckdb"
+    assert "duckdb" not in kafka_topics.op.tags
+    assert kafka_topics.op.pool is None
+    for asset in readers:
+        assert "duckdb_read" in asset.required_resource_keys
+        assert "duckdb" not in asset.required_resource_keys
+
+
+def test_instance_limits_every_pool_to_one_step(tmp_path) -> None:
+    # Loaded from a copy, the instance creates its storage next to the file
+    shutil.copy(Path(".dagster", "dagster.yaml"), tmp_path)
+    instance = dg.DagsterInstance.from_config(str(tmp_path))
+    pools = instance.get_concurrency_config().pool_config
+
+    assert pools.default_pool_limit == 1
+
+
+def test_store_anime_scores_parquet_swaps_changed_partitions(tmp_path) -> None:
+    database = str(tmp_path / "test.duckdb")
+    duckdb_write = DuckDBResource(database=database)
+    with duckdb_write.get_connection() as conn:
+        conn.execute("CREATE SCHEMA dbt")
+        conn.execute(
+            """
+            CREATE TABLE dbt.anime_scores AS
+            SELECT * FROM (VALUES
+                (1, 10, 2024, 8.0::DOUBLE, 'FINISHED', TIMESTAMP '2025-01-01'),
+                (1, 11, 2024, 7.0, 'FINISHED', TIMESTAMP '2025-01-01'),
+                (1, 12, NULL, 6.0, 'RELEASING', TIMESTAMP '2025-01-01'),
+                (2, 10, 2024, 9.0, 'FINISHED', TIMESTAMP '2025-01-01')
+            ) AS t(user_id, media_id, season_year, score, status, loaded_at)
+            """
+        )
+    duckdb_read = DuckDBResource(
+        database=database, connection_config={"access_mode": "READ_ONLY"}
+    )
+    config = AnimeScoresParquetConfig(data_path=str(tmp_path), row_group_size=1)
+    root = tmp_path / config.anime_scores_parquet_dirname
+
+    def read_export() -> list[tuple]:
+        manifest = json.loads((root / "_manifest.json").read_text())
+        files = [str(root / entry["path"]) for entry in manifest["files"]]
+        with duckdb_read.get_connection() as conn:
+            return conn.execute(
+                f"""
+                SELECT user_id, media_id, season_year, score
+                FROM read_parquet({files}, hive_partitioning = true)
+                ORDER BY user_id, media_id
+                """
+            ).fetchall()
+
+    first = store_anime_scores_parquet(duckdb_read=duckdb_read, config=config)
+    untouched = sorted((root / "user_id=2").rglob("*.parquet"))
+    with duckdb_read.get_connection() as conn:
+        with pytest.raises(duckdb.InvalidInputException):
+            conn.execute("CREATE TABLE dbt.other AS SELECT 1")
+
+    # media 12 gets a season, moving user 1's row out of the NULL partition
+    with duckdb_write.get_connection() as conn:
+        conn.execute(
+            """
+            UPDATE dbt.anime_scores
+            SET season_year = 2024, loaded_at = TIMESTAMP '2025-02-01'
+            WHERE media_id = 12
+            """
+        )
+    second = store_anime_scores_parquet(duckdb_read=duckdb_read, config=config)
+    manifest = json.loads((root / "_manifest.json").read_text())
+
+    assert first.metadata["partitions"].value == 3
+    assert first.metadata["rows"].value == 4
+    assert second.metadata["rows_written"].value == 3
+    assert second.metadata["partitions_rewritten"].value == 2
+    assert second.metadata["partitions"].value == 2
+    assert read_export() == [
+        (1, 10, 2024, 8.0),
+        (1, 11, 2024, 7.0),
+        (1, 12, 2024, 6.0),
+        (2, 10, 2024, 9.0),
+    ]
+    assert sorted((root / "user_id=2").rglob("*.parquet")) == untouched
+    assert not (root / "user_id=1" / "season_year=NULL").exists()
+    assert manifest["watermark"].startswith("2025-02-01")
+    user_1 = [e for e in manifest["files"] if e["partition"]["user_id"] == 1][0]
+    assert user_1["rows"] == 3
+    assert user_1["row_groups"] == 3
+    assert user_1["stats"]["score"] == {"min": 6.0, "max": 8.0, "null_count": 0}
+    assert user_1["stats"]["status"]["max"] == "RELEASING"
+    metadata = pq.read_metadata(root / user_1["path"])
+    column = metadata.row_group(0).column(metadata.schema.names.index("status"))
+    assert column.compression == "ZSTD"
+    assert "RLE_DICTIONARY" in column.encodings
+    assert "user_id" not in metadata.schema.names
+
+
+def test_store_anime_scores_parquet_drops_removed_entries(tmp_path) -> None:
+    database = str(tmp_path / "test.duckdb")
+    duckdb_write = DuckDBResource(database=database)
+    with duckdb_write.get_connection() as conn:
+        conn.execute("CREATE SCHEMA dbt")
+        conn.execute(
+            """
+            CREATE TABLE dbt.anime_scores AS
+            SELECT * FROM (VALUES
+                (1, 10, 2024, 8.0::DOUBLE, TIMESTAMP '2025-01-01'),
+                (1, 11, 2023, 7.0, TIMESTAMP '2025-01-01'),
+                (2, 11, 2023, 9.0, TIMESTAMP '2025-01-01')
+            ) AS t(user_id, media_id, season_year, score, loaded_at)
+            """
+        )
+    duckdb_read = DuckDBResource(
+        database=database, connection_config={"access_mode": "READ_ONLY"}
+    )
+    config = AnimeScoresParquetConfig(data_path=str(tmp_path), dictionary_columns=[])
+    root = tmp_path / config.anime_scores_parquet_dirname
+    store_anime_scores_parquet(duckdb_read=duckdb_read, config=config)
+
+    # User 1's next snapshot no longer lists media 11; the rest of it is reloaded
+    with duckdb_write.get_connection() as conn:
+        conn.execute("DELETE FROM dbt.anime_scores WHERE user_id = 1 AND media_id = 11")
+        conn.execute(
+            "UPDATE dbt.anime_scores SET loaded_at = '2025-02-01' WHERE user_id = 1"
+        )
+    second = store_anime_scores_parquet(duckdb_read=duckdb_read, config=config)
+
+    manifest = json.loads((root / "_manifest.json").read_text())
+    partitions = sorted(
+        (entry["partition"]["user_id"], entry["partition"]["season_year"])
+        for entry in manifest["files"]
+    )
+    assert second.metadata["partitions_rewritten"].value == 2
+    assert partitions == [(1, 2024), (2, 2023)]
+    assert not (root / "user_id=1" / "season_year=2023").exists()
+
+
+def test_plots_reuse_cached_renders(tmp_path) -> None:
+    database = str(tmp_path / "test.duckdb")
+    with DuckDBResource(database=database).get_connection() as conn:
+        conn.execute("CREATE SCHEMA dbt")
+        conn.execute(
+            "CREATE TABLE dbt.anime_scores AS SELECT i AS media_id, i % 3 + 1.0 AS score FROM range(10) t(i)"
+        )
+        conn.execute(
+            "CREATE TABLE dbt.media_genre AS SELECT media_id, 'test_genre' AS genre FROM dbt.anime_scores"
+        )
+    renderer = PlotRendererResource()
+    resources = {
+        "duckdb_read": DuckDBResource(
+            database=database, connection_config={"access_mode": "READ_ONLY"}
+        ),
+        "plot_renderer": renderer,
+    }
+    config = {"data_path": str(tmp_path), "query_path": "./queries"}
+    selection = ["plot_count_scores", "plot_count_scores_genre"]
+
+    def materialize_plots() -> dict[str, dict]:
+        result = dg.materialize(
+            [plots],
+            selection=selection,
+            resources=resources,
+            run_config={"ops": {"plots": {"config": config}}},
+        )
+        return {
+            event.asset_key.to_user_string(): event.materialization.metadata
+            for event in result.get_asset_materialization_events()
+        }
+
+    first = materialize_plots()
+    second = materialize_plots()
+    with DuckDBResource(database=database).get_connection() as conn:
+        conn.execute("UPDATE dbt.anime_scores SET score = 5.0 WHERE media_id = 0")
+    third = materialize_plots()
+
+    assert sorted(first) == selection
+    assert not any(metadata["cached"].value for metadata in first.values())
+    assert all(metadata["cached"].value for metadata in second.values())
+    assert (
+        second["plot_count_scores"]["plot_md"] == first["plot_count_scores"]["plot_md"]
+    )
+    assert not third["plot_count_scores"]["cached"].value
+    assert (tmp_path / "count_scores.html").exists()
+    assert (tmp_path / "count_scores_by_top_genre.png").exists()
+
+
+def test_anilist_tables_leaves_raw_untouched() -> None:
+    raw = copy.deepcopy(TEST_RAW_ANILIST_VALID)
+
+    fact_df, media_df, user_df = anilist_tables(raw)
+
+    assert raw == TEST_RAW_ANILIST_VALID
+    assert (len(fact_df), len(media_df), len(user_df)) == (1, 1, 1)
+
+
+def make_varied_entries() -> list:
+    entries = []
+    for i in range(30):
+        entry = make_delta_entry(i, 100 + i, i % 10, i)
+        if i % 3 == 0:
+            entry["media"]["averageScore"] = None
+        if i % 4 == 0:
+            entry["startedAt"] = {"year": 2024, "month": 2, "day": i % 28 + 1}
+        if i % 5 == 0:
+            entry["completedAt"] = {"year": 2024, "month": None, "day": 1}
+        entries.append(entry)
+
+    del entries[7]["userId"]
+    entries[8]["startedAt"] = {"year": 2023, "month": 2, "day": 30}
+    entries[9]["media"]["genres"] = None
+    entries[10]["media"]["tags"][0]["rank"] = "high"
+    entries[11]["media"]["coverImage"] = {"large": "test_large_cover_image"}
+    entries[12]["media"]["episodes"] = "12"
+    entries[13]["media"]["tags"][0]["extra"] = "dropped"
+    return entries
+
+
+def test_arrow_engine_matches_pydantic_engine() -> None:
+    entries = make_varied_entries()
+    models = [schemas.FactAnime, schemas.DimensionMedia]
+
+    expected = convert_entries_to_models(copy.deepcopy(entries), models, "pydantic")
+    actual = convert_entries_to_models(copy.deepcopy(entries), models, "arrow")
+
+    assert (len(expected[0]), len(expected[1])) == (28, 27)
+    for actual_df, expected_df in zip(actual, expected):
+        assert_frame_equal(actual_df, expected_df)
+
+
+def test_arrow_engine_reports_invalid_rows() -> None:
+    errors = []
+
+    convert_entries_columnar(make_varied_entries(), [schemas.FactAnime], errors)
+
+    assert [(error.row, error.field) for error in errors] == [
+        (7, "userId"),
+        (8, "startedAt"),
+    ]
@@ -0,0 +1,114 @@
+import duckdb
+import json
+import subprocess
+
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent.resolve()
+
+
+def snapshot(user_id: int, user_name: str, media_ids: list[int]) -> str:
+    entries = [
+        {
+            "id": user_id * 100 + media_id,
+            "userId": user_id,
+            "score": 8.0,
+            "media": {
+                "id": media_id,
+                "title": {"english": f"title_{media_id}"},
+                "genres": [f"genre_{media_id}", "genre_0"],
+                "synonyms": [f"synonym_{media_id}"],
+                "tags": [
+                    {"name": "tag_0", "rank": 10},
+                    {"name": f"tag_{media_id}", "rank": 90},
+                ],
+            },
+        }
+        for media_id in media_ids
+    ]
+    return json.dumps(
+        {
+            "MediaListCollection": {"lists": [{"entries": entries}]},
+            "User": {"id": user_id, "name": user_name},
+        }
+    )
+
+
+def run_dbt(tmp_path: Path) -> None:
+    subprocess.run(
+        [
+            "dbt",
+            "run",
+            "--quiet",
+            "--select",
+            "+anime_scores",
+            "--project-dir",
+            str(ROOT),
+            "--profiles-dir",
+            str(tmp_path),
+            "--target-path",
+            str(tmp_path / "target"),
+            "--log-path",
+            str(tmp_path / "logs"),
+        ],
+        check=True,
+    )
+
+
+def test_incremental_models_drop_entries_removed_from_a_list(tmp_path) -> None:
+    database = str(tmp_path / "anime_data.duckdb")
+    tmp_path.joinpath("profiles.yml").write_text(
+        json.dumps(
+            {
+                "anime_data_pipeline": {
+                    "target": "test",
+                    "outputs": {"test": {"type": "duckdb", "path": database}},
+                }
+            }
+        )
+    )
+    with duckdb.connect(database) as conn:
+        conn.execute(
+            """
+            CREATE SCHEMA dbt;
+            CREATE TABLE dbt.raw_anilist (
+                data JSON, loaded_at TIMESTAMP, user_name VARCHAR, ingest_date DATE
+            );
+            """
+        )
+        conn.executemany(
+            "INSERT INTO dbt.raw_anilist VALUES (?, ?, ?, CURRENT_DATE)",
+            [
+                (snapshot(1, "a", [1, 2]), "2026-01-01 00:00:00", "a"),
+                (snapshot(2, "b", [1, 2]), "2026-01-01 00:00:00", "b"),
+            ],
+        )
+    run_dbt(tmp_path)
+
+    with duckdb.connect(database) as conn:
+        # Two snapshots of user 1 arrive in one run, the latest has removed media 2
+        conn.executemany(
+            "INSERT INTO dbt.raw_anilist VALUES (?, ?, ?, CURRENT_DATE)",
+            [
+                (snapshot(1, "a", [1, 2, 3]), "2026-01-02 00:00:00", "a"),
+                (snapshot(1, "a", [1, 3]), "2026-01-03 00:00:00", "a"),
+            ],
+        )
+    run_dbt(tmp_path)
+
+    with duckdb.connect(database, read_only=True) as conn:
+        facts = conn.execute(
+            "SELECT user_id, media_id FROM dbt.fact_anime ORDER BY ALL"
+        ).fetchall()
+        scores = conn.execute(
+            "SELECT user_id, media_id FROM dbt.anime_scores ORDER BY ALL"
+        ).fetchall()
+        lists = conn.execute(
+            "SELECT genres, tags, synonyms FROM dbt.anime_scores"
+            " WHERE user_id = 1 AND media_id = 3"
+        ).fetchall()
+
+    assert facts == [(1, 1), (1, 3), (2, 1), (2, 2)]
+    assert scores == facts
+    # Bridge rows come back as one list per media instead of one row each
+    assert lists == [(["genre_0", "genre_3"], ["tag_3", "tag_0"], ["synonym_3"])]
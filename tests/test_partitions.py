@@ -0,0 +1,341 @@
+from anime_data_pipeline.definitions import defs
+from anime_data_pipeline.defs.assets import (
+    anilist_tables,
+    dbt_raw,
+    dbt_raw_validate_check,
+    dimension_user_validate_check,
+    fact_anime_validate_check,
+    raw_anilist,
+)
+from anime_data_pipeline.defs.partitions import users_partitions
+from anime_data_pipeline.defs.resources import (
+    AniListAPIResource,
+    DuckDBArrowIOManager,
+    LocalFileJSONIOManager,
+)
+from anime_data_pipeline.defs.sensors import (
+    POLL_POLICY,
+    anilist_changes_sensor,
+    anilist_users_sensor,
+)
+from anime_data_pipeline.lib.anilist import AniListResponse
+from anime_data_pipeline.lib.polling import ListProbe
+from anime_data_pipeline.lib.synthetic import PayloadOptions, make_payloads
+
+import dagster as dg
+import duckdb
+import itertools
+import json
+from dagster_duckdb import DuckDBResource
+from unittest import mock
+
+
+def test_partitions_only_rewrite_their_user(tmp_path) -> None:
+    payloads = {
+        payload["data"]["User"]["name"]: payload
+        for payload in make_payloads(PayloadOptions(users=2, entries=5, media=6))
+    }
+
+    digests = itertools.count()
+
+    def fetch(self, query_filename, user_name=None):
+        # A new digest every time, so reruns rewrite the partition
+        return AniListResponse(
+            data=payloads[user_name], digest=str(next(digests)), size=0, source="api"
+        )
+
+    database = str(tmp_path / "anime_data.duckdb")
+    resources = {
+        "anilist_api": AniListAPIResource(user_name="unused", query_path="queries"),
+        "local_io_manager": LocalFileJSONIOManager(data_path=str(tmp_path)),
+        "duckdb_io_manager": DuckDBArrowIOManager(
+            database=database, duckdb_schema="pandas"
+        ),
+    }
+    instance = dg.DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions(users_partitions.name, list(payloads))
+
+    with mock.patch.object(AniListAPIResource, "fetch", fetch):
+        runs = [
+            dg.materialize(
+                [
+                    raw_anilist,
+                    anilist_tables,
+                    fact_anime_validate_check,
+                    dimension_user_validate_check,
+                ],
+                partition_key=user_name,
+                instance=instance,
+                resources=resources,
+            )
+            for user_name in ["user_1", "user_2", "user_1"]
+        ]
+
+    with duckdb.connect(database) as conn:
+        facts = conn.execute(
+            "SELECT user_id, COUNT(*) FROM pandas.fact_anime GROUP BY 1 ORDER BY 1"
+        ).fetchall()
+        media = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT id) FROM pandas.dimension_media"
+        ).fetchone()
+        users = conn.execute(
+            "SELECT name FROM pandas.dimension_user ORDER BY 1"
+        ).fetchall()
+
+    assert all(run.success for run in runs)
+    # Checks cover every partition; they read lazy relations filtered to them
+    evaluations = runs[-1].get_asset_check_evaluations()
+    assert sorted(e.metadata["rows"].value for e in evaluations) == [2, 10]
+    assert facts == [(1, 5), (2, 5)]
+    assert media[0] == media[1]
+    assert users == [("user_1",), ("user_2",)]
+    assert (tmp_path / runs[0].run_id / "user_1" / "raw_anilist.json").exists()
+    assert (tmp_path / runs[1].run_id / "user_2" / "raw_anilist.json").exists()
+
+
+def test_partition_keys_need_not_match_the_user_name_case(tmp_path) -> None:
+    # AniList looks names up case-insensitively, so the key is not the stored name
+    (payload,) = make_payloads(PayloadOptions(users=1, entries=5, media=6))
+
+    digests = itertools.count()
+
+    def fetch(self, query_filename, user_name=None):
+        return AniListResponse(
+            data=payload, digest=str(next(digests)), size=0, source="api"
+        )
+
+    database = str(tmp_path / "anime_data.duckdb")
+    resources = {
+        "anilist_api": AniListAPIResource(user_name="unused", query_path="queries"),
+        "local_io_manager": LocalFileJSONIOManager(data_path=str(tmp_path)),
+        "duckdb_io_manager": DuckDBArrowIOManager(
+            database=database, duckdb_schema="pandas"
+        ),
+    }
+    instance = dg.DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions(users_partitions.name, ["USER_1"])
+
+    with mock.patch.object(AniListAPIResource, "fetch", fetch):
+        runs = [
+            dg.materialize(
+                [raw_anilist, anilist_tables, fact_anime_validate_check],
+                partition_key="USER_1",
+                instance=instance,
+                resources=resources,
+            )
+            for _ in range(2)
+        ]
+
+    with duckdb.connect(database) as conn:
+        facts = conn.execute(
+            "SELECT partition_key, COUNT(*), COUNT(DISTINCT id)"
+            " FROM pandas.fact_anime GROUP BY 1"
+        ).fetchall()
+        users = conn.execute(
+            "SELECT name, partition_key FROM pandas.dimension_user"
+        ).fetchall()
+
+    assert all(run.success for run in runs)
+    assert facts == [("USER_1", 5, 5)]
+    assert users == [("user_1", "USER_1")]
+
+
+def test_dbt_raw_check_reads_only_its_runs_snapshot(tmp_path) -> None:
+    payloads = {
+        payload["data"]["User"]["name"]: payload
+        for payload in make_payloads(PayloadOptions(users=2, entries=5, media=6))
+    }
+
+    digests = itertools.count()
+
+    def fetch(self, query_filename, user_name=None):
+        # A new digest every time, so reruns rewrite the partition
+        return AniListResponse(
+            data=payloads[user_name], digest=str(next(digests)), size=0, source="api"
+        )
+
+    database = str(tmp_path / "anime_data.duckdb")
+    resources = {
+        "anilist_api": AniListAPIResource(user_name="unused", query_path="queries"),
+        "local_io_manager": LocalFileJSONIOManager(data_path=str(tmp_path)),
+        "duckdb": DuckDBResource(database=database),
+        "duckdb_read": DuckDBResource(
+            database=database, connection_config={"access_mode": "READ_ONLY"}
+        ),
+    }
+    config = {"config": {"data_path": str(tmp_path)}}
+    instance = dg.DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions(users_partitions.name, list(payloads))
+
+    with mock.patch.object(AniListAPIResource, "fetch", fetch):
+        runs = [
+            dg.materialize(
+                [raw_anilist, dbt_raw, dbt_raw_validate_check],
+                partition_key=user_name,
+                instance=instance,
+                resources=resources,
+                run_config={
+                    "ops": {"dbt_raw": config, "dbt_raw_dbt_raw_validate_check": config}
+                },
+            )
+            for user_name in ["user_1", "user_2", "user_1"]
+        ]
+
+    assert all(run.success for run in runs)
+    for run in runs:
+        (evaluation,) = run.get_asset_check_evaluations()
+        assert evaluation.passed
+        assert evaluation.metadata["rows"].value == 1
+
+
+def test_dbt_raw_replaces_the_baseline_raw_anilist_table(tmp_path) -> None:
+    (payload,) = make_payloads(PayloadOptions(users=1, entries=5, media=6))
+
+    def fetch(self, query_filename, user_name=None):
+        return AniListResponse(data=payload, digest="", size=0, source="api")
+
+    database = str(tmp_path / "anime_data.duckdb")
+    baseline_json = tmp_path / "baseline.json"
+    baseline_json.write_text(json.dumps(payload))
+    with duckdb.connect(database) as conn:
+        # The baseline dbt_raw copied the run's raw_anilist.json into a table
+        conn.execute("CREATE SCHEMA dbt")
+        conn.execute(f"CREATE TABLE dbt.raw_anilist AS SELECT * FROM '{baseline_json}'")
+
+    instance = dg.DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions(users_partitions.name, ["user_1"])
+    with mock.patch.object(AniListAPIResource, "fetch", fetch):
+        result = dg.materialize(
+            [raw_anilist, dbt_raw],
+            partition_key="user_1",
+            instance=instance,
+            resources={
+                "anilist_api": AniListAPIResource(
+                    user_name="unused", query_path="queries"
+                ),
+                "local_io_manager": LocalFileJSONIOManager(data_path=str(tmp_path)),
+                "duckdb": DuckDBResource(database=database),
+            },
+            run_config={"ops": {"dbt_raw": {"config": {"data_path": str(tmp_path)}}}},
+        )
+
+    with duckdb.connect(database) as conn:
+        (table_type,) = conn.execute(
+            "SELECT table_type FROM information_schema.tables"
+            " WHERE table_schema = 'dbt' AND table_name = 'raw_anilist'"
+        ).fetchone()
+        rows = conn.execute("SELECT user_name, run_id FROM dbt.raw_anilist").fetchall()
+
+    assert result.success
+    assert table_type == "VIEW"
+    assert rows == [("user_1", result.run_id)]
+
+
+def test_sensor_requests_new_users_once() -> None:
+    instance = dg.DagsterInstance.ephemeral()
+    anilist_api = AniListAPIResource(user_name="user_1", query_path="queries")
+
+    def evaluate(cursor=None) -> dg.SensorResult:
+        with dg.build_sensor_context(
+            instance=instance, cursor=cursor, resources={"anilist_api": anilist_api}
+        ) as context:
+            return anilist_users_sensor(context)
+
+    first = evaluate()
+    (added,) = first.dynamic_partitions_requests
+    instance.add_dynamic_partitions(users_partitions.name, list(added.partition_keys))
+    unchanged = evaluate(first.cursor)
+    instance.add_dynamic_partitions(users_partitions.name, ["user_2"])
+    second = evaluate(unchanged.cursor)
+
+    assert list(added.partition_keys) == ["user_1"]
+    assert [run.partition_key for run in first.run_requests] == ["user_1"]
+    assert unchanged.run_requests == []
+    assert unchanged.dynamic_partitions_requests == []
+    assert [run.partition_key for run in second.run_requests] == ["user_2"]
+
+
+def test_changes_sensor_runs_only_changed_users() -> None:
+    probes = {"user_1": ListProbe(10, 100), "user_2": ListProbe(5, 100)}
+    anilist_api = AniListAPIResource(user_name="user_1", query_path="queries")
+
+    def evaluate(instance, cursor=None) -> dg.SensorResult:
+        with dg.build_sensor_context(
+            instance=instance, cursor=cursor, resources={"anilist_api": anilist_api}
+        ) as context:
+            return anilist_changes_sensor(context)
+
+    def probe(self, query_filename, user_name=None):
+        return probes[user_name]
+
+    with (
+        dg.instance_for_test() as instance,
+        mock.patch.object(AniListAPIResource, "probe", probe),
+        mock.patch("time.time", return_value=1000.0) as now,
+    ):
+        instance.add_dynamic_partitions(users_partitions.name, ["user_1", "user_2"])
+        baseline = evaluate(instance)
+        probes["user_1"] = ListProbe(11, 200)
+        probes["user_2"] = ListProbe(4, 100)
+        too_soon = evaluate(instance, baseline.cursor)
+        now.return_value = 1060.0
+        changed = evaluate(instance, too_soon.cursor)
+        now.return_value = 1120.0
+        unchanged = evaluate(instance, changed.cursor)
+
+    assert baseline.run_requests == []
+    assert too_soon.run_requests == []
+    assert anilist_changes_sensor.job_name == "anilist_job"
+    assert [
+        (run.partition_key, run.tags["anilist/change"]) for run in changed.run_requests
+    ] == [("user_1", "updated"), ("user_2", "removed")]
+    assert unchanged.run_requests == []
+    assert json.loads(unchanged.cursor)["user_1"]["interval_seconds"] == 120.0
+
+
+def test_changes_sensor_caps_probes_per_tick() -> None:
+    anilist_api = AniListAPIResource(user_name="user_1", query_path="queries")
+    probed = []
+
+    def evaluate(instance, cursor=None) -> dg.SensorResult:
+        with dg.build_sensor_context(
+            instance=instance, cursor=cursor, resources={"anilist_api": anilist_api}
+        ) as context:
+            return anilist_changes_sensor(context)
+
+    def probe(self, query_filename, user_name=None):
+        probed.append(user_name)
+        return ListProbe(10, 100)
+
+    with (
+        dg.instance_for_test() as instance,
+        mock.patch.object(AniListAPIResource, "probe", probe),
+        mock.patch.object(POLL_POLICY, "max_probes_per_tick", 2),
+        mock.patch("time.time", return_value=1000.0),
+    ):
+        instance.add_dynamic_partitions(
+            users_partitions.name, ["user_1", "user_2", "user_3"]
+        )
+        first = evaluate(instance)
+        second = evaluate(instance, first.cursor)
+
+    assert probed == ["user_1", "user_2", "user_3"]
+    assert sorted(json.loads(first.cursor)) == ["user_1", "user_2"]
+    assert sorted(json.loads(second.cursor)) == ["user_1", "user_2", "user_3"]
+
+
+def test_anilist_job_selects_only_the_full_snapshot_path(monkeypatch) -> None:
+    monkeypatch.setenv("USER_NAME", "test_user")
+    repository = defs().get_repository_def()
+    keys = {
+        job: {
+            key.to_user_string()
+            for key in repository.get_job(job).asset_layer.executable_asset_keys
+        }
+        for job in ["anilist_job", "anilist_serial_job"]
+    }
+
+    snapshot_path = {"raw_anilist", "fact_anime", "dbt/anime_scores", "kafka_topics"}
+    assert keys["anilist_job"] == keys["anilist_serial_job"]
+    assert snapshot_path <= keys["anilist_job"]
+    assert "raw_anilist_entries" not in keys["anilist_job"]
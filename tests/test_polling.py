@@ -0,0 +1,59 @@
+from anime_data_pipeline.lib.anilist import AniListAPIError
+from anime_data_pipeline.lib.polling import *
+
+import pytest
+
+
+def test_poll_policy_backs_off_idle_users_and_resets_on_change() -> None:
+    policy = PollPolicy(min_interval_seconds=60, max_interval_seconds=300)
+
+    state, change = policy.update(None, ListProbe(10, 100), now=0)
+    assert change is None
+    assert (state.next_poll_at, policy.due(state, 59), policy.due(state, 60)) == (
+        60,
+        False,
+        True,
+    )
+
+    intervals = []
+    for now in range(60, 600, 60):
+        state, change = policy.update(state, ListProbe(10, 100), now)
+        intervals.append(state.interval_seconds)
+    assert intervals == [120, 240, 300, 300, 300, 300, 300, 300, 300]
+
+    state, change = policy.update(state, ListProbe(10, 150), now=600)
+    assert (change, state.interval_seconds, state.changed_at) == (UPDATED, 60, 600)
+    state, change = policy.update(state, ListProbe(9, 150), now=660)
+    assert (change, state.entries) == (REMOVED, 9)
+    state, change = policy.update(state, None, now=720)
+    assert (change, state.entries, state.interval_seconds) == (None, 9, 120)
+
+    assert load_states(dump_states({"user": state})) == {"user": state}
+
+
+def test_poll_policy_probes_the_longest_overdue_users_first() -> None:
+    policy = PollPolicy(max_probes_per_tick=2)
+    states = {
+        "soon": PollState(next_poll_at=90),
+        "late": PollState(next_poll_at=10),
+        "idle": PollState(next_poll_at=500),
+    }
+
+    due = policy.due_users(states, ["soon", "late", "idle", "new"], now=100)
+
+    assert due == ["new", "late"]
+
+
+def test_parse_probe() -> None:
+    data = {
+        "data": {
+            "User": {"id": 1, "updatedAt": 50, "statistics": {"anime": {"count": 3}}},
+            "Page": {"mediaList": [{"updatedAt": 120}]},
+        }
+    }
+    empty_list = {"data": {"User": data["data"]["User"], "Page": {"mediaList": []}}}
+
+    assert parse_probe(data) == ListProbe(entries=3, updated_at=120)
+    assert parse_probe(empty_list) == ListProbe(entries=3, updated_at=50)
+    with pytest.raises(AniListAPIError):
+        parse_probe({"data": {"User": None}, "errors": [{"message": "Not Found."}]})
@@ -0,0 +1,33 @@
+from anime_data_pipeline.defs.project import CachedDbtProjectPreparer
+
+from dagster_dbt import DbtProject
+from dagster_dbt.dbt_project import DagsterDbtProjectPreparer
+from unittest import mock
+
+
+def test_manifest_is_reparsed_only_when_project_files_change(tmp_path) -> None:
+    tmp_path.joinpath("dbt_project.yml").write_text("name: test\n")
+    tmp_path.joinpath("dbt", "models").mkdir(parents=True)
+    model = tmp_path.joinpath("dbt", "models", "model.sql")
+    model.write_text("SELECT 1")
+    project = DbtProject(project_dir=tmp_path)
+    parses = []
+
+    def parse(self, project):
+        parses.append(project.manifest_path)
+        project.manifest_path.parent.mkdir(exist_ok=True)
+        project.manifest_path.write_text("{}")
+
+    with mock.patch.object(DagsterDbtProjectPreparer, "prepare", parse):
+        preparer = CachedDbtProjectPreparer()
+        preparer.prepare(project)
+        preparer.prepare(project)
+        model.touch()
+        preparer.prepare(project)
+        model.write_text("SELECT 2")
+        preparer.prepare(project)
+        project.manifest_path.unlink()
+        preparer.prepare(project)
+
+    assert len(parses) == 3
+    assert project.manifest_path.with_suffix(".sha256").exists()
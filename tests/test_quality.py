@@ -0,0 +1,87 @@
+from anime_data_pipeline.lib.quality import *
+
+import duckdb
+
+
+def make_conn() -> duckdb.DuckDBPyConnection:
+    conn = duckdb.connect()
+    conn.execute(
+        """
+        CREATE TABLE media AS SELECT range AS id FROM range(3);
+        CREATE TABLE facts AS
+        SELECT * FROM (
+            VALUES
+                (1, 0, 5.0, NULL, CURRENT_TIMESTAMP::TIMESTAMP),
+                (2, 1, 11.0, 'a', CURRENT_TIMESTAMP::TIMESTAMP - INTERVAL 2 HOUR),
+                (2, 7, NULL, 'b', NULL)
+        ) AS facts(id, media_id, score, note, loaded_at);
+        """
+    )
+    return conn
+
+
+def test_suite_reports_every_rule() -> None:
+    suite = Suite(
+        (
+            Unique("id"),
+            NotNull("note", max_rate=0.5),
+            NotNull("score"),
+            InRange("score", 0, 10),
+            ForeignKey("media_id", "media"),
+            Fresh("loaded_at", 3600),
+            Unique("missing"),
+        )
+    )
+    conn = make_conn()
+    report = suite.run(conn.table("facts"))
+    results = {result.rule: result for result in report.results}
+
+    assert report.rows == 3
+    assert report.failed == [
+        "unique(id)",
+        "not_null(score)",
+        "in_range(score)",
+        "foreign_key(media_id)",
+        "unique(missing)",
+    ]
+    assert results["unique(id)"].failures == 1
+    assert results["not_null(note)"].detail == {"null_rate": 0.3333}
+    assert results["in_range(score)"].detail == {"min": 5.0, "max": 11.0}
+    assert results["foreign_key(media_id)"].failures == 1
+    assert results["fresh(loaded_at)"].detail["age_seconds"] < 3600
+    assert results["unique(missing)"].detail == {"error": "missing column"}
+
+
+def test_suite_scans_the_table_once() -> None:
+    conn = make_conn()
+    suite = Suite(
+        (Unique("id"), NotNull("score"), InRange("score", 0, 10))
+        + (ForeignKey("media_id", "media"), Fresh("loaded_at", 3600))
+    )
+    plan = conn.sql(f"EXPLAIN {suite.sql('facts')}").fetchall()[0][1]
+
+    assert plan.count("Table: facts") == 1
+    assert plan.count("Table: media") == 1
+
+
+def test_suite_fails_stale_and_empty_tables() -> None:
+    conn = make_conn()
+    fresh = Suite((Fresh("loaded_at", 60),))
+
+    stale = fresh.run(conn.table("facts").filter("id = 2"))
+    empty = fresh.run(conn.table("facts").filter("false"))
+
+    assert stale.failed == ["fresh(loaded_at)"]
+    assert empty.rows == 0
+    assert empty.failed == ["min_rows", "fresh(loaded_at)"]
+
+
+def test_suite_runs_on_read_only_connections(tmp_path) -> None:
+    database = str(tmp_path / "quality.duckdb")
+    with duckdb.connect(database) as conn:
+        conn.execute("CREATE TABLE media AS SELECT range AS id FROM range(3)")
+
+    with duckdb.connect(database, read_only=True) as conn:
+        report = Suite((Unique("id"),)).run(conn.sql("FROM media"))
+
+    assert (report.rows, report.passed) == (3, True)
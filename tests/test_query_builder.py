@@ -0,0 +1,51 @@
+from anime_data_pipeline.lib.query_builder import *
+from anime_data_pipeline.defs.assets import convert_anilist_json_to_model
+from anime_data_pipeline.lib import schemas
+
+import copy
+from pathlib import Path
+from pandas.testing import assert_frame_equal
+
+from .test_assets import TEST_RAW_ANILIST_VALID
+
+QUERY_PATH = Path(__file__).parent.parent / "queries"
+
+
+def test_committed_queries_match_builder() -> None:
+    pruned = (QUERY_PATH / "anilist_pruned.graphql").read_text()
+    page = (QUERY_PATH / "anilist_page.graphql").read_text()
+
+    assert pruned == build_anilist_query()
+    assert page == build_anilist_page_query()
+
+
+def test_entry_selection_splits_entry_and_media_fields() -> None:
+    entry, user = asset_selections(["fact_anime"])
+
+    assert entry["startedAt"] == {"year": None, "month": None, "day": None}
+    assert "averageScore" in entry["media"]
+    assert "averageScore" not in entry
+    assert "genres" not in entry["media"]
+    assert user == {"id": None, "name": None}
+
+
+def test_prune_payload_keeps_consumed_fields() -> None:
+    raw = copy.deepcopy(TEST_RAW_ANILIST_VALID)
+    entry = raw["data"]["MediaListCollection"]["lists"][0]["entries"][0]
+    entry["notes"] = "unused " * 100
+    entry["media"]["externalLinks"] = [{"url": "https://example.com"}] * 10
+    raw["data"]["User"]["options"] = {"titleLanguage": "ROMAJI"}
+
+    pruned = prune_payload(raw, payload_selection())
+    report = payload_size_report(raw)
+
+    pruned_entry = pruned["data"]["MediaListCollection"]["lists"][0]["entries"][0]
+    assert "notes" not in pruned_entry
+    assert "externalLinks" not in pruned_entry["media"]
+    assert "options" not in pruned["data"]["User"]
+    assert report["after_bytes"] < report["before_bytes"]
+    for model in [schemas.FactAnime, schemas.DimensionMedia]:
+        assert_frame_equal(
+            convert_anilist_json_to_model(copy.deepcopy(pruned), model),
+            convert_anilist_json_to_model(copy.deepcopy(raw), model),
+        )
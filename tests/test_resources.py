@@ -0,0 +1,688 @@
+from anime_data_pipeline.defs.assets import (
+    KafkaTopicsConfig,
+    kafka_topics,
+    raw_anilist,
+)
+from anime_data_pipeline.defs.resources import (
+    AniListAPIResource,
+    DuckDBArrowIOManager,
+    KafkaResource,
+    LocalFileJSONIOManager,
+)
+from anime_data_pipeline.lib.anilist import AniListAPIError, AniListClient, TokenBucket
+from anime_data_pipeline.lib.cache import ResponseCache
+from anime_data_pipeline.lib import serialization
+from anime_data_pipeline.lib.streaming import (
+    MicroBatch,
+    header_partition_key,
+    record_partition_keys,
+    replay_entries,
+)
+from anime_data_pipeline.lib.serialization import (
+    CODECS,
+    LazyMapping,
+    get_codec,
+    materialize,
+)
+
+import dagster as dg
+import duckdb
+import gc
+import json
+import os
+import pandas as pd
+import pyarrow as pa
+import threading
+import time
+import pytest
+
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from kafka.errors import KafkaTimeoutError
+from kafka.future import Future
+from kafka.partitioner.default import murmur2
+from kafka.producer.future import RecordMetadata
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+from .test_assets import TEST_RAW_ANILIST_VALID
+
+TEST_PAGED_ENTRIES = 7
+
+
+class StubAniListHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        body = json.loads(self.rfile.read(length))
+        server = self.server
+
+        with server.lock:
+            server.requests += 1
+            throttle = server.throttle > 0
+            if throttle:
+                server.throttle -= 1
+            stall = server.stall > 0
+            if stall:
+                server.stall -= 1
+
+        if stall:
+            time.sleep(0.2)
+
+        if server.body is not None:
+            payload = server.body
+            self.send_response(200)
+        elif throttle:
+            payload = b"{}"
+            self.send_response(429)
+            self.send_header("Retry-After", "0.05")
+        else:
+            payload = json.dumps(self.respond(body["variables"])).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def respond(self, variables):
+        if "page" not in variables:
+            return {"data": {"User": {"name": variables["userName"]}}}
+
+        page, per_page = variables["page"], variables["perPage"]
+        ids = range((page - 1) * per_page, min(page * per_page, TEST_PAGED_ENTRIES))
+        return {
+            "data": {
+                "Page": {
+                    "pageInfo": {
+                        "currentPage": page,
+                        "hasNextPage": page * per_page < TEST_PAGED_ENTRIES,
+                    },
+                    "mediaList": [{"id": id, "mediaId": id * 10} for id in ids],
+                }
+            }
+        }
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAniListHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.throttle = 0
+    server.stall = 0
+    server.body = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeKafkaBroker:
+    def __init__(self, partitions: int = 4):
+        self.partitions = partitions
+        self.records = defaultdict(list)
+        self.headers = defaultdict(list)
+        self.failing_topics = set()
+        self.producers = []
+
+    def producer(self, **config) -> "FakeKafkaProducer":
+        producer = FakeKafkaProducer(self, config)
+        self.producers.append(producer)
+        return producer
+
+    def partition(self, key: bytes) -> int:
+        # Same hashing as the Java client and kafka-python's default partitioner
+        return (murmur2(key) & 0x7FFFFFFF) % self.partitions
+
+
+class FakeKafkaProducer:
+    def __init__(self, broker: FakeKafkaBroker, config: dict):
+        self.broker = broker
+        self.config = config
+        self.pending = []
+        self.flushes = 0
+        self.closed = False
+
+    def send(self, topic, value=None, key=None, headers=None) -> Future:
+        key = self.config["key_serializer"](key) if key is not None else None
+        value = self.config["value_serializer"](value)
+        future = Future()
+        self.pending.append((topic, key, value, headers or [], future))
+        return future
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        for topic, key, value, headers, future in pending:
+            if topic in self.broker.failing_topics:
+                future.failure(KafkaTimeoutError("batch expired"))
+                continue
+            partition = self.broker.partition(key)
+            records = self.broker.records[(topic, partition)]
+            records.append((key, json.loads(value) if value is not None else None))
+            self.broker.headers[(topic, partition)].append(headers)
+            header_size = sum(len(name) + len(data) for name, data in headers)
+            future.success(
+                RecordMetadata(
+                    topic=topic,
+                    partition=partition,
+                    topic_partition=None,
+                    offset=len(records) - 1,
+                    timestamp=-1,
+                    checksum=None,
+                    serialized_key_size=len(key),
+                    serialized_value_size=len(value) if value is not None else -1,
+                    serialized_header_size=header_size if headers else -1,
+                )
+            )
+        self.flushes += 1
+
+    def close(self):
+        self.flush()
+        self.closed = True
+
+
+def make_kafka(**kwargs) -> KafkaResource:
+    return KafkaResource(
+        raw_user_topic="raw_user",
+        raw_media_topic="raw_media",
+        kafka_url="localhost:9092",
+        kafka_version="4.0.0",
+        **kwargs,
+    )
+
+
+def test_kafka_producer_is_reused_and_keyed(tmp_path) -> None:
+    broker = FakeKafkaBroker()
+    kafka = make_kafka(linger_ms=10, compression_type="lz4")
+    data = json.loads(json.dumps(TEST_RAW_ANILIST_VALID))
+    data["data"]["MediaListCollection"]["lists"][0]["entries"] *= 3
+
+    with mock.patch("kafka.KafkaProducer", broker.producer):
+        first = kafka.produce(data)
+        kafka.produce(data)
+        kafka.teardown_after_execution(mock.MagicMock())
+        result = kafka_topics(
+            context=dg.build_asset_context(partition_key="test_user"),
+            raw_anilist=data,
+            kafka=kafka,
+            config=KafkaTopicsConfig(data_path=str(tmp_path)),
+        )
+
+    producer = broker.producers[0]
+    media = broker.records[("raw_media", broker.partition(b"42:2"))]
+    user = broker.records[("raw_user", broker.partition(b"42"))]
+    assert len(broker.producers) == 2
+    assert producer.config["api_version"] == (4, 0, 0)
+    assert producer.config["linger_ms"] == 10
+    assert producer.config["compression_type"] == "lz4"
+    assert producer.flushes == 3 and producer.closed
+    assert [key for key, _ in media] == [b"42:2"] * 9
+    assert user == [(b"42", TEST_RAW_ANILIST_VALID["data"]["User"])] * 3
+    # Only the asset knows its partition; plain produce calls send no headers
+    user_headers = broker.headers[("raw_user", broker.partition(b"42"))]
+    media_headers = broker.headers[("raw_media", broker.partition(b"42:2"))]
+    assert user_headers == [[], [], [("partition_key", b"test_user")]]
+    assert media_headers[-1] == [("partition_key", b"test_user")]
+    assert first.delivered == 4 and first.errors == 0
+    assert first.bytes == sum(
+        len(key) + len(json.dumps(value, separators=(",", ":")))
+        for key, value in media[:3] + user[:1]
+    )
+    assert result.metadata["messages"] == 4
+    assert result.metadata["messages_per_second"] > 0
+    assert result.metadata["bytes_per_second"] > 0
+
+
+def test_kafka_delivery_errors_fail_the_asset(tmp_path) -> None:
+    broker = FakeKafkaBroker()
+    broker.failing_topics.add("raw_user")
+
+    with mock.patch("kafka.KafkaProducer", broker.producer):
+        stats = make_kafka().produce(TEST_RAW_ANILIST_VALID)
+        with pytest.raises(dg.Failure, match="1 of 2 messages were not delivered"):
+            kafka_topics(
+                context=dg.build_asset_context(),
+                raw_anilist=TEST_RAW_ANILIST_VALID,
+                kafka=make_kafka(),
+                config=KafkaTopicsConfig(data_path=str(tmp_path)),
+            )
+
+    assert stats.delivered == 1
+    assert not (tmp_path / "kafka_index").exists()
+    assert stats.errors == 1
+    assert "batch expired" in stats.last_error
+
+
+def test_kafka_topics_publishes_only_changes(tmp_path) -> None:
+    broker = FakeKafkaBroker()
+    data = json.loads(json.dumps(TEST_RAW_ANILIST_VALID))
+    entries = data["data"]["MediaListCollection"]["lists"][0]["entries"]
+    entries.append(dict(entries[0], id=5, mediaId=6, media={"id": 6}))
+
+    def publish(**config) -> dict:
+        config = KafkaTopicsConfig(data_path=str(tmp_path), **config)
+        with mock.patch("kafka.KafkaProducer", broker.producer):
+            result = kafka_topics(
+                context=dg.build_asset_context(),
+                raw_anilist=data,
+                kafka=make_kafka(),
+                config=config,
+            )
+        return {
+            key: getattr(value, "value", value)
+            for key, value in result.metadata.items()
+        }
+
+    first = publish()
+    unchanged = publish()
+    entries[0]["score"] = 10
+    del entries[1]
+    changed = publish()
+    resync = publish(full_resync=True)
+
+    media = [
+        (key, value)
+        for partition in range(broker.partitions)
+        for key, value in broker.records[("raw_media", partition)]
+    ]
+    assert (first["changed"], first["suppressed"], first["messages"]) == (3, 0, 3)
+    assert (unchanged["changed"], unchanged["suppressed"]) == (0, 3)
+    assert unchanged["messages"] == 0
+    assert (changed["changed"], changed["tombstones"]) == (1, 1)
+    assert changed["suppressed"] == 1
+    assert (b"42:6", None) in media
+    assert (resync["changed"], resync["suppressed"], resync["tombstones"]) == (2, 0, 0)
+    assert json.loads((tmp_path / "kafka_index" / "test_user.json").read_bytes())
+
+
+def test_micro_batch_closes_on_size_or_age() -> None:
+    clock = [0.0]
+    batch = MicroBatch(
+        max_records=3, max_bytes=100, max_seconds=5.0, clock=lambda: clock[0]
+    )
+
+    assert not batch.ready() and batch.remaining_seconds() == 5.0
+    batch.add("raw_user", {"id": 1}, 10)
+    clock[0] = 2.0
+    batch.add("raw_media", {"id": 2}, 10)
+    assert not batch.ready() and batch.remaining_seconds() == 3.0
+    clock[0] = 5.0
+    assert batch.ready()
+    assert batch.drain() == {"raw_user": [{"id": 1}], "raw_media": [{"id": 2}]}
+    assert batch.count == 0 and not batch.ready()
+
+    batch.add("raw_media", {"id": 3}, 100)
+    assert batch.ready()
+    batch.drain()
+    for i in range(3):
+        batch.add("raw_media", {"id": i}, 1)
+    assert batch.ready()
+
+
+def test_micro_batch_requeues_a_failed_batch_first() -> None:
+    batch = MicroBatch(max_records=10, max_bytes=100, max_seconds=5.0)
+    batch.add("raw_media", {"id": 1}, 10)
+    records = batch.drain()
+    batch.add("raw_media", {"id": 2}, 5)
+
+    batch.requeue(records, 1, 10)
+
+    assert (batch.count, batch.bytes) == (2, 15)
+    assert batch.drain() == {"raw_media": [{"id": 1}, {"id": 2}]}
+
+
+def test_record_partition_keys_follow_the_latest_header() -> None:
+    headers = [("partition_key", b"Test_User")]
+    records = [
+        (b"42", {"id": 42}, header_partition_key(headers)),
+        (b"42:2", None, "test_user"),
+        (b"43:2", {"id": 1}, header_partition_key([])),
+        (None, {"id": 44}, "other"),
+    ]
+
+    assert record_partition_keys(records) == {42: "test_user"}
+
+
+def test_replay_entries_keeps_each_users_entry() -> None:
+    entries, deleted = replay_entries(
+        [
+            (b"1:10", {"id": 1, "userId": 1, "mediaId": 10, "score": 5}),
+            (b"2:10", {"id": 2, "userId": 2, "mediaId": 10, "score": 6}),
+            (b"1:10", {"id": 1, "userId": 1, "mediaId": 10, "score": 7}),
+            (b"2:11", {"id": 3, "userId": 2, "mediaId": 11, "score": 8}),
+            (b"2:11", None),
+            (b"11", None),
+        ]
+    )
+
+    assert [(entry["id"], entry["score"]) for entry in entries] == [(1, 7), (2, 6)]
+    assert deleted == [(2, 11)]
+
+
+def make_resource(server, tmp_path, **kwargs) -> AniListAPIResource:
+    query_file = tmp_path / "test.graphql"
+    query_file.write_text(
+        "query ($userName: String) { User(name: $userName) { name } }"
+    )
+    host, port = server.server_address
+    return AniListAPIResource(
+        user_name="test_user",
+        query_path=str(tmp_path),
+        api_url=f"http://{host}:{port}",
+        requests_per_minute=60000,
+        max_workers=4,
+        **kwargs,
+    )
+
+
+def test_token_bucket_waits_for_refill() -> None:
+    clock = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: clock[0], sleep=sleep)
+
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.5)
+    bucket.pause(3.0)
+    assert bucket.acquire() == pytest.approx(3.0)
+    assert sum(sleeps) == pytest.approx(3.5)
+
+
+def test_anilist_query_backs_off_on_429(stub_server, tmp_path) -> None:
+    stub_server.throttle = 1
+    anilist_api = make_resource(stub_server, tmp_path)
+
+    actual = anilist_api.query("test.graphql")
+
+    assert actual == {"data": {"User": {"name": "test_user"}}}
+    assert stub_server.requests == 2
+    assert anilist_api.stats.throttled_responses == 1
+    assert anilist_api.stats.retries == 1
+    assert anilist_api.stats.throttled_seconds == pytest.approx(0.05, abs=0.01)
+
+
+def test_anilist_client_retries_timed_out_requests(stub_server) -> None:
+    stub_server.stall = 1
+    host, port = stub_server.server_address
+    client = AniListClient(
+        url=f"http://{host}:{port}",
+        requests_per_minute=60000,
+        timeout=0.1,
+        sleep=lambda seconds: None,
+    )
+
+    res = client.post("query { User { name } }", {"userName": "test_user"})
+
+    assert res.json() == {"data": {"User": {"name": "test_user"}}}
+    assert stub_server.requests == 2
+    assert client.stats.retries == 1
+    client.close()
+
+
+def test_anilist_query_pages_streams_pages(stub_server, tmp_path) -> None:
+    anilist_api = make_resource(stub_server, tmp_path)
+
+    pages = list(anilist_api.query_pages("test.graphql", per_page=3))
+
+    assert [len(entries) for entries in pages] == [3, 3, 1]
+    assert [entry["id"] for entries in pages for entry in entries] == list(range(7))
+
+
+@pytest.mark.parametrize("body", [b"", b"null", b"not json"])
+def test_anilist_query_pages_raises_on_empty_response(
+    body, stub_server, tmp_path
+) -> None:
+    anilist_api = make_resource(stub_server, tmp_path)
+    stub_server.body = body
+
+    with pytest.raises(AniListAPIError):
+        list(anilist_api.query_pages("test.graphql", per_page=3))
+
+
+def test_anilist_fetch_uses_cache(stub_server, tmp_path) -> None:
+    cache_path = str(tmp_path / "cache")
+    anilist_api = make_resource(stub_server, tmp_path, cache_path=cache_path)
+
+    first = anilist_api.fetch("test.graphql")
+    second = anilist_api.fetch("test.graphql")
+
+    assert first.source == "network" and not first.unchanged
+    assert second.source == "cache" and second.unchanged
+    assert second.data == first.data
+    assert stub_server.requests == 1
+    assert anilist_api.cache_metadata()["cache_hits"] == 1
+    assert anilist_api.cache_metadata()["cache_bytes_saved"] == first.size
+
+
+def test_anilist_fetch_revalidates_stale_cache(stub_server, tmp_path) -> None:
+    cache_path = str(tmp_path / "cache")
+    anilist_api = make_resource(
+        stub_server, tmp_path, cache_path=cache_path, cache_ttl_seconds=0
+    )
+
+    anilist_api.fetch("test.graphql")
+    revalidated = anilist_api.fetch("test.graphql")
+
+    assert revalidated.source == "revalidated" and revalidated.unchanged
+    assert stub_server.requests == 2
+    assert anilist_api.cache_metadata()["cache_revalidated"] == 1
+
+
+def test_raw_anilist_compares_with_its_last_materialization(
+    stub_server, tmp_path
+) -> None:
+    anilist_api = make_resource(
+        stub_server, tmp_path, cache_path=str(tmp_path / "cache")
+    )
+    resources = {
+        "anilist_api": anilist_api,
+        "local_io_manager": LocalFileJSONIOManager(data_path=str(tmp_path / "data")),
+    }
+    config = {"data_path": str(tmp_path / "data"), "query_path": str(tmp_path)}
+    instance = dg.DagsterInstance.ephemeral()
+    instance.add_dynamic_partitions("anilist_users", ["test_user"])
+
+    def materialize(asset, **kwargs):
+        asset_config = config | {"anilist_query_filename": "test.graphql"}
+        dg.materialize(
+            [asset],
+            resources=resources,
+            instance=instance,
+            run_config={"ops": {asset.op.name: {"config": asset_config}}},
+            **kwargs,
+        )
+
+    def stored() -> int:
+        key = dg.AssetKey("raw_anilist")
+        return len(instance.fetch_materializations(key, limit=10).records)
+
+    # Another caller fills the cache before raw_anilist has stored anything
+    anilist_api.fetch("test.graphql")
+    materialize(raw_anilist, partition_key="test_user")
+    first = stored()
+    materialize(raw_anilist, partition_key="test_user")
+
+    assert stub_server.requests == 1
+    assert first == 1
+    assert stored() == 1
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path) -> None:
+    clock = [0.0]
+    cache = ResponseCache(
+        tmp_path, ttl_seconds=10, max_bytes=20, clock=lambda: clock[0]
+    )
+
+    cache.put("a", b"0123456789")
+    os.utime(cache.payload_path("a"), (1, 1))
+    cache.put("b", b"0123456789")
+    os.utime(cache.payload_path("b"), (2, 2))
+    cache.get("a")
+    cache.put("c", b"0123456789")
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c").fresh
+    clock[0] = 11
+    assert not cache.get("c").fresh
+    assert cache.stats.evictions == 1
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_local_io_manager_codec_round_trip(codec, tmp_path) -> None:
+    io_manager = LocalFileJSONIOManager(data_path=str(tmp_path), codec=codec)
+    output_context = dg.build_output_context(
+        asset_key="raw_anilist",
+        run_id="test_run",
+        step_key="raw_anilist",
+        name="result",
+    )
+    input_context = dg.build_input_context(
+        asset_key="raw_anilist",
+        upstream_output=output_context,
+        dagster_type=dg.PythonObjectDagsterType(dict),
+    )
+    path_context = dg.build_input_context(
+        asset_key="raw_anilist",
+        upstream_output=output_context,
+        dagster_type=dg.PythonObjectDagsterType(Path),
+    )
+
+    io_manager.handle_output(output_context, TEST_RAW_ANILIST_VALID)
+    actual = io_manager.load_input(input_context)
+
+    assert io_manager.get_path(output_context).exists()
+    assert materialize(actual) == TEST_RAW_ANILIST_VALID
+    assert io_manager.load_input(path_context) == io_manager.get_path(output_context)
+
+
+def test_local_io_manager_loads_sections_lazily(tmp_path) -> None:
+    path = tmp_path / "raw_anilist.msgpack.zst"
+    codec = get_codec("msgpack.zst")
+    serialization.dump(TEST_RAW_ANILIST_VALID, path, codec)
+
+    actual = serialization.load(path, codec)
+    user = actual["data"]["User"]
+
+    assert isinstance(actual["data"], LazyMapping)
+    assert user == TEST_RAW_ANILIST_VALID["data"]["User"]
+    assert "MediaListCollection" not in actual["data"]._values
+
+
+def test_materialize_unmaps_the_loaded_file(tmp_path) -> None:
+    path = tmp_path / "raw_anilist.msgpack.zst"
+    codec = get_codec("msgpack.zst")
+    serialization.dump(TEST_RAW_ANILIST_VALID, path, codec)
+
+    actual = serialization.load(path, codec)
+    mapped = actual._mapped
+
+    assert materialize(actual) == TEST_RAW_ANILIST_VALID
+    assert mapped.closed
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_load_rejects_empty_files(codec, tmp_path) -> None:
+    path = tmp_path / "empty"
+    path.touch()
+
+    with pytest.raises(ValueError, match="is empty"):
+        serialization.load(path, get_codec(codec))
+
+
+def test_duckdb_arrow_io_manager_writes_partitions_and_relations(tmp_path) -> None:
+    database = str(tmp_path / "test.duckdb")
+    partitions = dg.StaticPartitionsDefinition(["a", "b"])
+    scores = {"a": [1.0, 2.0], "b": [3.0]}
+
+    @dg.asset(
+        partitions_def=partitions,
+        io_manager_key="duckdb_io_manager",
+        metadata={"partition_expr": "user_name"},
+    )
+    def user_scores(context: dg.AssetExecutionContext) -> pa.Table:
+        user_name = context.partition_key
+        return pa.table(
+            {
+                "user_name": [user_name] * len(scores[user_name]),
+                "score": scores[user_name],
+            }
+        )
+
+    @dg.asset(
+        partitions_def=partitions,
+        io_manager_key="duckdb_io_manager",
+        metadata={"merge_key": "user_name"},
+    )
+    def user_counts(user_scores):
+        # A lazy relation over this partition's rows, stored without leaving DuckDB
+        assert isinstance(user_scores, duckdb.DuckDBPyRelation)
+        return user_scores.aggregate("user_name, COUNT(*) AS entries", "user_name")
+
+    resources = {
+        "duckdb_io_manager": DuckDBArrowIOManager(
+            database=database, duckdb_schema="pandas"
+        )
+    }
+    runs = []
+    for user_name in ["a", "b", "a"]:
+        runs.append(
+            dg.materialize(
+                [user_scores, user_counts], partition_key=user_name, resources=resources
+            )
+        )
+        scores["a"] = [4.0]
+
+    with duckdb.connect(database, read_only=True) as conn:
+        stored = conn.execute(
+            "SELECT user_name, score FROM pandas.user_scores ORDER BY ALL"
+        ).fetchall()
+        counts = conn.execute(
+            "SELECT * FROM pandas.user_counts ORDER BY ALL"
+        ).fetchall()
+
+    assert all(run.success for run in runs)
+    assert stored == [("a", 4.0), ("b", 3.0)]
+    assert counts == [("a", 1), ("b", 1)]
+
+
+def test_duckdb_arrow_io_manager_loads_by_annotation(tmp_path) -> None:
+    database = str(tmp_path / "test.duckdb")
+    with duckdb.connect(database) as conn:
+        conn.execute("CREATE SCHEMA pandas")
+        conn.execute("CREATE TABLE pandas.scores AS SELECT range AS id FROM range(3)")
+    io_manager = DuckDBArrowIOManager(database=database, duckdb_schema="pandas")
+
+    def load(dagster_type: dg.DagsterType) -> Any:
+        return io_manager.load_input(
+            dg.build_input_context(
+                asset_key="scores",
+                upstream_output=dg.build_output_context(asset_key="scores"),
+                dagster_type=dagster_type,
+            )
+        )
+
+    frame = load(dg.PythonObjectDagsterType(pd.DataFrame))
+    table = load(dg.PythonObjectDagsterType(pa.Table))
+    relation = load(dg.PythonObjectDagsterType(duckdb.DuckDBPyRelation))
+
+    assert frame["id"].tolist() == table["id"].to_pylist() == [0, 1, 2]
+    assert relation.count("*").fetchone() == (3,)
+    # The relation's connection is held until the relation itself is dropped
+    with pytest.raises(duckdb.ConnectionException):
+        duckdb.connect(database, read_only=True)
+    del relation
+    gc.collect()
+    with duckdb.connect(database, read_only=True) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM pandas.scores").fetchone() == (3,)
@@ -0,0 +1,34 @@
+from anime_data_pipeline.lib.synthetic import (
+    PayloadOptions,
+    make_payload,
+    make_payloads,
+)
+from anime_data_pipeline.lib.query_builder import payload_selection, prune_payload
+from anime_data_pipeline.defs.assets import (
+    convert_anilist_json_to_tables,
+    iter_anilist_entries,
+)
+
+
+def test_payloads_match_the_query_and_convert() -> None:
+    options = PayloadOptions(users=3, entries=50, media=80, tags=4, synonyms=2)
+    payloads = list(make_payloads(options))
+    entries = [list(iter_anilist_entries(payload)) for payload in payloads]
+
+    assert payloads == list(make_payloads(options))
+    assert [len(user_entries) for user_entries in entries] == [50, 50, 50]
+    assert len({entry["id"] for user in entries for entry in user}) == 150
+    assert {entry["userId"] for entry in entries[2]} == {3}
+    assert all(len(entry["media"]["tags"]) == 4 for entry in entries[0])
+
+    for payload in payloads:
+        assert prune_payload(payload, payload_selection()) == payload
+        fact_df, media_df, user_df = convert_anilist_json_to_tables(payload)
+        assert (len(fact_df), len(media_df), len(user_df)) == (50, 50, 1)
+
+
+def test_make_payload_is_one_user() -> None:
+    payload = make_payload(20, seed=1)
+
+    assert payload["data"]["User"]["name"] == "user_1"
+    assert len(list(iter_anilist_entries(payload))) == 20
@@ -0,0 +1,106 @@
+from anime_data_pipeline.defs.assets import store_anime_scores_parquet
+from anime_data_pipeline.lib.tracing import (
+    TRACE_DIR_ENV,
+    current_rss,
+    current_span,
+    span,
+    traced,
+)
+
+import dagster as dg
+import duckdb
+import json
+import mmap
+from dagster_duckdb import DuckDBResource
+
+
+def test_traced_generator_only_owns_its_own_work() -> None:
+    @traced("pages")
+    def pages():
+        for page in range(2):
+            with span("request") as request:
+                request.record(bytes_read=10)
+            current_span().record(rows_out=1)
+            yield page
+
+    with span("step") as step:
+        for _ in pages():
+            with span("write"):
+                pass
+
+    (generator,) = [child for child in step.children if child.name == "pages"]
+    assert [child.name for child in generator.children] == ["request", "request"]
+    assert [child.name for child in step.children].count("write") == 2
+    assert generator.rows_out == 2
+    assert step.breakdown()["pages/request"]["calls"] == 2
+    assert step.breakdown()["pages/request"]["bytes"] == 20
+
+
+def test_spans_measure_their_own_memory() -> None:
+    with span("step") as step:
+        with span("allocate") as allocate:
+            kept = bytearray(64 * 2**20)
+            kept[:: mmap.PAGESIZE] = b"x" * len(kept[:: mmap.PAGESIZE])
+        with span("idle") as idle:
+            pass
+
+    assert current_rss() > 0
+    assert allocate.rss_delta_bytes >= 60 * 2**20
+    # A span after a larger one reports its own change, not the earlier growth
+    assert idle.rss_delta_bytes < 2**20
+    assert step.to_metadata()["rss_delta_bytes"] >= 60 * 2**20
+    del kept
+
+
+def test_assets_report_metrics_and_write_traces(tmp_path, monkeypatch) -> None:
+    database = str(tmp_path / "anime_data.duckdb")
+    with duckdb.connect(database) as conn:
+        conn.execute("CREATE SCHEMA dbt")
+        conn.execute(
+            """
+            CREATE TABLE dbt.anime_scores AS
+            SELECT
+                i % 3 AS user_id,
+                i AS media_id,
+                2000 + i % 2 AS season_year,
+                (i % 10)::DOUBLE AS score,
+                TIMESTAMP '2025-01-01' AS loaded_at
+            FROM
+                range(100) AS t(i)
+            """
+        )
+    monkeypatch.setenv(TRACE_DIR_ENV, str(tmp_path / "traces"))
+
+    result = dg.materialize(
+        [store_anime_scores_parquet],
+        resources={
+            "duckdb_read": DuckDBResource(
+                database=database, connection_config={"access_mode": "READ_ONLY"}
+            )
+        },
+        run_config={
+            "ops": {
+                "store_anime_scores_parquet": {"config": {"data_path": str(tmp_path)}}
+            }
+        },
+    )
+    (materialization,) = result.asset_materializations_for_node(
+        "store_anime_scores_parquet"
+    )
+    metadata = materialization.metadata
+    trace = (tmp_path / "traces" / f"{result.run_id}.json").read_text()
+    events = json.loads(trace.rstrip().rstrip(",") + "]")
+
+    assert metadata["wall_seconds"].value > 0
+    assert metadata["cpu_seconds"].value >= 0
+    assert metadata["bytes_written"].value > 0
+    assert metadata["rows"].value == 100
+    assert set(metadata["spans"].value) == {"duckdb.query", "parquet.write"}
+    assert metadata["spans"].value["duckdb.query"]["rows_out"] == 100
+    assert trace.startswith("[\n")
+    assert [event["name"] for event in events] == [
+        "store_anime_scores_parquet",
+        "duckdb.query",
+        "parquet.write",
+    ]
+    assert all(event["ph"] == "X" for event in events)